@@ -1,4 +1,5 @@
 # Copyright (c) 2012-2016 Seafile Ltd.
+import copy
 import datetime
 import logging
 from rest_framework import status
@@ -8,6 +9,8 @@ from rest_framework.exceptions import APIException
 from seaserv import ccnet_api
 from seahub.base.accounts import User
 from seahub.api2.models import Token, TokenV2
+from seahub.api2.token_cache import get_cached_auth, set_cached_auth, \
+    update_device_info
 from seahub.api2.utils import get_client_ip
 from seahub.utils import within_time_range
 from seahub.utils.user_permissions import populate_user_permissions
@@ -60,32 +63,73 @@ class TokenAuthentication(BaseAuthentication):
             raise AuthenticationFailed(msg)
 
         key = auth[1]
+        cached = get_cached_auth(key)
+        if cached is not None:
+            user, token = cached
+            if isinstance(token, TokenV2):
+                self.update_device_info(request, token)
+            # cached objects are shared by requests
+            return (copy.copy(user), copy.copy(token))
+
         ret = self.authenticate_v2(request, key)
         if ret:
             return ret
 
         return self.authenticate_v1(request, key)
 
-    def authenticate_v1(self, request, key):
-        try:
-            token = Token.objects.get(key=key)
-        except Token.DoesNotExist:
-            raise AuthenticationFailed('Invalid token')
-
+    def get_user(self, username):
         try:
-            user = User.objects.get(email=token.user)
+            user = User.objects.get(email=username)
         except User.DoesNotExist:
             raise AuthenticationFailed('User inactive or deleted')
 
         if MULTI_TENANCY:
-            orgs = ccnet_api.get_orgs_by_user(token.user)
+            orgs = ccnet_api.get_orgs_by_user(username)
             if orgs:
                 user.org = orgs[0]
 
         populate_user_permissions(user)
+        return user
+
+    def update_device_info(self, request, token):
+        """Update the device's last_login_ip, client_version,
+        platform_version and last_accessed if changed. Changes are written
+        to database in batches.
+        """
+        fields = {}
 
+        ip = get_client_ip(request)
+        if ip and ip != token.last_login_ip:
+            fields['last_login_ip'] = ip
+
+        client_version = request.META.get(HEADER_CLIENT_VERSION, '')
+        if client_version and client_version != token.client_version:
+            fields['client_version'] = client_version
+
+        platform_version = request.META.get(HEADER_PLATFORM_VERSION, '')
+        if platform_version and platform_version != token.platform_version:
+            fields['platform_version'] = platform_version
+
+        now = datetime.datetime.now()
+        if fields or not within_time_range(token.last_accessed, now, 10 * 60):
+            # We only need 10min precision for the last_accessed field
+            fields['last_accessed'] = now
+
+        if fields:
+            for name, value in fields.items():
+                setattr(token, name, value)
+            update_device_info(token.key, **fields)
+
+    def authenticate_v1(self, request, key):
+        try:
+            token = Token.objects.get(key=key)
+        except Token.DoesNotExist:
+            raise AuthenticationFailed('Invalid token')
+
+        user = self.get_user(token.user)
         if user.is_active:
-            return (user, token)
+            set_cached_auth(key, user, token)
+            return (copy.copy(user), copy.copy(token))
 
     def authenticate_v2(self, request, key):
         try:
@@ -97,45 +141,8 @@ class TokenAuthentication(BaseAuthentication):
         if token.wiped_at:
             raise DeviceRemoteWipedException('Device set to be remote wiped')
 
-        try:
-            user = User.objects.get(email=token.user)
-        except User.DoesNotExist:
-            raise AuthenticationFailed('User inactive or deleted')
-
-        if MULTI_TENANCY:
-            orgs = ccnet_api.get_orgs_by_user(token.user)
-            if orgs:
-                user.org = orgs[0]
-
-        populate_user_permissions(user)
-
+        user = self.get_user(token.user)
         if user.is_active:
-            need_save = False
-
-            # We update the device's last_login_ip, client_version, platform_version if changed
-            ip = get_client_ip(request)
-            if ip and ip != token.last_login_ip:
-                token.last_login_ip = ip
-                need_save = True
-
-            client_version = request.META.get(HEADER_CLIENT_VERSION, '')
-            if client_version and client_version != token.client_version:
-                token.client_version = client_version
-                need_save = True
-
-            platform_version = request.META.get(HEADER_PLATFORM_VERSION, '')
-            if platform_version and platform_version != token.platform_version:
-                token.platform_version = platform_version
-                need_save = True
-
-            if not within_time_range(token.last_accessed, datetime.datetime.now(), 10 * 60):
-                # We only need 10min precision for the last_accessed field
-                need_save = True
-
-            if need_save:
-                try:
-                    token.save()
-                except:
-                    logger.exception('error when save token v2:')
-
-            return (user, token)
+            set_cached_auth(key, user, token)
+            self.update_device_info(request, token)
+            return (copy.copy(user), copy.copy(token))
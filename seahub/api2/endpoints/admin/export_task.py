@@ -0,0 +1,131 @@
+# Copyright (c) 2012-2016 Seafile Ltd.
+import logging
+from wsgiref.util import FileWrapper
+
+from rest_framework.authentication import SessionAuthentication
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from rest_framework import status
+from django.http import StreamingHttpResponse
+
+from seahub.api2.authentication import TokenAuthentication
+from seahub.api2.throttling import UserRateThrottle
+from seahub.api2.utils import api_error
+from seahub.utils.export_task import EXPORT_FORMATS, start_export_task, \
+    get_export_task, get_export_file
+from seahub.views.sysadmin import get_users_export, get_groups_export
+
+logger = logging.getLogger(__name__)
+
+EXPORTERS = {
+    'users': get_users_export,
+    'groups': get_groups_export,
+}
+
+CONTENT_TYPES = {
+    'xlsx': 'application/ms-excel',
+    'csv': 'text/csv',
+}
+
+def get_user_export_task(request):
+    """Return ``(task_id, task)`` of the export task in request, ``task`` is
+    ``None`` if it does not exist or is not started by the user.
+    """
+    task_id = request.GET.get('task_id', '')
+    task = get_export_task(task_id) if task_id else None
+    if task and task['username'] != request.user.username:
+        task = None
+    return task_id, task
+
+class AdminExportTask(APIView):
+
+    authentication_classes = (TokenAuthentication, SessionAuthentication)
+    throttle_classes = (UserRateThrottle, )
+    permission_classes = (IsAdminUser,)
+
+    def post(self, request):
+        """ Export users or groups in background, and return task id.
+
+        Permission checking:
+        1. only admin can perform this action.
+        """
+        # argument check
+        export_type = request.data.get('type', None)
+        if export_type not in EXPORTERS:
+            error_msg = 'type invalid.'
+            return api_error(status.HTTP_400_BAD_REQUEST, error_msg)
+
+        file_format = request.data.get('format', 'xlsx')
+        if file_format not in EXPORT_FORMATS:
+            error_msg = 'format invalid.'
+            return api_error(status.HTTP_400_BAD_REQUEST, error_msg)
+
+        task_id = start_export_task(request.user.username, export_type,
+                                    EXPORTERS[export_type], file_format)
+        return Response({'task_id': task_id})
+
+class AdminQueryExportProgress(APIView):
+
+    authentication_classes = (TokenAuthentication, SessionAuthentication)
+    throttle_classes = (UserRateThrottle, )
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        """ Fetch progress of an export task.
+
+        Permission checking:
+        1. only admin who starts the task can perform this action.
+        """
+        task_id, task = get_user_export_task(request)
+        if not task_id:
+            error_msg = 'task_id invalid.'
+            return api_error(status.HTTP_400_BAD_REQUEST, error_msg)
+
+        if task is None:
+            error_msg = 'Task %s not found.' % task_id
+            return api_error(status.HTTP_404_NOT_FOUND, error_msg)
+
+        result = {}
+        result['status'] = task['status']
+        result['done'] = task['done']
+        result['total'] = task['total']
+        return Response(result)
+
+class AdminExportTaskDownload(APIView):
+
+    authentication_classes = (TokenAuthentication, SessionAuthentication)
+    throttle_classes = (UserRateThrottle, )
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        """ Download the file of a finished export task.
+
+        Permission checking:
+        1. only admin who starts the task can perform this action.
+        """
+        task_id, task = get_user_export_task(request)
+        if not task_id:
+            error_msg = 'task_id invalid.'
+            return api_error(status.HTTP_400_BAD_REQUEST, error_msg)
+
+        if task is None:
+            error_msg = 'Task %s not found.' % task_id
+            return api_error(status.HTTP_404_NOT_FOUND, error_msg)
+
+        if task['status'] != 'done':
+            error_msg = 'Task %s is not finished.' % task_id
+            return api_error(status.HTTP_400_BAD_REQUEST, error_msg)
+
+        try:
+            f = open(get_export_file(task_id, task), 'rb')
+        except IOError as e:
+            logger.error(e)
+            error_msg = 'Task %s not found.' % task_id
+            return api_error(status.HTTP_404_NOT_FOUND, error_msg)
+
+        response = StreamingHttpResponse(FileWrapper(f),
+                content_type=CONTENT_TYPES[task['format']])
+        response['Content-Disposition'] = 'attachment; filename=%s.%s' % \
+                (task['name'], task['format'])
+        return response
@@ -12,6 +12,7 @@ from seaserv import seafile_api, ccnet_api
 from seahub.group.utils import get_group_member_info, is_group_member
 from seahub.avatar.settings import AVATAR_DEFAULT_SIZE
 from seahub.base.accounts import User
+from seahub.profile.utils import get_profile_resolver
 
 from seahub.api2.authentication import TokenAuthentication
 from seahub.api2.throttling import UserRateThrottle
@@ -52,6 +53,9 @@ class AdminGroupMembers(APIView):
             error_msg = 'Internal Server Error'
             return api_error(status.HTTP_500_INTERNAL_SERVER_ERROR, error_msg)
 
+        get_profile_resolver(request).prefetch([m.user_name for m in members],
+                                               login_ids=True)
+
         group_members_info = []
         for m in members:
             member_info = get_group_member_info(request, group_id, m.user_name, avatar_size)
@@ -12,6 +12,7 @@ from seaserv import ccnet_api
 
 from seahub.utils import clear_token, is_valid_email
 from seahub.utils.licenseparse import user_number_over_limit
+from seahub.utils.org_cache import invalidate_user_org
 from seahub.base.accounts import User
 from seahub.base.templatetags.seahub_tags import email2nickname
 from seahub.profile.models import Profile
@@ -109,6 +110,7 @@ class AdminOrgUsers(APIView):
         # set `is_staff` parameter as `0`
         try:
             ccnet_api.add_org_user(org_id, email, 0)
+            invalidate_user_org(email)
         except Exception as e:
             logger.error(e)
             error_msg = 'Internal Server Error'
@@ -230,6 +232,7 @@ class AdminOrgUser(APIView):
 
         try:
             ccnet_api.remove_org_user(org_id, email)
+            invalidate_user_org(email)
             user.delete()
         except Exception as e:
             logger.error(e)
@@ -27,6 +27,7 @@ from seahub.utils import gen_file_get_url, gen_dir_zip_download_url, \
         is_windows_operating_system, gen_shared_link
 from seahub.utils.timeutils import timestamp_to_isoformat_timestr, \
         datetime_to_isoformat_timestr
+from seahub.utils.dir_size_cache import get_dir_size
 from seahub.views.file import send_file_access_msg
 
 logger = logging.getLogger(__name__)
@@ -280,8 +281,8 @@ class AdminShareLinkDownload(APIView):
                 dir_name = repo.name if real_path == '/' else \
                         os.path.basename(real_path.rstrip('/'))
 
-                dir_size = seafile_api.get_dir_size(
-                        repo.store_id, repo.version, real_obj_id)
+                dir_size = get_dir_size(repo.store_id, repo.version,
+                                        real_obj_id)
                 if dir_size > seaserv.MAX_DOWNLOAD_DIR_SIZE:
                     error_msg = 'Unable to download directory "%s": size is too large.' % dir_name
                     return api_error(status.HTTP_400_BAD_REQUEST, error_msg)
@@ -11,7 +11,8 @@ from rest_framework import status
 
 from seahub.api2.throttling import UserRateThrottle
 from seahub.api2.authentication import TokenAuthentication
-from seahub.api2.utils import api_error
+from seahub.api2.utils import api_error, decode_dir_cursor, \
+    parse_dirent_includes
 from seahub.api2.views import get_dir_recursively, \
     get_dir_entrys_by_id
 from seahub.signals import rename_dirent_successful
@@ -52,6 +53,13 @@ class DirView(APIView):
     def get(self, request, repo_id, format=None):
         """ Get dir info.
 
+        Dirents can be listed page by page, either with `offset`/`limit`, or
+        with `limit` and the `cursor` returned in `next_cursor` header of
+        previous page.
+
+        Comment counts, starred flags and tags can be attached to dirents
+        with `include`, e.g. `include=comments,stars,tags`.
+
         Permission checking:
         1. user with either 'r' or 'rw' permission.
         """
@@ -101,15 +109,41 @@ class DirView(APIView):
 
                 if recursive == '1':
                     username = request.user.username
-                    dir_list = get_dir_recursively(username, repo_id, path, [])
-                    dir_list.sort(lambda x, y: cmp(x['name'].lower(), y['name'].lower()))
+                    dir_list, truncated = get_dir_recursively(username,
+                            repo_id, path, dir_id)
+                    dir_list.sort(key=lambda x: x['name'].lower())
 
                     resp = Response(dir_list)
                     resp["oid"] = dir_id
+                    resp["truncated"] = 'true' if truncated else 'false'
                     resp["dir_perm"] = seafile_api.check_permission_by_path(repo_id, path, username)
                     return resp
 
-            return get_dir_entrys_by_id(request, repo, path, dir_id, request_type)
+            try:
+                offset = int(request.GET.get('offset', 0))
+                limit = int(request.GET.get('limit', -1))
+            except ValueError:
+                error_msg = 'offset or limit invalid.'
+                return api_error(status.HTTP_400_BAD_REQUEST, error_msg)
+
+            if offset < 0 or limit == 0 or limit < -1:
+                error_msg = 'offset or limit invalid.'
+                return api_error(status.HTTP_400_BAD_REQUEST, error_msg)
+
+            cursor = None
+            if request.GET.get('cursor', ''):
+                cursor = decode_dir_cursor(request.GET['cursor'])
+                if cursor is None:
+                    error_msg = 'cursor invalid.'
+                    return api_error(status.HTTP_400_BAD_REQUEST, error_msg)
+
+            includes = parse_dirent_includes(request.GET.get('include', ''))
+            if includes is None:
+                error_msg = 'include invalid.'
+                return api_error(status.HTTP_400_BAD_REQUEST, error_msg)
+
+            return get_dir_entrys_by_id(request, repo, path, dir_id,
+                    request_type, offset, limit, cursor, includes)
 
     def post(self, request, repo_id, format=None):
         """ Create, rename, revert dir.
@@ -20,6 +20,7 @@ from seahub.signals import rename_dirent_successful
 from seahub.utils import check_filename_with_rename, is_pro_version, \
     gen_file_upload_url, is_valid_dirent_name
 from seahub.utils.timeutils import timestamp_to_isoformat_timestr
+from seahub.utils.dir_list_cache import bump_lock_version
 from seahub.views import check_folder_permission, check_file_lock
 
 from seahub.settings import MAX_UPLOAD_FILE_NAME_LEN, \
@@ -489,6 +490,7 @@ class FileView(APIView):
                 expire = request.data.get('expire', FILE_LOCK_EXPIRATION_DAYS)
                 try:
                     seafile_api.lock_file(repo_id, path.lstrip('/'), username, expire)
+                    bump_lock_version(repo_id)
                 except SearpcError, e:
                     logger.error(e)
                     error_msg = 'Internal Server Error'
@@ -503,6 +505,7 @@ class FileView(APIView):
                 # unlock file
                 try:
                     seafile_api.unlock_file(repo_id, path.lstrip('/'))
+                    bump_lock_version(repo_id)
                 except SearpcError, e:
                     logger.error(e)
                     error_msg = 'Internal Server Error'
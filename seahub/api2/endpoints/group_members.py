@@ -19,6 +19,7 @@ from seahub.api2.authentication import TokenAuthentication
 from seahub.avatar.settings import AVATAR_DEFAULT_SIZE
 from seahub.utils import string2list, is_org_context
 from seahub.base.accounts import User
+from seahub.profile.utils import get_profile_resolver
 from seahub.group.signals import add_user_to_group
 from seahub.group.utils import is_group_member, is_group_admin, \
     is_group_owner, is_group_admin_or_owner, get_group_member_info
@@ -57,6 +58,9 @@ class GroupMembers(APIView):
             error_msg = 'Internal Server Error'
             return api_error(status.HTTP_500_INTERNAL_SERVER_ERROR, error_msg)
 
+        get_profile_resolver(request).prefetch([m.user_name for m in members],
+                                               login_ids=True)
+
         group_members = []
         is_admin = request.GET.get('is_admin', 'false')
         for m in members:
@@ -17,6 +17,7 @@ from seahub.views.file import send_file_access_msg
 from seahub.share.models import FileShare
 from seahub.utils import is_windows_operating_system, \
     is_pro_version
+from seahub.utils.dir_size_cache import get_dir_size
 
 import seaserv
 from seaserv import seafile_api
@@ -88,8 +89,7 @@ class ShareLinkZipTaskView(APIView):
         dir_name = repo.name if real_path == '/' else \
                 os.path.basename(real_path.rstrip('/'))
 
-        dir_size = seafile_api.get_dir_size(
-                repo.store_id, repo.version, dir_id)
+        dir_size = get_dir_size(repo.store_id, repo.version, dir_id)
         if dir_size > seaserv.MAX_DOWNLOAD_DIR_SIZE:
             error_msg = 'Unable to download directory "%s": size is too large.' % dir_name
             return api_error(status.HTTP_400_BAD_REQUEST, error_msg)
@@ -1,7 +1,6 @@
 # Copyright (c) 2012-2016 Seafile Ltd.
 import logging
 import json
-import stat
 import posixpath
 
 from rest_framework.authentication import SessionAuthentication
@@ -18,6 +17,7 @@ from seahub.api2.utils import api_error
 from seahub.views import check_folder_permission
 from seahub.views.file import send_file_access_msg
 from seahub.utils import is_windows_operating_system
+from seahub.utils.dir_size_cache import get_dir_size, get_dirents_size
 
 import seaserv
 from seaserv import seafile_api
@@ -85,8 +85,7 @@ class ZipTaskView(APIView):
                 error_msg = 'Folder %s not found.' % full_dir_path
                 return api_error(status.HTTP_404_NOT_FOUND, error_msg)
 
-            dir_size = seafile_api.get_dir_size(
-                    repo.store_id, repo.version, dir_id)
+            dir_size = get_dir_size(repo.store_id, repo.version, dir_id)
 
             if dir_size > seaserv.MAX_DOWNLOAD_DIR_SIZE:
                 error_msg = 'Unable to download directory "%s": size is too large.' % dir_name
@@ -99,22 +98,8 @@ class ZipTaskView(APIView):
             }
 
         if download_type == 'download-multi':
-            dirent_list = []
-            total_size = 0
-            for dirent_name in dirent_name_list:
-                dirent_name = dirent_name.strip('/')
-                dirent_list.append(dirent_name)
-
-                full_dirent_path = posixpath.join(parent_dir, dirent_name)
-                current_dirent = seafile_api.get_dirent_by_path(repo_id, full_dirent_path)
-                if not current_dirent:
-                    continue
-
-                if stat.S_ISDIR(current_dirent.mode):
-                    total_size += seafile_api.get_dir_size(repo.store_id,
-                        repo.version, current_dirent.obj_id)
-                else:
-                    total_size += current_dirent.size
+            dirent_list = [x.strip('/') for x in dirent_name_list]
+            total_size = get_dirents_size(repo, parent_dir, dirent_list)
 
             if total_size > seaserv.MAX_DOWNLOAD_DIR_SIZE:
                 error_msg = _('Total size exceeds limit.')
@@ -5,6 +5,8 @@ import datetime
 from hashlib import sha1
 
 from django.db import models
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 from django.utils import timezone
 
 from seahub.base.fields import LowerCaseCharField
@@ -194,3 +196,17 @@ class TokenV2(models.Model):
                     last_accessed=self.last_accessed,
                     last_login_ip=self.last_login_ip,
                     wiped_at=self.wiped_at)
+
+
+@receiver(post_save, sender=Token, dispatch_uid="invalidate_cached_token")
+@receiver(post_delete, sender=Token, dispatch_uid="invalidate_deleted_token")
+@receiver(post_save, sender=TokenV2, dispatch_uid="invalidate_cached_token_v2")
+@receiver(post_delete, sender=TokenV2,
+          dispatch_uid="invalidate_deleted_token_v2")
+def invalidate_cached_token(sender, instance, **kwargs):
+    """Drop cached authentication of a token when it is changed (e.g. remote
+    wiped) or deleted.
+    """
+    from seahub.api2.token_cache import invalidate_token
+
+    invalidate_token(instance.key)
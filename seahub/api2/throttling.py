@@ -60,6 +60,12 @@ class SimpleRateThrottle(BaseThrottle):
     Period should be one of: ('s', 'sec', 'm', 'min', 'h', 'hour', 'd', 'day')
 
     Previous request information used for throttling is stored in the cache.
+    How it is stored is chosen per scope by
+    `REST_FRAMEWORK_THROTTLE_BACKENDS`:
+
+    * 'history' -- timestamps of all requests in the period (default).
+    * 'counter' -- request counts of current and previous period, updated
+      with atomic `incr`, see `allow_request_by_counter()`.
     """
 
     cache = default_cache
@@ -109,6 +115,10 @@ class SimpleRateThrottle(BaseThrottle):
         duration = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}[period[0]]
         return (num_requests, duration)
 
+    def get_backend(self):
+        backends = getattr(settings, 'REST_FRAMEWORK_THROTTLE_BACKENDS', {})
+        return backends.get(self.scope, 'history')
+
     def allow_request(self, request, view):
         """
         Implement the check to see if the request should be throttled.
@@ -126,6 +136,11 @@ class SimpleRateThrottle(BaseThrottle):
         if self.key is None:
             return True
 
+        self.backend = self.get_backend()
+        if self.backend == 'counter':
+            self.now = self.timer()
+            return self.allow_request_by_counter()
+
         self.history = self.cache.get(self.key, [])
         self.now = self.timer()
 
@@ -137,6 +152,44 @@ class SimpleRateThrottle(BaseThrottle):
             return self.throttle_failure()
         return self.throttle_success()
 
+    def allow_request_by_counter(self):
+        """
+        Sliding window counter: requests in current fixed window, plus
+        requests in previous window weighted by how much it overlaps with
+        the sliding window, should be no more than the rate.
+
+        Only two integers are stored per ident. The count is incremented
+        before checking, and decremented back if the request is throttled,
+        so concurrent requests in several processes are counted correctly
+        as long as the cache backend has atomic `incr` (e.g. memcached).
+        """
+        window = int(self.now // self.duration)
+        self.window_elapsed = self.now - window * self.duration
+        cur_key = '%s_%d' % (self.key, window)
+        prev_key = '%s_%d' % (self.key, window - 1)
+
+        self.prev_count = self.cache.get(prev_key, 0)
+        self.cur_count = self.incr_counter(cur_key)
+
+        weight = 1 - self.window_elapsed / float(self.duration)
+        if self.prev_count * weight + self.cur_count > self.num_requests:
+            try:
+                self.cache.decr(cur_key)
+            except ValueError:
+                pass
+            self.cur_count -= 1
+            return self.throttle_failure()
+        return True
+
+    def incr_counter(self, key):
+        try:
+            return self.cache.incr(key)
+        except ValueError:
+            # counter of a new window, keep it until next window ends
+            if self.cache.add(key, 1, self.duration * 2):
+                return 1
+            return self.cache.incr(key)
+
     def throttle_success(self):
         """
         Inserts the current request's timestamp along with the key
@@ -156,6 +209,9 @@ class SimpleRateThrottle(BaseThrottle):
         """
         Returns the recommended next request time in seconds.
         """
+        if getattr(self, 'backend', None) == 'counter':
+            return self.wait_by_counter()
+
         if self.history:
             remaining_duration = self.duration - (self.now - self.history[-1])
         else:
@@ -167,6 +223,19 @@ class SimpleRateThrottle(BaseThrottle):
 
         return remaining_duration / float(available_requests)
 
+    def wait_by_counter(self):
+        """
+        Returns seconds until previous window's weight drops enough to allow
+        one more request.
+        """
+        available_requests = self.num_requests - self.cur_count
+        if available_requests <= 0 or not self.prev_count:
+            return self.duration - self.window_elapsed
+
+        elapsed_needed = self.duration * \
+            (1 - (available_requests - 1) / float(self.prev_count))
+        return max(elapsed_needed - self.window_elapsed, 0)
+
 
 class AnonRateThrottle(SimpleRateThrottle):
     """
@@ -0,0 +1,131 @@
+# Copyright (c) 2012-2016 Seafile Ltd.
+"""
+Cache of authenticated api tokens, and buffered updates of device info.
+
+Users and tokens resolved by ``TokenAuthentication`` are kept in process for
+a short time. Each entry records the versions of its token and of its user,
+which are stored in django cache and bumped when a token is changed or
+deleted, or when a user is deactivated, so every process drops the entry on
+its next lookup.
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from seahub.utils import normalize_cache_key
+
+logger = logging.getLogger(__name__)
+
+# Seconds a resolved token is used without checking the database, 0 to
+# disable the cache.
+API_TOKEN_CACHE_TIMEOUT = getattr(settings, 'API_TOKEN_CACHE_TIMEOUT', 60)
+API_TOKEN_CACHE_MAX_ENTRIES = getattr(settings, 'API_TOKEN_CACHE_MAX_ENTRIES',
+                                      10000)
+# Seconds between batched writes of device ip, versions and last access time.
+DEVICE_INFO_FLUSH_INTERVAL = getattr(settings, 'DEVICE_INFO_FLUSH_INTERVAL', 60)
+
+TOKEN_VERSION_CACHE_PREFIX = 'API_TOKEN_VERSION_'
+USER_TOKEN_VERSION_CACHE_PREFIX = 'API_USER_TOKEN_VERSION_'
+VERSION_CACHE_TIMEOUT = 30 * 24 * 60 * 60
+
+_entries = OrderedDict()
+_entries_lock = threading.Lock()
+
+def _version_keys(key, username):
+    return (normalize_cache_key(key, TOKEN_VERSION_CACHE_PREFIX),
+            normalize_cache_key(username, USER_TOKEN_VERSION_CACHE_PREFIX))
+
+def _get_versions(key, username):
+    keys = _version_keys(key, username)
+    versions = cache.get_many(keys)
+    return tuple([versions.get(k, 0) for k in keys])
+
+def _bump_version(cache_key):
+    try:
+        cache.incr(cache_key)
+    except ValueError:
+        cache.set(cache_key, 1, VERSION_CACHE_TIMEOUT)
+
+def get_cached_auth(key):
+    """Return a ``(user, token)`` tuple, or ``None`` if not cached.
+
+    The objects are shared by requests, callers should copy them before
+    handing them out.
+    """
+    if API_TOKEN_CACHE_TIMEOUT <= 0:
+        return None
+
+    with _entries_lock:
+        entry = _entries.get(key)
+    if entry is None:
+        return None
+
+    user, token, versions, expire_at = entry
+    if expire_at < time.time() or \
+            _get_versions(key, user.username) != versions:
+        with _entries_lock:
+            _entries.pop(key, None)
+        return None
+
+    return user, token
+
+def set_cached_auth(key, user, token):
+    if API_TOKEN_CACHE_TIMEOUT <= 0:
+        return
+
+    versions = _get_versions(key, user.username)
+    with _entries_lock:
+        _entries.pop(key, None)
+        while len(_entries) >= API_TOKEN_CACHE_MAX_ENTRIES:
+            _entries.popitem(last=False)
+        _entries[key] = (user, token, versions,
+                         time.time() + API_TOKEN_CACHE_TIMEOUT)
+
+def invalidate_token(key):
+    _bump_version(normalize_cache_key(key, TOKEN_VERSION_CACHE_PREFIX))
+
+def invalidate_user_tokens(username):
+    _bump_version(normalize_cache_key(username,
+                                      USER_TOKEN_VERSION_CACHE_PREFIX))
+
+_pending_updates = {}
+_pending_lock = threading.Lock()
+_last_flush = [time.time()]
+
+def update_device_info(key, **fields):
+    """Buffer an update of a device token, buffered updates are written in
+    one transaction every ``DEVICE_INFO_FLUSH_INTERVAL`` seconds.
+    """
+    with _pending_lock:
+        _pending_updates.setdefault(key, {}).update(fields)
+        if time.time() - _last_flush[0] < DEVICE_INFO_FLUSH_INTERVAL:
+            return
+
+    flush_device_info()
+
+def flush_device_info():
+    from seahub.api2.models import TokenV2
+
+    global _pending_updates
+    with _pending_lock:
+        updates, _pending_updates = _pending_updates, {}
+        _last_flush[0] = time.time()
+
+    if not updates:
+        return
+
+    try:
+        with transaction.atomic():
+            for key, fields in updates.iteritems():
+                # update() does not send post_save, so cached tokens are kept
+                TokenV2.objects.filter(key=key).update(**fields)
+    except Exception:
+        logger.exception('error when save token v2:')
+
+atexit.register(flush_device_info)
@@ -3,8 +3,10 @@
 # Utility functions for api2
 
 import os
+import stat
 import time
 import json
+import base64
 import re
 import logging
 
@@ -12,7 +14,7 @@ from collections import defaultdict
 from functools import wraps
 
 from django.core.paginator import EmptyPage, InvalidPage
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
 from rest_framework.response import Response
 from rest_framework import status, serializers
 from seaserv import seafile_api, get_personal_groups_by_user, \
@@ -63,13 +65,16 @@ def prepare_starred_files(files):
                  'dir' : f.is_dir
                  }
         if not f.is_dir:
-            try:
-                file_id = seafile_api.get_file_id_by_path(f.repo.id, f.path)
-                sfile['oid'] = file_id
-                sfile['size'] = get_file_size(f.repo.store_id, f.repo.version, file_id)
-            except SearpcError as e:
-                logger.error(e)
-                pass
+            # file id and size are resolved with the parent dir listing
+            sfile['oid'] = f.file_id
+            if f.repo.version == 0:
+                try:
+                    sfile['size'] = get_file_size(f.repo.store_id,
+                                                  f.repo.version, f.file_id)
+                except SearpcError as e:
+                    logger.error(e)
+            else:
+                sfile['size'] = f.size
 
         array.append(sfile)
 
@@ -375,6 +380,76 @@ def json_response(func):
                                 content_type=JSON_CONTENT_TYPE)
     return wrapped
 
+# Flush streamed JSON to the client in chunks of about this many bytes.
+JSON_STREAM_CHUNK_SIZE = 64 * 1024
+
+def json_stream(items, chunk_size=JSON_STREAM_CHUNK_SIZE):
+    """Encode an iterable as a JSON array, yielding it chunk by chunk, so
+    only one item needs to be serialized at a time.
+    """
+    buf = ['[']
+    buf_size = 1
+    sep = ''
+    for item in items:
+        data = sep + json.dumps(item)
+        sep = ','
+        buf.append(data)
+        buf_size += len(data)
+        if buf_size >= chunk_size:
+            yield ''.join(buf)
+            buf = []
+            buf_size = 0
+    buf.append(']')
+    yield ''.join(buf)
+
+def streaming_json_response(items, status=200):
+    return StreamingHttpResponse(json_stream(items), status=status,
+                                 content_type=JSON_CONTENT_TYPE)
+
+def is_streaming_request(request):
+    """Whether client asks for the listing to be streamed.
+    """
+    return request.GET.get('stream', '').lower() == 'true'
+
+def dirent_sort_key(dirent):
+    """Sort dirents with dirs first, then by case-insensitive name. The
+    exact name breaks ties, so the order is total.
+    """
+    is_file = 0 if stat.S_ISDIR(dirent.mode) else 1
+    return (is_file, dirent.obj_name.lower(), dirent.obj_name)
+
+def encode_dir_cursor(dir_id, sort_key):
+    """Generate an opaque cursor pointing right after the dirent with
+    ``sort_key`` in dir ``dir_id``.
+    """
+    data = json.dumps({'oid': dir_id, 'key': sort_key})
+    return base64.urlsafe_b64encode(data)
+
+def decode_dir_cursor(cursor):
+    """Return a ``(dir_id, sort_key)`` tuple, or ``None`` if cursor is
+    invalid.
+    """
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode('utf-8')))
+        dir_id = data['oid']
+        is_file, lower_name, name = data['key']
+    except (TypeError, ValueError, KeyError, UnicodeError):
+        return None
+
+    return dir_id, (is_file, lower_name, name)
+
+DIRENT_INCLUDES = ('comments', 'stars', 'tags')
+
+def parse_dirent_includes(value):
+    """Return the set of extra info (see ``DIRENT_INCLUDES``) client asks to
+    attach to each dirent, or ``None`` if ``value`` is invalid.
+    """
+    includes = set([x.strip() for x in value.split(',') if x.strip()])
+    if not includes.issubset(DIRENT_INCLUDES):
+        return None
+
+    return includes
+
 def get_token_v1(username):
     token, _ = Token.objects.get_or_create(user=username)
     return token
@@ -7,6 +7,10 @@ import json
 import datetime
 import posixpath
 import re
+import itertools
+import bisect
+import threading
+from multiprocessing.pool import ThreadPool
 from dateutil.relativedelta import relativedelta
 from urllib2 import quote
 
@@ -21,7 +25,7 @@ from rest_framework.response import Response
 from django.contrib.auth.hashers import check_password
 from django.contrib.sites.models import RequestSite
 from django.db import IntegrityError
-from django.db.models import F
+from django.db.models import F, Count
 from django.http import HttpResponse
 from django.template import RequestContext
 from django.template.loader import render_to_string
@@ -36,7 +40,9 @@ from .serializers import AuthTokenSerializer
 from .utils import get_diff_details, \
     api_error, get_file_size, prepare_starred_files, \
     get_groups, prepare_events, \
-    api_group_check, get_timestamp, json_response, is_seafile_pro
+    api_group_check, get_timestamp, json_response, is_seafile_pro, \
+    is_streaming_request, streaming_json_response, dirent_sort_key, \
+    encode_dir_cursor, parse_dirent_includes
 
 from seahub.wopi.utils import get_wopi_dict
 from seahub.api2.base import APIView
@@ -45,7 +51,7 @@ from seahub.avatar.templatetags.avatar_tags import api_avatar_url, avatar
 from seahub.avatar.templatetags.group_avatar_tags import api_grp_avatar_url, \
         grp_avatar
 from seahub.base.accounts import User
-from seahub.base.models import UserStarredFiles, DeviceToken
+from seahub.base.models import UserStarredFiles, DeviceToken, FileComment
 from seahub.base.templatetags.seahub_tags import email2nickname, \
     translate_seahub_time, translate_commit_desc_escape, \
     email2contact_email
@@ -53,10 +59,12 @@ from seahub.group.views import remove_group_common, \
     rename_group_with_new_name, is_group_staff
 from seahub.group.utils import BadGroupNameError, ConflictGroupNameError, \
     validate_group_name
-from seahub.thumbnail.utils import generate_thumbnail
+from seahub.thumbnail.utils import generate_thumbnail, get_thumbnail_file, \
+    touch_thumbnail
 from seahub.notifications.models import UserNotification
 from seahub.options.models import UserOptions
 from seahub.profile.models import Profile, DetailedProfile
+from seahub.profile.utils import get_profile_resolver
 from seahub.signals import (repo_created, repo_deleted)
 from seahub.share.models import FileShare, OrgFileShare, UploadLinkShare
 from seahub.utils import gen_file_get_url, gen_token, gen_file_upload_url, \
@@ -69,10 +77,14 @@ from seahub.utils import gen_file_get_url, gen_token, gen_file_upload_url, \
     is_org_repo_creation_allowed, is_windows_operating_system, \
     get_no_duplicate_obj_name
 from seahub.utils.devices import do_unlink_device
+from seahub.utils.dir_list_cache import get_cached_dirents, \
+    set_cached_dirents, get_lock_version, bump_lock_version
+from seahub.utils.org_cache import invalidate_user_org
 from seahub.utils.repo import get_sub_repo_abbrev_origin_path
-from seahub.utils.star import star_file, unstar_file
+from seahub.utils.star import star_file, unstar_file, get_starred_paths
 from seahub.utils.file_types import DOCUMENT
 from seahub.utils.file_size import get_file_size_unit
+from seahub.tags.models import FileTag
 from seahub.utils.timeutils import utc_to_local, datetime_to_isoformat_timestr
 from seahub.views import is_registered_user, check_file_lock, \
     group_events_data, get_diff, create_default_library, \
@@ -85,9 +97,10 @@ from seahub.utils import HAS_OFFICE_CONVERTER
 if HAS_OFFICE_CONVERTER:
     from seahub.utils import query_office_convert_status, prepare_converted_html
 import seahub.settings as settings
-from seahub.settings import THUMBNAIL_EXTENSION, THUMBNAIL_ROOT, \
+from seahub.settings import THUMBNAIL_EXTENSION, \
     FILE_LOCK_EXPIRATION_DAYS, \
-    ENABLE_THUMBNAIL, ENABLE_FOLDER_PERM
+    ENABLE_THUMBNAIL, ENABLE_FOLDER_PERM, RECURSIVE_DIR_LIST_MAX_ENTRIES, \
+    RECURSIVE_DIR_LIST_MAX_DEPTH, RECURSIVE_DIR_LIST_WORKERS
 try:
     from seahub.settings import CLOUD_MODE
 except ImportError:
@@ -418,9 +431,8 @@ class Repos(APIView):
 
         email = request.user.username
 
-        # Use dict to reduce memcache fetch cost in large for-loop.
-        contact_email_dict = {}
-        nickname_dict = {}
+        # Resolve nicknames and contact emails in batch.
+        profiles = get_profile_resolver(request)
 
         repos_json = []
         if filter_by['mine']:
@@ -432,15 +444,9 @@ class Repos(APIView):
                 owned_repos = seafile_api.get_owned_repo_list(email,
                         ret_corrupted=True)
 
-            # Reduce memcache fetch ops.
-            modifiers_set = set([x.last_modifier for x in owned_repos])
-            for e in modifiers_set:
-                if e not in contact_email_dict:
-                    contact_email_dict[e] = email2contact_email(e)
-                if e not in nickname_dict:
-                    nickname_dict[e] = email2nickname(e)
+            profiles.prefetch([x.last_modifier for x in owned_repos])
 
-            owned_repos.sort(lambda x, y: cmp(y.last_modify, x.last_modify))
+            owned_repos.sort(key=lambda x: x.last_modify, reverse=True)
             for r in owned_repos:
                 # do not return virtual repos
                 if r.is_virtual:
@@ -453,8 +459,8 @@ class Repos(APIView):
                     "name": r.name,
                     "mtime": r.last_modify,
                     "modifier_email": r.last_modifier,
-                    "modifier_contact_email": contact_email_dict.get(r.last_modifier, ''),
-                    "modifier_name": nickname_dict.get(r.last_modifier, ''),
+                    "modifier_contact_email": profiles.contact_email(r.last_modifier),
+                    "modifier_name": profiles.nickname(r.last_modifier),
                     "mtime_relative": translate_seahub_time(r.last_modify),
                     "size": r.size,
                     "size_formatted": filesizeformat(r.size),
@@ -477,16 +483,10 @@ class Repos(APIView):
                 shared_repos = seafile_api.get_share_in_repo_list(
                         email, -1, -1)
 
-            # Reduce memcache fetch ops.
-            owners_set = set([x.user for x in shared_repos])
-            modifiers_set = set([x.last_modifier for x in shared_repos])
-            for e in owners_set | modifiers_set:
-                if e not in contact_email_dict:
-                    contact_email_dict[e] = email2contact_email(e)
-                if e not in nickname_dict:
-                    nickname_dict[e] = email2nickname(e)
+            profiles.prefetch([x.user for x in shared_repos] +
+                              [x.last_modifier for x in shared_repos])
 
-            shared_repos.sort(lambda x, y: cmp(y.last_modify, x.last_modify))
+            shared_repos.sort(key=lambda x: x.last_modify, reverse=True)
             for r in shared_repos:
                 r.password_need = is_passwd_set(r.repo_id, email)
                 repo = {
@@ -494,12 +494,12 @@ class Repos(APIView):
                     "id": r.repo_id,
                     "owner": r.user,
                     "name": r.repo_name,
-                    "owner_nickname": nickname_dict.get(r.user, ''),
+                    "owner_nickname": profiles.nickname(r.user),
                     "mtime": r.last_modify,
                     "mtime_relative": translate_seahub_time(r.last_modify),
                     "modifier_email": r.last_modifier,
-                    "modifier_contact_email": contact_email_dict.get(r.last_modifier, ''),
-                    "modifier_name": nickname_dict.get(r.last_modifier, ''),
+                    "modifier_contact_email": profiles.contact_email(r.last_modifier),
+                    "modifier_name": profiles.nickname(r.last_modifier),
                     "size": r.size,
                     "size_formatted": filesizeformat(r.size),
                     "encrypted": r.encrypted,
@@ -514,15 +514,9 @@ class Repos(APIView):
         if filter_by['group']:
             groups = get_groups_by_user(request)
             group_repos = get_group_repos(request, groups)
-            group_repos.sort(lambda x, y: cmp(y.last_modify, x.last_modify))
+            group_repos.sort(key=lambda x: x.last_modify, reverse=True)
 
-            # Reduce memcache fetch ops.
-            modifiers_set = set([x.last_modifier for x in group_repos])
-            for e in modifiers_set:
-                if e not in contact_email_dict:
-                    contact_email_dict[e] = email2contact_email(e)
-                if e not in nickname_dict:
-                    nickname_dict[e] = email2nickname(e)
+            profiles.prefetch([x.last_modifier for x in group_repos])
 
             for r in group_repos:
                 repo = {
@@ -533,11 +527,11 @@ class Repos(APIView):
                     "name": r.name,
                     "mtime": r.last_modify,
                     "modifier_email": r.last_modifier,
-                    "modifier_contact_email": contact_email_dict.get(r.last_modifier, ''),
-                    "modifier_name": nickname_dict.get(r.last_modifier, ''),
+                    "modifier_contact_email": profiles.contact_email(r.last_modifier),
+                    "modifier_name": profiles.nickname(r.last_modifier),
                     "size": r.size,
                     "encrypted": r.encrypted,
-                    "permission": check_permission(r.id, email),
+                    "permission": r.user_perm,
                     "root": '',
                     "head_commit_id": r.head_cmmt_id,
                     "version": r.version,
@@ -547,13 +541,7 @@ class Repos(APIView):
         if filter_by['org'] and request.user.permissions.can_view_org():
             public_repos = list_inner_pub_repos(request)
 
-            # Reduce memcache fetch ops.
-            modifiers_set = set([x.last_modifier for x in public_repos])
-            for e in modifiers_set:
-                if e not in contact_email_dict:
-                    contact_email_dict[e] = email2contact_email(e)
-                if e not in nickname_dict:
-                    nickname_dict[e] = email2nickname(e)
+            profiles.prefetch([x.last_modifier for x in public_repos])
 
             for r in public_repos:
                 repo = {
@@ -564,8 +552,8 @@ class Repos(APIView):
                     "mtime": r.last_modified,
                     "mtime_relative": translate_seahub_time(r.last_modified),
                     "modifier_email": r.last_modifier,
-                    "modifier_contact_email": contact_email_dict.get(r.last_modifier, ''),
-                    "modifier_name": nickname_dict.get(r.last_modifier, ''),
+                    "modifier_contact_email": profiles.contact_email(r.last_modifier),
+                    "modifier_name": profiles.nickname(r.last_modifier),
                     "size": r.size,
                     "size_formatted": filesizeformat(r.size),
                     "encrypted": r.encrypted,
@@ -578,8 +566,11 @@ class Repos(APIView):
                 }
                 repos_json.append(repo)
 
-        response = HttpResponse(json.dumps(repos_json), status=200,
-                                content_type=json_content_type)
+        if is_streaming_request(request):
+            response = streaming_json_response(repos_json)
+        else:
+            response = HttpResponse(json.dumps(repos_json), status=200,
+                                    content_type=json_content_type)
         response["enable_encrypted_library"] = config.ENABLE_ENCRYPTED_LIBRARY
         return response
 
@@ -1491,58 +1482,203 @@ class UpdateBlksLinkView(APIView):
         url = gen_file_upload_url(token, 'update-blks-api')
         return Response(url)
 
-def get_dir_recursively(username, repo_id, path, all_dirs):
-    path_id = seafile_api.get_dir_id_by_path(repo_id, path)
-    dirs = seafserv_threaded_rpc.list_dir_with_perm(repo_id, path,
-            path_id, username, -1, -1)
+_dir_walk_pool = None
+_dir_walk_pool_lock = threading.Lock()
+
+def _get_dir_walk_pool():
+    # Create the pool lazily, so that it is not shared by forked workers.
+    global _dir_walk_pool
+    with _dir_walk_pool_lock:
+        if _dir_walk_pool is None:
+            _dir_walk_pool = ThreadPool(RECURSIVE_DIR_LIST_WORKERS)
+    return _dir_walk_pool
+
+def get_dir_recursively(username, repo_id, path, dir_id=None,
+                        max_entries=RECURSIVE_DIR_LIST_MAX_ENTRIES,
+                        max_depth=RECURSIVE_DIR_LIST_MAX_DEPTH):
+    """ Get all sub dirs of a dir, return a ``(dirs, truncated)`` tuple.
+
+    Dirs are walked level by level. Id of a sub dir is taken from the dirent
+    of its parent, and dirs in a level are listed in parallel, in batches of
+    ``RECURSIVE_DIR_LIST_WORKERS`` on a thread pool shared by all requests
+    of the process. Walking stops once ``max_entries`` dirs are collected or
+    ``max_depth`` levels are listed. ``truncated`` is True if some dirs are
+    left out, that is, if a dir at the depth limit has sub dirs.
+    """
+    if dir_id is None:
+        dir_id = seafile_api.get_dir_id_by_path(repo_id, path)
+
+    def list_dir(item):
+        dir_path, obj_id = item
+        return seafserv_threaded_rpc.list_dir_with_perm(repo_id, dir_path,
+                obj_id, username, -1, -1)
+
+    def has_sub_dirs(items):
+        for i in range(0, len(items), RECURSIVE_DIR_LIST_WORKERS):
+            batch = items[i:i + RECURSIVE_DIR_LIST_WORKERS]
+            for dirs in pool.map(list_dir, batch):
+                if any([stat.S_ISDIR(d.mode) for d in dirs or []]):
+                    return True
+        return False
+
+    pool = _get_dir_walk_pool()
+    all_dirs = []
+    level = [(path, dir_id)]
+    depth = 0
+    while level:
+        if depth >= max_depth:
+            return all_dirs, has_sub_dirs(level)
+
+        next_level = []
+        for i in range(0, len(level), RECURSIVE_DIR_LIST_WORKERS):
+            batch = level[i:i + RECURSIVE_DIR_LIST_WORKERS]
+            for (parent_dir, _), dirs in zip(batch, pool.map(list_dir, batch)):
+                for dirent in dirs or []:
+                    if not stat.S_ISDIR(dirent.mode):
+                        continue
 
-    for dirent in dirs:
-        if stat.S_ISDIR(dirent.mode):
-            entry = {}
-            entry["type"] = 'dir'
-            entry["parent_dir"] = path
-            entry["id"] = dirent.obj_id
-            entry["name"] = dirent.obj_name
-            entry["mtime"] = dirent.mtime
-            entry["permission"] = dirent.permission
-            all_dirs.append(entry)
+                    if len(all_dirs) >= max_entries:
+                        return all_dirs, True
+
+                    entry = {}
+                    entry["type"] = 'dir'
+                    entry["parent_dir"] = parent_dir
+                    entry["id"] = dirent.obj_id
+                    entry["name"] = dirent.obj_name
+                    entry["mtime"] = dirent.mtime
+                    entry["permission"] = dirent.permission
+                    all_dirs.append(entry)
+
+                    sub_path = posixpath.join(parent_dir, dirent.obj_name)
+                    next_level.append((sub_path, dirent.obj_id))
 
-            sub_path = posixpath.join(path, dirent.obj_name)
-            get_dir_recursively(username, repo_id, sub_path, all_dirs)
+        level = next_level
+        depth += 1
 
-    return all_dirs
+    return all_dirs, False
 
-def get_dir_entrys_by_id(request, repo, path, dir_id, request_type=None):
+def get_dirents_extra_info(username, repo_id, path, dirents, includes):
+    """Get comment counts, starred flags and tags of ``dirents`` in dir
+    ``path``, with one query for each kind of info in ``includes``.
+
+    Return a ``(comment_counts, starred_names, tags)`` tuple, keyed by file
+    name, except ``tags`` which is keyed by ``(name, is_dir)``.
+    """
+    comment_counts, starred_names, tags = {}, set(), {}
+    file_names = [x.obj_name for x in dirents if not stat.S_ISDIR(x.mode)]
+
+    if 'comments' in includes and file_names:
+        counts = FileComment.objects.get_by_parent_path(repo_id, path).values(
+            'item_name').annotate(total=Count('item_name'))
+        comment_counts = dict([(x['item_name'], x['total']) for x in counts])
+
+    if 'stars' in includes and file_names:
+        paths = [posixpath.join(path, x) for x in file_names]
+        starred_names = set([posixpath.basename(x) for x in
+                             get_starred_paths(username, repo_id, paths)])
+
+    if 'tags' in includes and dirents:
+        for filetag in FileTag.objects.get_file_tags_by_parent_path(repo_id, path):
+            key = (filetag.uuid.filename, filetag.uuid.is_dir)
+            tags.setdefault(key, []).append(filetag.to_dict())
+
+    return comment_counts, starred_names, tags
+
+def get_dir_entrys_by_id(request, repo, path, dir_id, request_type=None,
+                         offset=0, limit=-1, cursor=None, includes=()):
     """ Get dirents in a dir
 
     if request_type is 'f', only return file list,
     if request_type is 'd', only return dir list,
     else, return both.
+
+    Dirents are sorted with dirs first, then by name. Return the ones
+    starting at ``offset``, or right after ``cursor`` (a decoded
+    ``(dir_id, sort_key)`` tuple) if given, at most ``limit`` of them. The
+    cursor for next page is set to ``next_cursor`` header, and
+    ``dir_changed`` header tells whether the dir has been modified since
+    the cursor was generated.
+
+    Comment counts, starred flags and tags of the returned dirents are
+    attached to entries if asked in ``includes``.
+
+    If client asks for streaming (``stream=true``), entries are serialized
+    one by one while the response is being sent.
     """
     username = request.user.username
-    try:
-        dirs = seafserv_threaded_rpc.list_dir_with_perm(repo.id, path, dir_id,
-                username, -1, -1)
-        dirs = dirs if dirs else []
-    except SearpcError, e:
-        logger.error(e)
-        return api_error(HTTP_520_OPERATION_FAILED,
-                         "Failed to list dir.")
+    dir_perm = seafile_api.check_permission_by_path(repo.id, path, username)
+    pro_version = is_pro_version()
+
+    # Without folder permission, permission of every dirent is the same as
+    # the permission of the dir, so listings can be shared by users having
+    # the same permission. With folder permission, permissions of dirents
+    # depend on the path and can be changed at any time, so listings are
+    # not cached.
+    use_cache = not ENABLE_FOLDER_PERM
+    lock_version = get_lock_version(repo.id) if pro_version else 0
+
+    dirs = None
+    if use_cache:
+        dirs = get_cached_dirents(repo.id, dir_id, dir_perm, lock_version)
+    if dirs is None:
+        try:
+            dirs = seafserv_threaded_rpc.list_dir_with_perm(repo.id, path, dir_id,
+                    username, -1, -1)
+            dirs = dirs if dirs else []
+        except SearpcError, e:
+            logger.error(e)
+            return api_error(HTTP_520_OPERATION_FAILED,
+                             "Failed to list dir.")
+        if use_cache:
+            set_cached_dirents(repo.id, dir_id, dir_perm, dirs, lock_version,
+                               with_locks=pro_version)
 
     dir_list, file_list = [], []
     for dirent in dirs:
+        if stat.S_ISDIR(dirent.mode):
+            if request_type != 'f':
+                dir_list.append(dirent)
+        else:
+            if request_type != 'd':
+                file_list.append(dirent)
+
+    dir_list.sort(key=dirent_sort_key)
+    file_list.sort(key=dirent_sort_key)
+    dirents = dir_list + file_list
+
+    dir_changed = False
+    if cursor is not None:
+        cursor_dir_id, cursor_key = cursor
+        dir_changed = cursor_dir_id != dir_id
+        offset = bisect.bisect_right(map(dirent_sort_key, dirents), cursor_key)
+    end = offset + limit if limit >= 0 else len(dirents)
+    next_cursor = ''
+    if 0 < end < len(dirents):
+        next_cursor = encode_dir_cursor(dir_id, dirent_sort_key(dirents[end - 1]))
+    dirents = dirents[offset:end]
+
+    # Resolve nicknames and contact emails in batch.
+    profiles = get_profile_resolver(request)
+    profiles.prefetch([x.modifier for x in dirents
+                       if not stat.S_ISDIR(x.mode)])
+    comment_counts, starred_names, tags = get_dirents_extra_info(
+        username, repo.id, path, dirents, includes)
+
+    def to_entry(dirent):
         entry = {}
         if stat.S_ISDIR(dirent.mode):
             dtype = "dir"
         else:
             dtype = "file"
             entry['modifier_email'] = dirent.modifier
+            entry['modifier_contact_email'] = profiles.contact_email(dirent.modifier)
+            entry['modifier_name'] = profiles.nickname(dirent.modifier)
             if repo.version == 0:
                 entry["size"] = get_file_size(repo.store_id, repo.version,
                                               dirent.obj_id)
             else:
                 entry["size"] = dirent.size
-            if is_pro_version():
+            if pro_version:
                 entry["is_locked"] = dirent.is_locked
                 entry["lock_owner"] = dirent.lock_owner
                 entry["lock_time"] = dirent.lock_time
@@ -1550,45 +1686,31 @@ def get_dir_entrys_by_id(request, repo, path, dir_id, request_type=None):
                     entry["locked_by_me"] = True
                 else:
                     entry["locked_by_me"] = False
+            if 'comments' in includes:
+                entry["comment_count"] = comment_counts.get(dirent.obj_name, 0)
+            if 'stars' in includes:
+                entry["starred"] = dirent.obj_name in starred_names
 
+        if 'tags' in includes:
+            entry["tags"] = tags.get((dirent.obj_name, dtype == "dir"), [])
         entry["type"] = dtype
         entry["name"] = dirent.obj_name
         entry["id"] = dirent.obj_id
         entry["mtime"] = dirent.mtime
         entry["permission"] = dirent.permission
-        if dtype == 'dir':
-            dir_list.append(entry)
-        else:
-            file_list.append(entry)
-
-    # Use dict to reduce memcache fetch cost in large for-loop.
-    contact_email_dict = {}
-    nickname_dict = {}
-    modifiers_set = set([x['modifier_email'] for x in file_list])
-    for e in modifiers_set:
-        if e not in contact_email_dict:
-            contact_email_dict[e] = email2contact_email(e)
-        if e not in nickname_dict:
-            nickname_dict[e] = email2nickname(e)
-
-    for e in file_list:
-        e['modifier_contact_email'] = contact_email_dict.get(e['modifier_email'], '')
-        e['modifier_name'] = nickname_dict.get(e['modifier_email'], '')
-
-    dir_list.sort(lambda x, y: cmp(x['name'].lower(), y['name'].lower()))
-    file_list.sort(lambda x, y: cmp(x['name'].lower(), y['name'].lower()))
-
-    if request_type == 'f':
-        dentrys = file_list
-    elif request_type == 'd':
-        dentrys = dir_list
-    else:
-        dentrys = dir_list + file_list
+        return entry
 
-    response = HttpResponse(json.dumps(dentrys), status=200,
-                            content_type=json_content_type)
+    dentrys = itertools.imap(to_entry, dirents)
+    if is_streaming_request(request):
+        response = streaming_json_response(dentrys)
+    else:
+        response = HttpResponse(json.dumps(list(dentrys)), status=200,
+                                content_type=json_content_type)
     response["oid"] = dir_id
-    response["dir_perm"] = seafile_api.check_permission_by_path(repo.id, path, username)
+    if cursor is not None or offset > 0 or limit >= 0:
+        response["next_cursor"] = next_cursor
+        response["dir_changed"] = 'true' if dir_changed else 'false'
+    response["dir_perm"] = dir_perm
     return response
 
 def get_shared_link(request, repo_id, path):
@@ -1933,11 +2055,33 @@ class StarredFileView(APIView):
     throttle_classes = (UserRateThrottle, )
 
     def get(self, request, format=None):
-        # list starred files
+        # list starred files, optionally page by page with `page`/`per_page`,
+        # `page_next` header tells whether there are more pages
+        page = request.GET.get('page', None)
+        try:
+            current_page = int(page) if page else 1
+            per_page = int(request.GET.get('per_page', '25')) if page else -1
+        except ValueError:
+            return api_error(status.HTTP_400_BAD_REQUEST,
+                             'page or per_page invalid.')
+
+        if current_page < 1 or per_page == 0 or per_page < -1:
+            return api_error(status.HTTP_400_BAD_REQUEST,
+                             'page or per_page invalid.')
+
         personal_files = UserStarredFiles.objects.get_starred_files_by_username(
             request.user.username)
+        page_next = False
+        if per_page > 0:
+            start = per_page * (current_page - 1)
+            page_next = len(personal_files) > start + per_page
+            personal_files = personal_files[start:start + per_page]
+
         starred_files = prepare_starred_files(personal_files)
-        return Response(starred_files)
+        resp = Response(starred_files)
+        if page:
+            resp['page_next'] = 'true' if page_next else 'false'
+        return resp
 
     def post(self, request, format=None):
         # add starred file
@@ -2372,6 +2516,7 @@ class FileView(APIView):
             expire = request.data.get('expire', FILE_LOCK_EXPIRATION_DAYS)
             try:
                 seafile_api.lock_file(repo_id, path.lstrip('/'), username, expire)
+                bump_lock_version(repo_id)
                 return Response('success', status=status.HTTP_200_OK)
             except SearpcError, e:
                 logger.error(e)
@@ -2387,6 +2532,7 @@ class FileView(APIView):
             # unlock file
             try:
                 seafile_api.unlock_file(repo_id, path.lstrip('/'))
+                bump_lock_version(repo_id)
                 return Response('success', status=status.HTTP_200_OK)
             except SearpcError, e:
                 logger.error(e)
@@ -2744,16 +2890,27 @@ class DirView(APIView):
 
                 if recursive == '1':
                     username = request.user.username
-                    dir_list = get_dir_recursively(username, repo_id, path, [])
-                    dir_list.sort(lambda x, y: cmp(x['name'].lower(), y['name'].lower()))
-                    response = HttpResponse(json.dumps(dir_list), status=200,
-                                            content_type=json_content_type)
+                    dir_list, truncated = get_dir_recursively(username,
+                            repo_id, path, dir_id)
+                    dir_list.sort(key=lambda x: x['name'].lower())
+                    if is_streaming_request(request):
+                        response = streaming_json_response(dir_list)
+                    else:
+                        response = HttpResponse(json.dumps(dir_list), status=200,
+                                                content_type=json_content_type)
                     response["oid"] = dir_id
+                    response["truncated"] = 'true' if truncated else 'false'
                     response["dir_perm"] = seafile_api.check_permission_by_path(repo_id, path, username)
 
                     return response
 
-            return get_dir_entrys_by_id(request, repo, path, dir_id, request_type)
+            includes = parse_dirent_includes(request.GET.get('include', ''))
+            if includes is None:
+                return api_error(status.HTTP_400_BAD_REQUEST,
+                        "'include' should be a comma separated list of 'comments', 'stars' or 'tags'.")
+
+            return get_dir_entrys_by_id(request, repo, path, dir_id,
+                    request_type, includes=includes)
 
     def post(self, request, repo_id, format=None):
         # new dir
@@ -3318,8 +3475,8 @@ class SharedDirView(APIView):
             else:
                 file_list.append(entry)
 
-        dir_list.sort(lambda x, y: cmp(x['name'].lower(), y['name'].lower()))
-        file_list.sort(lambda x, y: cmp(x['name'].lower(), y['name'].lower()))
+        dir_list.sort(key=lambda x: x['name'].lower())
+        file_list.sort(key=lambda x: x['name'].lower())
         dentrys = dir_list + file_list
 
         content_type = 'application/json; charset=utf-8'
@@ -3941,19 +4098,13 @@ class GroupRepos(APIView):
         else:
             repos = seafile_api.get_repos_by_group(group.id)
 
-        repos.sort(lambda x, y: cmp(y.last_modified, x.last_modified))
+        repos.sort(key=lambda x: x.last_modified, reverse=True)
         group.is_staff = is_group_staff(group, request.user)
 
-        # Use dict to reduce memcache fetch cost in large for-loop.
-        contact_email_dict = {}
-        nickname_dict = {}
-        owner_set = set([x.user for x in repos])
-        modifiers_set = set([x.modifier for x in repos])
-        for e in owner_set | modifiers_set:
-            if e not in contact_email_dict:
-                contact_email_dict[e] = email2contact_email(e)
-            if e not in nickname_dict:
-                nickname_dict[e] = email2nickname(e)
+        # Resolve nicknames and contact emails in batch.
+        profiles = get_profile_resolver(request)
+        profiles.prefetch([x.user for x in repos] +
+                          [x.last_modifier for x in repos])
 
         repos_json = []
         for r in repos:
@@ -3968,11 +4119,11 @@ class GroupRepos(APIView):
                 "encrypted": r.encrypted,
                 "permission": r.permission,
                 "owner": r.user,
-                "owner_nickname": nickname_dict.get(r.user, ''),
+                "owner_nickname": profiles.nickname(r.user),
                 "share_from_me": True if username == r.user else False,
                 "modifier_email": r.last_modifier,
-                "modifier_contact_email": contact_email_dict.get(r.last_modifier, ''),
-                "modifier_name": nickname_dict.get(r.last_modifier, ''),
+                "modifier_contact_email": profiles.contact_email(r.last_modifier),
+                "modifier_name": profiles.nickname(r.last_modifier),
             }
             repos_json.append(repo)
 
@@ -4177,8 +4328,8 @@ class ThumbnailView(APIView):
 
         success, status_code = generate_thumbnail(request, repo_id, size, path)
         if success:
-            thumbnail_dir = os.path.join(THUMBNAIL_ROOT, str(size))
-            thumbnail_file = os.path.join(thumbnail_dir, obj_id)
+            thumbnail_file = get_thumbnail_file(obj_id, size)
+            touch_thumbnail(thumbnail_file)
             try:
                 with open(thumbnail_file, 'rb') as f:
                     thumbnail = f.read()
@@ -4187,6 +4338,9 @@ class ThumbnailView(APIView):
                 logger.error(e)
                 return api_error(status.HTTP_500_INTERNAL_SERVER_ERROR, 'Failed to get thumbnail.')
         else:
+            if status_code == 202:
+                return api_error(status.HTTP_202_ACCEPTED,
+                                 'Thumbnail is being generated, please try again later.')
             if status_code == 400:
                 return api_error(status.HTTP_400_BAD_REQUEST, "Invalid argument")
             if status_code == 403:
@@ -4273,6 +4427,7 @@ class OrganizationView(APIView):
         try:
             User.objects.create_user(username, password, is_staff=False, is_active=True)
             create_org(org_name, prefix, username)
+            invalidate_user_org(username)
 
             new_org = ccnet_threaded_rpc.get_org_by_url_prefix(prefix)
 
@@ -4316,6 +4471,8 @@ class RepoDownloadSharedLinks(APIView):
 
         shared_links = []
         fileshares = FileShare.objects.filter(repo_id=repo_id)
+        profiles = get_profile_resolver(request)
+        profiles.prefetch([x.username for x in fileshares])
         for fs in fileshares:
             size = None
             shared_link = {}
@@ -4335,7 +4492,7 @@ class RepoDownloadSharedLinks(APIView):
                     continue
 
             shared_link['create_by'] = fs.username
-            shared_link['creator_name'] = email2nickname(fs.username)
+            shared_link['creator_name'] = profiles.nickname(fs.username)
             shared_link['create_time'] = datetime_to_isoformat_timestr(fs.ctime)
             shared_link['token'] = fs.token
             shared_link['path'] = path
@@ -4409,6 +4566,8 @@ class RepoUploadSharedLinks(APIView):
 
         shared_links = []
         fileshares = UploadLinkShare.objects.filter(repo_id=repo_id)
+        profiles = get_profile_resolver(request)
+        profiles.prefetch([x.username for x in fileshares])
         for fs in fileshares:
             shared_link = {}
             path = fs.path
@@ -4419,7 +4578,7 @@ class RepoUploadSharedLinks(APIView):
                 continue
 
             shared_link['create_by'] = fs.username
-            shared_link['creator_name'] = email2nickname(fs.username)
+            shared_link['creator_name'] = profiles.nickname(fs.username)
             shared_link['create_time'] = datetime_to_isoformat_timestr(fs.ctime)
             shared_link['token'] = fs.token
             shared_link['path'] = path
@@ -13,8 +13,7 @@ from seahub.avatar.settings import (AVATAR_MAX_AVATARS_PER_USER, AVATAR_MAX_SIZE
 
 
 def avatar_img(avatar, size):
-    if not avatar.thumbnail_exists(size):
-        avatar.create_thumbnail(size)
+    avatar.ensure_thumbnail(size)
     return mark_safe("""<img src="%s" alt="%s" width="%s" height="%s" />""" % 
         (avatar.avatar_url(size), unicode(avatar), size, size))
 
@@ -10,6 +10,6 @@ class Command(NoArgsCommand):
     
     def handle_noargs(self, **options):
         for avatar in Avatar.objects.all():
-            for size in AUTO_GENERATE_AVATAR_SIZES:
-                print "Rebuilding Avatar id=%s at size %s." % (avatar.id, size)
-                avatar.create_thumbnail(size)
+            print "Rebuilding Avatar id=%s at sizes %s." % (
+                avatar.id, ', '.join(map(str, AUTO_GENERATE_AVATAR_SIZES)))
+            avatar.create_thumbnails(AUTO_GENERATE_AVATAR_SIZES)
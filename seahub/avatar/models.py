@@ -6,7 +6,7 @@ import os
 
 from seahub.base.fields import LowerCaseCharField
 
-from django.db import models
+from django.db import models, transaction
 from django.core.files.base import ContentFile
 from django.utils.translation import ugettext as _
 from django.utils.encoding import smart_str
@@ -24,7 +24,8 @@ try:
 except ImportError:
     import Image
 
-from seahub.avatar.util import invalidate_cache, get_avatar_file_storage
+from seahub.avatar.util import invalidate_cache, invalidate_group_cache, \
+    get_avatar_file_storage, mark_thumbnail_pending
 from seahub.avatar.settings import (AVATAR_STORAGE_DIR, AVATAR_RESIZE_METHOD,
                              AVATAR_MAX_AVATARS_PER_USER, AVATAR_THUMB_FORMAT,
                              AVATAR_HASH_USERDIRNAMES, AVATAR_HASH_FILENAMES,
@@ -80,37 +81,77 @@ class AvatarBase(object):
     """
     def thumbnail_exists(self, size):
         return self.avatar.storage.exists(self.avatar_name(size))
-    
-    def create_thumbnail(self, size, quality=None):
-        # invalidate the cache of the thumbnail with the given size first
+
+    def ensure_thumbnail(self, size):
+        """Make sure the thumbnail of ``size`` is available.
+
+        A missing thumbnail is generated in background, and the original
+        image is served for ``size`` by this instance until then.
+        """
+        if self.thumbnail_exists(size):
+            return
+
+        from seahub.avatar.thumbnail_queue import queue_thumbnail
+        queue_thumbnail(self, size)
+        mark_thumbnail_pending()
+        if not hasattr(self, 'pending_thumbnail_sizes'):
+            self.pending_thumbnail_sizes = set()
+        self.pending_thumbnail_sizes.add(size)
+
+    def invalidate_thumbnail_cache(self, sizes):
         if isinstance(self, Avatar):
-            invalidate_cache(self.emailuser, size)
-            
+            invalidate_cache(self.emailuser, sizes=sizes)
+        else:
+            invalidate_group_cache(self.group_id, sizes=sizes)
+
+    def create_thumbnail(self, size, quality=None):
+        self.create_thumbnails([size], quality)
+
+    def create_thumbnails(self, sizes, quality=None):
+        """Create thumbnails of all ``sizes``.
+
+        The original is read and decoded once, and cropped to a square
+        master. Thumbnails are resized from largest to smallest, each from
+        the previous one, and saved in one transaction.
+        """
         try:
             orig = self.avatar.storage.open(self.avatar.name, 'rb').read()
             image = Image.open(StringIO(orig))
+            image.load()
         except IOError:
             return # What should we do here?  Render a "sorry, didn't work" img?
         quality = quality or AVATAR_THUMB_QUALITY
         (w, h) = image.size
-        if w != size or h != size:
-            if w > h:
-                diff = (w - h) / 2
-                image = image.crop((diff, 0, w - diff, h))
-            else:
-                diff = (h - w) / 2
-                image = image.crop((0, diff, w, h - diff))
-            if image.mode != "RGBA":
-                image = image.convert("RGBA")
-            image = image.resize((size, size), AVATAR_RESIZE_METHOD)
-            thumb = StringIO()
-            image.save(thumb, AVATAR_THUMB_FORMAT, quality=quality)
-            thumb_file = ContentFile(thumb.getvalue())
+        if w > h:
+            diff = (w - h) / 2
+            master = image.crop((diff, 0, w - diff, h))
         else:
-            thumb_file = ContentFile(orig)
-        thumb = self.avatar.storage.save(self.avatar_name(size), thumb_file)
+            diff = (h - w) / 2
+            master = image.crop((0, diff, w, h - diff))
+        if master.mode != "RGBA":
+            master = master.convert("RGBA")
+
+        thumb_files = []
+        for size in sorted(set(sizes), reverse=True):
+            if w == size and h == size:
+                thumb_files.append((size, ContentFile(orig)))
+                continue
+
+            master = master.resize((size, size), AVATAR_RESIZE_METHOD)
+            thumb = StringIO()
+            master.save(thumb, AVATAR_THUMB_FORMAT, quality=quality)
+            thumb_files.append((size, ContentFile(thumb.getvalue())))
+
+        with transaction.atomic():
+            for size, thumb_file in thumb_files:
+                self.avatar.storage.save(self.avatar_name(size), thumb_file)
+
+        # invalidate after saving, so urls cached from now on are thumbnails
+        self.invalidate_thumbnail_cache(sizes)
 
     def avatar_url(self, size):
+        if size in getattr(self, 'pending_thumbnail_sizes', ()):
+            return self.avatar.url
         return self.avatar.storage.url(self.avatar_name(size))
 
     @abstractmethod    
@@ -170,8 +211,7 @@ class GroupAvatar(models.Model, AvatarBase):
 
 def create_default_thumbnails(instance=None, created=False, **kwargs):
     if created:
-        for size in AUTO_GENERATE_AVATAR_SIZES:
-            instance.create_thumbnail(size)
+        instance.create_thumbnails(AUTO_GENERATE_AVATAR_SIZES)
 
 signals.post_save.connect(create_default_thumbnails, sender=Avatar, dispatch_uid="create_default_thumbnails")
 
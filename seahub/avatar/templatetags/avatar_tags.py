@@ -86,7 +86,6 @@ def primary_avatar(user, size=AVATAR_DEFAULT_SIZE):
 @cache_result
 @register.simple_tag
 def render_avatar(avatar, size=AVATAR_DEFAULT_SIZE):
-    if not avatar.thumbnail_exists(size):
-        avatar.create_thumbnail(size)
+    avatar.ensure_thumbnail(size)
     return """<img src="%s" width="%s" height="%s" />""" % (
         avatar.avatar_url(size), size, size)
@@ -37,8 +37,7 @@ def api_grp_avatar_url(group_id, size=GROUP_AVATAR_DEFAULT_SIZE):
         avatar = None
 
     if avatar:
-        if not avatar.thumbnail_exists(size):
-            avatar.create_thumbnail(size)
+        avatar.ensure_thumbnail(size)
         return avatar.avatar_url(size), False, avatar.date_uploaded
     else:
         return get_default_group_avatar_url(), True, None
@@ -61,8 +60,7 @@ def grp_avatar(group_id, size=GROUP_AVATAR_DEFAULT_SIZE):
 
     if avatar:
         try:
-            if not avatar.thumbnail_exists(size):
-                avatar.create_thumbnail(size)
+            avatar.ensure_thumbnail(size)
             url = avatar.avatar_url(size)
         except Exception as e:
             # Catch exceptions to avoid 500 errors.
@@ -72,5 +70,7 @@ def grp_avatar(group_id, size=GROUP_AVATAR_DEFAULT_SIZE):
         url = get_default_group_avatar_url()
 
     img = """<img src="%s" alt="" width="%s" height="%s" class="avatar" />""" % (url, size, size)
-    cache.set(key, img, AVATAR_CACHE_TIMEOUT)
+    # do not cache the original image url served until thumbnail is ready
+    if not getattr(avatar, 'pending_thumbnail_sizes', None):
+        cache.set(key, img, AVATAR_CACHE_TIMEOUT)
     return img
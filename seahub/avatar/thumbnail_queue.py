@@ -0,0 +1,55 @@
+# Copyright (c) 2012-2016 Seafile Ltd.
+"""
+Background generation of avatar thumbnails missed when rendering pages.
+
+Each missing ``(avatar, size)`` is queued once per process, and generated by
+a local thread pool.
+"""
+import logging
+import threading
+from multiprocessing.pool import ThreadPool
+
+from django.db import connection
+
+from seahub.avatar.settings import AVATAR_THUMBNAIL_WORKERS
+
+logger = logging.getLogger(__name__)
+
+_thumbnail_pool = None
+_thumbnail_pool_lock = threading.Lock()
+
+_pending = set()
+_pending_lock = threading.Lock()
+
+def _get_thumbnail_pool():
+    # Create the pool lazily, so that it is not shared by forked workers.
+    global _thumbnail_pool
+    with _thumbnail_pool_lock:
+        if _thumbnail_pool is None:
+            _thumbnail_pool = ThreadPool(AVATAR_THUMBNAIL_WORKERS)
+    return _thumbnail_pool
+
+def queue_thumbnail(avatar, size):
+    """Generate thumbnail of ``size`` for ``avatar`` in background.
+    """
+    key = (avatar.__class__.__name__, avatar.pk, size)
+    with _pending_lock:
+        if key in _pending:
+            return
+        _pending.add(key)
+
+    _get_thumbnail_pool().apply_async(_create_thumbnail, (key, avatar, size))
+
+def _create_thumbnail(key, avatar, size):
+    try:
+        # may be generated by another process in the meantime
+        if not avatar.thumbnail_exists(size):
+            avatar.create_thumbnail(size)
+    except Exception:
+        logger.exception('Failed to create thumbnail of avatar %s at size %s.'
+                         % (avatar.pk, size))
+    finally:
+        with _pending_lock:
+            _pending.discard(key)
+        # worker threads open their own database connection
+        connection.close()
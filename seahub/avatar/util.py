@@ -1,4 +1,6 @@
 # Copyright (c) 2012-2016 Seafile Ltd.
+import threading
+
 from django.conf import settings
 from django.core.cache import cache
 from django.core.files.storage import default_storage, get_storage_class
@@ -26,42 +28,60 @@ def get_grp_cache_key(group_id, size):
     """
     return 'Group__%s_%s' % (group_id, size)
 
+_pending = threading.local()
+
+def mark_thumbnail_pending():
+    """Tell ``cache_result`` not to cache the result being computed, since it
+    refers to a thumbnail which is not generated yet.
+    """
+    _pending.value = True
+
 def cache_result(func):
     """
     Decorator to cache the result of functions that take a ``user`` and a
     ``size`` value.
     """
-    def cache_set(key, value):
-        cache.set(key, value, AVATAR_CACHE_TIMEOUT)
-        return value
-
     def cached_func(user, size):
         prefix = func.__name__
         cached_funcs.add(prefix)
         key = get_cache_key(user, size, prefix=prefix)
-        return cache.get(key) or cache_set(key, func(user, size))
+        value = cache.get(key)
+        if value:
+            return value
+
+        outer_pending = getattr(_pending, 'value', False)
+        _pending.value = False
+        try:
+            value = func(user, size)
+            pending = _pending.value
+        finally:
+            # results of callers using this result are not cached either
+            _pending.value = outer_pending or _pending.value
+
+        if not pending:
+            cache.set(key, value, AVATAR_CACHE_TIMEOUT)
+        return value
     return cached_func
 
-def invalidate_cache(user, size=None):
+def invalidate_cache(user, size=None, sizes=()):
     """
     Function to be called when saving or changing an user's avatars.
     """
-    sizes = set(AUTO_GENERATE_AVATAR_SIZES)
+    all_sizes = set(AUTO_GENERATE_AVATAR_SIZES) | set(sizes)
     if size is not None:
-        sizes.add(size)
-    for prefix in cached_funcs:
-        for size in sizes:
-            cache.delete(get_cache_key(user, size, prefix))
+        all_sizes.add(size)
+    cache.delete_many([get_cache_key(user, size, prefix)
+                       for prefix in cached_funcs for size in all_sizes])
 
-def invalidate_group_cache(group_id, size=None):
+def invalidate_group_cache(group_id, size=None, sizes=()):
     """
     Function to be called when saving or changing an user's avatars.
     """
-    sizes = set(AUTO_GENERATE_GROUP_AVATAR_SIZES)
+    all_sizes = set(AUTO_GENERATE_GROUP_AVATAR_SIZES) | set(sizes)
     if size is not None:
-        sizes.add(size)
-    for size in sizes:
-        cache.delete(get_grp_cache_key(group_id, size))
+        all_sizes.add(size)
+    cache.delete_many([get_grp_cache_key(group_id, size)
+                       for size in all_sizes])
             
 def get_default_avatar_url():
     base_url = getattr(settings, 'MEDIA_URL', '')
@@ -109,8 +129,7 @@ def get_primary_avatar(user, size=AVATAR_DEFAULT_SIZE):
     except IndexError:
         avatar = None
     if avatar:
-        if not avatar.thumbnail_exists(size):
-            avatar.create_thumbnail(size)
+        avatar.ensure_thumbnail(size)
     return avatar
 
 def get_avatar_file_storage():
@@ -16,6 +16,7 @@ from constance import config
 from registration import signals
 
 from seahub.auth import login
+from seahub.api2.token_cache import invalidate_user_tokens
 from seahub.profile.models import Profile, DetailedProfile
 from seahub.role_permissions.utils import get_enabled_role_permissions_by_role
 from seahub.utils import is_user_password_strong, \
@@ -199,6 +200,8 @@ class User(object):
                                                               self.password,
                                                               int(self.is_staff),
                                                               int(self.is_active))
+            # user may be deactivated or changed, re-check api tokens
+            invalidate_user_tokens(self.username)
         else:
             result_code = ccnet_threaded_rpc.add_emailuser(self.username,
                                                            self.password,
@@ -0,0 +1,348 @@
+# Copyright (c) 2012-2016 Seafile Ltd.
+"""
+Two-tier cache backend for single node deployments.
+
+Values are stored in a SQLite file shared by all seahub processes on the
+node. With ``LOCAL_TIMEOUT`` above 0, recently used ones are also kept in
+process for at most that many seconds, so a process may see a value changed
+or deleted by another process up to ``LOCAL_TIMEOUT`` seconds late. Only
+turn it on if no caller relies on seeing writes of other processes at once
+(locks, one-time codes, version keys), it is off by default.
+
+Expired entries are removed in small batches every ``CULL_INTERVAL`` sets,
+the entries expiring first are removed once there are about more than
+``MAX_ENTRIES`` of them.
+
+A busy SQLite file ("database is locked") makes reads miss instead of
+failing the request. Writes raise the error, since callers rely on them,
+e.g. to bump versions or count requests; culls are skipped.
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'seahub.base.cache.TwoTierCache',
+            'LOCATION': '/tmp/seahub_cache.db',
+            'OPTIONS': {
+                'MAX_ENTRIES': 1000000,
+                'LOCAL_MAX_SIZE': 16 * 1024 * 1024,
+                'LOCAL_TIMEOUT': 0,
+            }
+        }
+    }
+"""
+import os
+import time
+import logging
+import sqlite3
+import threading
+from contextlib import contextmanager
+from functools import wraps
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+from django.core.cache.backends.base import BaseCache, DEFAULT_TIMEOUT
+
+from seahub.utils.dir_list_cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# Seconds to wait for the lock of SQLite file.
+SQLITE_TIMEOUT = 5
+# Keep ``IN`` lookups below the SQLite host parameter limit.
+QUERY_CHUNK_SIZE = 500
+# Number of sets between two culls, and max number of entries removed
+# besides the ones over ``MAX_ENTRIES`` in one cull.
+CULL_INTERVAL = 100
+CULL_BATCH_SIZE = 1000
+# Besides the entries over ``MAX_ENTRIES``, remove at most 1/CULL_FRACTION of
+# ``MAX_ENTRIES`` more, so that the next culls are not right away.
+CULL_FRACTION = 100
+# Number of culls between two exact counts of entries, the count is
+# estimated from sets and removes of this process in between.
+COUNT_INTERVAL = 100
+
+STAT_NAMES = ('local_hits', 'hits', 'misses', 'sets', 'evictions')
+
+def _ignore_db_errors(default=None):
+    """Log SQLite errors, like "database is locked", and return ``default``
+    instead.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            try:
+                return func(*args, **kwargs)
+            except sqlite3.OperationalError as e:
+                logger.warning('Cache %s failed: %s' % (func.__name__, e))
+                return default
+        return wrapper
+    return decorator
+
+class TwoTierCache(BaseCache):
+    def __init__(self, location, params):
+        super(TwoTierCache, self).__init__(params)
+        options = params.get('OPTIONS', {})
+        self._path = location
+        self._local_timeout = int(options.get('LOCAL_TIMEOUT', 0))
+        self._local = LRUCache(int(options.get('LOCAL_MAX_SIZE',
+                                               16 * 1024 * 1024)),
+                               self._local_timeout)
+        self._conns = threading.local()
+        self._stats = dict.fromkeys(STAT_NAMES, 0)
+        self._stats_lock = threading.Lock()
+        # approximate number of entries, None until counted
+        self._entries = None
+        self._culls = 0
+
+    def _count(self, name, n=1):
+        with self._stats_lock:
+            self._stats[name] += n
+
+    def get_stats(self):
+        """Return hits, misses, sets and evictions since process start,
+        ``local_hits`` are the hits served by the in-process tier.
+        """
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['evictions'] += self._local.evictions
+        stats['local_size'] = self._local.size
+        return stats
+
+    def _conn(self):
+        # SQLite connections can not be shared by threads or forked workers
+        conn = getattr(self._conns, 'conn', None)
+        if conn is not None and self._conns.pid == os.getpid():
+            return conn
+
+        parent_dir = os.path.dirname(self._path)
+        if parent_dir and not os.path.isdir(parent_dir):
+            try:
+                os.makedirs(parent_dir)
+            except OSError:
+                # created by another process
+                pass
+
+        conn = sqlite3.connect(self._path, timeout=SQLITE_TIMEOUT,
+                               isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('CREATE TABLE IF NOT EXISTS cache ('
+                     'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)')
+        conn.execute('CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)')
+        self._conns.conn = conn
+        self._conns.pid = os.getpid()
+        self._conns.sets = 0
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    def _is_expired(self, expires, now=None):
+        return expires is not None and expires <= (now or time.time())
+
+    def _set_local(self, key, data, expires):
+        if self._local_timeout <= 0:
+            return
+
+        timeout = self._local_timeout
+        if expires is not None:
+            timeout = min(timeout, expires - time.time())
+        if timeout > 0:
+            self._local.set(key, data, timeout)
+
+    @_ignore_db_errors()
+    def _get_data(self, key):
+        """Return pickled value of a made key, or ``None`` if not cached.
+        """
+        data = self._local.get(key)
+        if data is not None:
+            self._count('local_hits')
+            return data
+
+        row = self._conn().execute(
+            'SELECT value, expires FROM cache WHERE key = ?', (key,)).fetchone()
+        if row is None or self._is_expired(row[1]):
+            self._count('misses')
+            return None
+
+        self._count('hits')
+        data = str(row[0])
+        self._set_local(key, data, row[1])
+        return data
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        data = self._get_data(key)
+        return default if data is None else pickle.loads(data)
+
+    def get_many(self, keys, version=None):
+        made_keys = {}
+        for k in keys:
+            key = self.make_key(k, version=version)
+            self.validate_key(key)
+            made_keys[key] = k
+
+        ret, misses = {}, []
+        for key, k in made_keys.iteritems():
+            data = self._local.get(key)
+            if data is None:
+                misses.append(key)
+            else:
+                ret[k] = pickle.loads(data)
+        self._count('local_hits', len(ret))
+
+        if misses:
+            ret.update(self._get_many_data(misses, made_keys))
+
+        self._count('misses', len(made_keys) - len(ret))
+        return ret
+
+    @_ignore_db_errors(default={})
+    def _get_many_data(self, keys, made_keys):
+        ret = {}
+        now = time.time()
+        conn = self._conn()
+        for i in range(0, len(keys), QUERY_CHUNK_SIZE):
+            chunk = keys[i:i + QUERY_CHUNK_SIZE]
+            rows = conn.execute(
+                'SELECT key, value, expires FROM cache WHERE key IN (%s)' %
+                ','.join(['?'] * len(chunk)), chunk).fetchall()
+            for key, value, expires in rows:
+                if self._is_expired(expires, now):
+                    continue
+                data = str(value)
+                self._set_local(key, data, expires)
+                ret[made_keys[key]] = pickle.loads(data)
+                self._count('hits')
+        return ret
+
+    def has_key(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return self._get_data(key) is not None
+
+    def _store(self, conn, key, value, expires):
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        conn.execute('INSERT OR REPLACE INTO cache (key, value, expires) '
+                     'VALUES (?, ?, ?)', (key, sqlite3.Binary(data), expires))
+        self._set_local(key, data, expires)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self._store(self._conn(), key, value, self.get_backend_timeout(timeout))
+        self._after_set(1)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self.get_backend_timeout(timeout)
+        with self._transaction() as conn:
+            for k, value in data.iteritems():
+                key = self.make_key(k, version=version)
+                self.validate_key(key)
+                self._store(conn, key, value, expires)
+        self._after_set(len(data))
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._transaction() as conn:
+            row = conn.execute('SELECT expires FROM cache WHERE key = ?',
+                               (key,)).fetchone()
+            if row is not None and not self._is_expired(row[0]):
+                return False
+            self._store(conn, key, value, self.get_backend_timeout(timeout))
+        self._after_set(1)
+        return True
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._transaction() as conn:
+            row = conn.execute('SELECT value, expires FROM cache WHERE key = ?',
+                               (key,)).fetchone()
+            if row is None or self._is_expired(row[1]):
+                raise ValueError("Key '%s' not found" % key)
+            value = pickle.loads(str(row[0])) + delta
+            self._store(conn, key, value, row[1])
+        return value
+
+    def delete(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self._conn().execute('DELETE FROM cache WHERE key = ?', (key,))
+        self._local.delete(key)
+
+    def delete_many(self, keys, version=None):
+        keys = [self.make_key(k, version=version) for k in keys]
+        with self._transaction() as conn:
+            for i in range(0, len(keys), QUERY_CHUNK_SIZE):
+                chunk = keys[i:i + QUERY_CHUNK_SIZE]
+                conn.execute('DELETE FROM cache WHERE key IN (%s)' %
+                             ','.join(['?'] * len(chunk)), chunk)
+        for key in keys:
+            self._local.delete(key)
+
+    def clear(self):
+        self._conn().execute('DELETE FROM cache')
+        self._local.clear()
+
+    def _after_set(self, n):
+        with self._stats_lock:
+            self._stats['sets'] += n
+            if self._entries is not None:
+                self._entries += n
+        self._conns.sets += n
+        if self._conns.sets >= CULL_INTERVAL:
+            self._conns.sets = 0
+            self._cull()
+
+    def _count_entries(self, conn):
+        """Return approximate number of entries.
+        """
+        with self._stats_lock:
+            if self._entries is not None and self._culls < COUNT_INTERVAL:
+                self._culls += 1
+                return self._entries
+
+        entries = conn.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        with self._stats_lock:
+            self._entries = entries
+            self._culls = 0
+        return entries
+
+    def _removed(self, n):
+        with self._stats_lock:
+            self._stats['evictions'] += n
+            if self._entries is not None:
+                self._entries = max(self._entries - n, 0)
+
+    @_ignore_db_errors()
+    def _cull(self):
+        """Remove a batch of expired entries, and the entries expiring first
+        if there are more than ``MAX_ENTRIES``.
+        """
+        conn = self._conn()
+        cursor = conn.execute(
+            'DELETE FROM cache WHERE key IN (SELECT key FROM cache '
+            'WHERE expires <= ? ORDER BY expires LIMIT ?)',
+            (time.time(), CULL_BATCH_SIZE))
+        self._removed(max(cursor.rowcount, 0))
+
+        excess = self._count_entries(conn) - self._max_entries
+        if excess > 0:
+            extra = min(self._max_entries // CULL_FRACTION, CULL_BATCH_SIZE)
+            cursor = conn.execute(
+                'DELETE FROM cache WHERE key IN (SELECT key FROM cache '
+                'ORDER BY expires IS NULL, expires LIMIT ?)',
+                (excess + extra,))
+            self._removed(max(cursor.rowcount, 0))
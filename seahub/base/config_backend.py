@@ -0,0 +1,81 @@
+# Copyright (c) 2012-2016 Seafile Ltd.
+"""
+Constance backend keeping a snapshot of all web settings in process.
+
+Settings are read from database all at once, and read again only after the
+version in django cache is bumped, which is done whenever a setting is
+saved. The version is checked at most every
+``CONSTANCE_SNAPSHOT_CHECK_INTERVAL`` seconds, so other processes see a
+saved setting at most that late, plus ``LOCAL_TIMEOUT`` of the default cache
+if its in-process tier is turned on (see seahub/base/cache.py).
+"""
+import time
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+
+from constance import settings as constance_settings
+from constance.backends.database import DatabaseBackend
+
+CONSTANCE_SNAPSHOT_CHECK_INTERVAL = getattr(settings,
+        'CONSTANCE_SNAPSHOT_CHECK_INTERVAL', 1)
+
+CONFIG_VERSION_CACHE_KEY = 'CONSTANCE_CONFIG_VERSION'
+VERSION_CACHE_TIMEOUT = 30 * 24 * 60 * 60
+
+def get_config_version():
+    return cache.get(CONFIG_VERSION_CACHE_KEY, 0)
+
+def bump_config_version():
+    try:
+        cache.incr(CONFIG_VERSION_CACHE_KEY)
+    except ValueError:
+        cache.set(CONFIG_VERSION_CACHE_KEY, 1, VERSION_CACHE_TIMEOUT)
+
+class SnapshotDatabaseBackend(DatabaseBackend):
+    def __init__(self):
+        super(SnapshotDatabaseBackend, self).__init__()
+        self._snapshot = None
+        self._version = None
+        self._checked_at = 0
+        self._lock = threading.Lock()
+
+    def _load(self):
+        # Read version first, so a setting saved while loading triggers
+        # another reload.
+        version = get_config_version()
+        keys = dict([(self.add_prefix(k), k) for k in constance_settings.CONFIG])
+        snapshot = {}
+        for obj in self._model._default_manager.filter(key__in=keys.keys()):
+            snapshot[keys[obj.key]] = obj.value
+        return version, snapshot
+
+    def get_snapshot(self):
+        """Return a dict of all settings saved in database.
+        """
+        now = time.time()
+        if self._snapshot is not None and \
+                now - self._checked_at < CONSTANCE_SNAPSHOT_CHECK_INTERVAL:
+            return self._snapshot
+
+        with self._lock:
+            if self._snapshot is None or get_config_version() != self._version:
+                self._version, self._snapshot = self._load()
+            self._checked_at = now
+        return self._snapshot
+
+    def get(self, key):
+        return self.get_snapshot().get(key)
+
+    def mget(self, keys):
+        snapshot = self.get_snapshot()
+        for key in keys:
+            if key in snapshot:
+                yield key, snapshot[key]
+
+    def set(self, key, value):
+        super(SnapshotDatabaseBackend, self).set(key, value)
+        bump_config_version()
+        # reload on next read in this process
+        self._checked_at = 0
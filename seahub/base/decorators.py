@@ -4,12 +4,13 @@ from django.http import Http404, HttpResponseRedirect, HttpResponseNotAllowed
 from django.shortcuts import render_to_response
 from django.template import RequestContext
 from django.utils.http import urlquote
-from seaserv import get_repo, is_passwd_set
+from seaserv import is_passwd_set
 
 from seahub.options.models import UserOptions, CryptoOptionNotSetError
 
 from seahub.base.sudo_mode import sudo_mode_check
 from seahub.utils import render_error
+from seahub.utils.rpc import request_seafile_api
 from django.utils.translation import ugettext as _
 from seahub.settings import ENABLE_SUDO_MODE
 
@@ -50,7 +51,7 @@ def repo_passwd_set_required(func):
         repo_id = kwargs.get('repo_id', None)
         if not repo_id:
             raise Exception, 'Repo id is not found in url.'
-        repo = get_repo(repo_id)
+        repo = request_seafile_api.get_repo(repo_id)
         if not repo:
             raise Http404
         username = request.user.username
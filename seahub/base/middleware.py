@@ -1,14 +1,18 @@
 # Copyright (c) 2012-2016 Seafile Ltd.
 import re
+import time
+import logging
+import threading
 
+from django.conf import settings
 from django.core.cache import cache
 from django.core.urlresolvers import reverse
 from django.http import HttpResponseRedirect
 
-from seaserv import ccnet_api
-
 from seahub.notifications.models import Notification
 from seahub.notifications.utils import refresh_cache
+from seahub.utils.org_cache import get_user_org
+from seahub.utils.rpc import begin_request_rpc_cache, end_request_rpc_cache
 try:
     from seahub.settings import CLOUD_MODE
 except ImportError:
@@ -19,22 +23,136 @@ except ImportError:
     MULTI_TENANCY = False
 from seahub.settings import SITE_ROOT
 
+# Get an instance of a logger
+logger = logging.getLogger(__name__)
+
+# Add a ``Server-Timing`` header with time spent in each middleware.
+MIDDLEWARE_TIMING_HEADER = getattr(settings, 'MIDDLEWARE_TIMING_HEADER', False)
+
+def get_request_type(request):
+    """Return 'api', 'ajax' or 'page', the type is computed once per
+    request.
+    """
+    request_type = getattr(request, '_request_type', None)
+    if request_type is None:
+        path = request.path
+        if 'api2/' in path or 'api/v2.1/' in path:
+            request_type = 'api'
+        elif request.is_ajax():
+            request_type = 'ajax'
+        else:
+            request_type = 'page'
+        request._request_type = request_type
+    return request_type
+
+_timing_stats = {}
+_timing_stats_lock = threading.Lock()
+
+def get_middleware_stats():
+    """Return a dict of ``(calls, seconds)`` spent in each instrumented
+    middleware since process start.
+    """
+    with _timing_stats_lock:
+        return dict(_timing_stats)
+
+def _record_timing(request, name, elapsed):
+    with _timing_stats_lock:
+        calls, seconds = _timing_stats.get(name, (0, 0))
+        _timing_stats[name] = (calls + 1, seconds + elapsed)
+
+    timings = getattr(request, 'middleware_timings', None)
+    if timings is not None:
+        timings[name] = timings.get(name, 0) + elapsed
+
+def _timed(name, func):
+    def wrapper(self, request, *args, **kwargs):
+        start = time.time()
+        try:
+            return func(self, request, *args, **kwargs)
+        finally:
+            _record_timing(request, name, time.time() - start)
+    wrapper.__name__ = func.__name__
+    wrapper.__doc__ = func.__doc__
+    return wrapper
+
+def instrument_middleware(cls):
+    """Class decorator recording time spent in hooks of a middleware, see
+    ``MiddlewareTimingMiddleware``.
+    """
+    for hook in ('process_request', 'process_view', 'process_response',
+                 'process_exception'):
+        func = cls.__dict__.get(hook)
+        if func is not None:
+            setattr(cls, hook, _timed(cls.__name__, func))
+    return cls
+
+class MiddlewareTimingMiddleware(object):
+    """
+    Middleware that reports time spent in instrumented middlewares placed
+    after it.
+    """
+
+    def process_request(self, request):
+        request.middleware_timings = {}
+        return None
+
+    def process_response(self, request, response):
+        timings = getattr(request, 'middleware_timings', None)
+        if not timings:
+            return response
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('%s middlewares: %s' % (request.path, ', '.join(
+                ['%s %.2fms' % (name, t * 1000) for name, t in
+                 sorted(timings.items())])))
+
+        if MIDDLEWARE_TIMING_HEADER:
+            response['Server-Timing'] = ', '.join(
+                ['%s;dur=%.2f' % (name, t * 1000) for name, t in
+                 sorted(timings.items())])
+
+        return response
+
+@instrument_middleware
+class RPCCacheMiddleware(object):
+    """
+    Middleware that memoizes read only RPCs called during a GET request.
+    """
+
+    def process_request(self, request):
+        # drop results left by a previous request on this thread, whose
+        # process_response was skipped because of an exception
+        end_request_rpc_cache()
+        if request.method in ('GET', 'HEAD'):
+            begin_request_rpc_cache()
+
+        return None
+
+    def process_response(self, request, response):
+        stats = end_request_rpc_cache()
+        if logger.isEnabledFor(logging.DEBUG):
+            for api_name, api_stats in stats.items():
+                for name, (hits, misses) in api_stats.items():
+                    logger.debug('%s %s.%s: %d hits, %d misses' % (
+                        request.path, api_name, name, hits, misses))
+
+        return response
+
+@instrument_middleware
 class BaseMiddleware(object):
     """
     Middleware that add organization, group info to user.
     """
 
     def process_request(self, request):
-        username = request.user.username
         request.user.org = None
 
         if CLOUD_MODE:
             request.cloud_mode = True
 
-            if MULTI_TENANCY:
-                orgs = ccnet_api.get_orgs_by_user(username)
-                if orgs:
-                    request.user.org = orgs[0]
+            # token authenticated api requests get org in authentication
+            if MULTI_TENANCY and request.user.is_authenticated():
+                request.user.org = get_user_org(request.user.username)
         else:
             request.cloud_mode = False
 
@@ -43,6 +161,7 @@ class BaseMiddleware(object):
     def process_response(self, request, response):
         return response
 
+@instrument_middleware
 class InfobarMiddleware(object):
     """Query info bar close status, and store into request."""
 
@@ -53,18 +172,16 @@ class InfobarMiddleware(object):
 
     def process_request(self, request):
 
-        # filter AJAX request out
-        if request.is_ajax():
-            return None
-
-        # filter API request out
-        if "api2/" in request.path or "api/v2.1/" in request.path:
+        # filter AJAX and API request out
+        if get_request_type(request) != 'page':
             return None
 
         topinfo_close = request.COOKIES.get('info_id', '')
 
-        cur_note = cache.get('CUR_TOPINFO') if cache.get('CUR_TOPINFO') else \
-            self.get_from_db()
+        # an empty result is cached too
+        cur_note = cache.get('CUR_TOPINFO')
+        if cur_note is None:
+            cur_note = self.get_from_db()
         if not cur_note:
             request.cur_note = None
         else:
@@ -79,17 +196,15 @@ class InfobarMiddleware(object):
         return response
 
 
+FORCE_PASSWD_CHANGE_BLACK_LIST = re.compile('|'.join([
+    r'^%s$' % SITE_ROOT, r'home/.+', r'repo/.+', r'[f|d]/[a-f][0-9]+',
+    r'group/\d+', r'groups/', r'share/', r'profile/', r'notification/list/',
+]))
+
+@instrument_middleware
 class ForcePasswdChangeMiddleware(object):
     def _request_in_black_list(self, request):
-        path = request.path
-        black_list = (r'^%s$' % SITE_ROOT, r'home/.+', r'repo/.+',
-                      r'[f|d]/[a-f][0-9]+', r'group/\d+', r'groups/',
-                      r'share/', r'profile/', r'notification/list/')
-
-        for patt in black_list:
-            if re.search(patt, path) is not None:
-                return True
-        return False
+        return FORCE_PASSWD_CHANGE_BLACK_LIST.search(request.path) is not None
 
     def process_request(self, request):
         if request.session.get('force_passwd_change', False):
@@ -141,7 +141,12 @@ class StarredFile(object):
 
 class UserStarredFilesManager(models.Manager):
     def get_starred_files_by_username(self, username):
-        """Get a user's starred files.
+        """Get a user's starred files, most recently modified first.
+
+        Starred files are grouped by repo and parent dir, and every parent
+        dir is listed once to find out which of them still exist and their
+        last modification time. Stars of removed repos or files are deleted
+        in bulk.
 
         Arguments:
         - `self`:
@@ -151,57 +156,62 @@ class UserStarredFilesManager(models.Manager):
             email=username, org_id=-1)
 
         ret = []
+        stale_ids = []
         repo_cache = {}
+        parent_dirs = {}
         for sfile in starred_files:
             # repo still exists?
-            if repo_cache.has_key(sfile.repo_id):
-                repo = repo_cache[sfile.repo_id]
-            else:
-                try:
-                    repo = seafile_api.get_repo(sfile.repo_id)
-                except SearpcError:
-                    continue
-                if repo is not None:
-                    repo_cache[sfile.repo_id] = repo
-                else:
-                    sfile.delete()
-                    continue
-
-            # file still exists?
-            file_id = ''
-            size = -1
-            if sfile.path != "/":
+            if sfile.repo_id not in repo_cache:
                 try:
-                    file_id = seafile_api.get_file_id_by_path(sfile.repo_id,
-                                                              sfile.path)
-                    # size = seafile_api.get_file_size(file_id)
-                except SearpcError:
-                    continue
-                if not file_id:
-                    sfile.delete()
-                    continue
+                    repo_cache[sfile.repo_id] = seafile_api.get_repo(sfile.repo_id)
+                except SearpcError as e:
+                    logger.error(e)
+                    repo_cache[sfile.repo_id] = False
 
-            f = StarredFile(sfile.org_id, repo, file_id, sfile.path,
-                            sfile.is_dir, 0) # TODO: remove ``size`` from StarredFile
-            ret.append(f)
+            repo = repo_cache[sfile.repo_id]
+            if repo is False:
+                continue
+            if repo is None:
+                stale_ids.append(sfile.pk)
+                continue
 
-        '''Calculate files last modification time'''
-        for sfile in ret:
-            if sfile.is_dir:
+            if sfile.path == "/":
+                f = StarredFile(sfile.org_id, repo, '', sfile.path,
+                                sfile.is_dir, 0)
+                ret.append(f)
                 continue
 
+            path = sfile.path.rstrip('/')
+            key = (sfile.repo_id, os.path.dirname(path))
+            parent_dirs.setdefault(key, []).append((os.path.basename(path), sfile))
+
+        for (repo_id, parent_dir), sfiles in parent_dirs.iteritems():
+            repo = repo_cache[repo_id]
             try:
-                # get real path for sub repo
-                real_path = sfile.repo.origin_path + sfile.path if sfile.repo.origin_path else sfile.path
-                dirent = seafile_api.get_dirent_by_path(sfile.repo.store_id,
-                                                        real_path)
-                if dirent:
-                    sfile.last_modified = dirent.mtime
-                else:
-                    sfile.last_modified = 0
+                dir_id = seafile_api.get_dir_id_by_path(repo_id, parent_dir)
+                dirents = seafile_api.list_dir_by_dir_id(repo_id, dir_id) \
+                    if dir_id else []
             except SearpcError as e:
                 logger.error(e)
-                sfile.last_modified = 0
+                continue
+
+            dirents = dict([(d.obj_name, d) for d in dirents or []])
+            for name, sfile in sfiles:
+                # file still exists?
+                dirent = dirents.get(name)
+                if dirent is None:
+                    stale_ids.append(sfile.pk)
+                    continue
+
+                f = StarredFile(sfile.org_id, repo, dirent.obj_id, sfile.path,
+                                sfile.is_dir, getattr(dirent, 'size', 0))
+                if not sfile.is_dir:
+                    f.last_modified = dirent.mtime
+                ret.append(f)
+
+        for i in range(0, len(stale_ids), 500):
+            super(UserStarredFilesManager, self).filter(
+                pk__in=stale_ids[i:i + 500]).delete()
 
         ret.sort(lambda x, y: cmp(y.last_modified, x.last_modified))
 
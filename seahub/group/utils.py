@@ -7,8 +7,7 @@ import seaserv
 from seaserv import ccnet_api
 
 from seahub.utils import is_org_context
-from seahub.profile.models import Profile
-from seahub.base.templatetags.seahub_tags import email2nickname
+from seahub.profile.utils import get_profile_resolver
 from seahub.avatar.settings import AVATAR_DEFAULT_SIZE
 from seahub.avatar.templatetags.avatar_tags import api_avatar_url, \
     get_default_avatar_url
@@ -74,12 +73,6 @@ def is_group_admin_or_owner(group_id, email):
         return False
 
 def get_group_member_info(request, group_id, email, avatar_size=AVATAR_DEFAULT_SIZE):
-    p = Profile.objects.get_profile_by_user(email)
-    if p:
-        login_id = p.login_id if p.login_id else ''
-    else:
-        login_id = ''
-
     try:
         avatar_url, is_default, date_uploaded = api_avatar_url(email, avatar_size)
     except Exception as e:
@@ -94,12 +87,13 @@ def get_group_member_info(request, group_id, email, avatar_size=AVATAR_DEFAULT_S
     elif is_admin:
         role = 'Admin'
 
+    profiles = get_profile_resolver(request)
     member_info = {
         'group_id': group_id,
-        "name": email2nickname(email),
+        "name": profiles.nickname(email),
         'email': email,
-        "contact_email": Profile.objects.get_contact_email_by_user(email),
-        "login_id": login_id,
+        "contact_email": profiles.contact_email(email),
+        "login_id": profiles.login_id(email),
         "avatar_url": request.build_absolute_uri(avatar_url),
         "is_admin": is_admin,
         "role": role,
@@ -5,7 +5,10 @@ import logging
 import json
 import os
 import re
+import threading
+from collections import OrderedDict
 
+from django.core.mail import get_connection
 from django.core.management.base import BaseCommand
 from django.core.urlresolvers import reverse
 from django.utils.html import escape
@@ -15,12 +18,12 @@ from django.utils.translation import ugettext as _
 from seaserv import seafile_api, ccnet_api
 from seahub.base.models import CommandsLastCheck
 from seahub.notifications.models import UserNotification
-from seahub.utils import send_html_email, get_site_scheme_and_netloc
+from seahub.utils import gen_html_email, get_site_scheme_and_netloc
 import seahub.settings as settings
 from seahub.avatar.templatetags.avatar_tags import avatar
 from seahub.avatar.util import get_default_avatar_url
-from seahub.base.templatetags.seahub_tags import email2nickname
 from seahub.profile.models import Profile
+from seahub.profile.utils import ProfileResolver
 
 # Get an instance of a logger
 logger = logging.getLogger(__name__)
@@ -30,9 +33,15 @@ subject = _('New notice on %s') % settings.SITE_NAME
 class Command(BaseCommand):
     help = 'Send Email notifications to user if he/she has an unread notices every period of seconds .'
     label = "notifications_send_notices"
+    workers = 1
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=1,
+                            help='number of SMTP connections to send emails')
 
     def handle(self, *args, **options):
         logger.debug('Start sending user notices...')
+        self.workers = max(options.get('workers') or 1, 1)
         self.do_action()
         logger.debug('Finish sending user notices.\n')
 
@@ -43,12 +52,15 @@ class Command(BaseCommand):
         return re.sub(pattern, repl, img_tag)
 
     def get_avatar_src(self, username, default_size=32):
+        key = (username, default_size)
+        if key in self.avatar_srcs:
+            return self.avatar_srcs[key]
+
         avatar_img = self.get_avatar(username, default_size)
         m = re.search('<img src="(.*?)".*', avatar_img)
-        if m:
-            return m.group(1)
-        else:
-            return ''
+        src = m.group(1) if m else ''
+        self.avatar_srcs[key] = src
+        return src
 
     def get_default_avatar(self, default_size=32):
         # user default avatar
@@ -66,14 +78,25 @@ class Command(BaseCommand):
         else:
             return ''
 
+    def get_repo(self, repo_id):
+        if repo_id not in self.repos:
+            self.repos[repo_id] = seafile_api.get_repo(repo_id)
+        return self.repos[repo_id]
+
+    def get_group(self, group_id):
+        group_id = int(group_id)
+        if group_id not in self.groups:
+            self.groups[group_id] = ccnet_api.get_group(group_id)
+        return self.groups[group_id]
+
     def format_group_message(self, notice):
         d = notice.group_message_detail_to_dict()
         group_id = d['group_id']
         message = d['message']
-        group = ccnet_api.get_group(int(group_id))
+        group = self.get_group(group_id)
 
         notice.group_url = reverse('group_discuss', args=[group.id])
-        notice.notice_from = escape(email2nickname(d['msg_from']))
+        notice.notice_from = escape(self.profiles.nickname(d['msg_from']))
         notice.group_name = group.group_name
         notice.avatar_src = self.get_avatar_src(d['msg_from'])
         notice.grp_msg = message
@@ -82,10 +105,10 @@ class Command(BaseCommand):
     def format_repo_share_msg(self, notice):
         d = json.loads(notice.detail)
         repo_id = d['repo_id']
-        repo = seafile_api.get_repo(repo_id)
+        repo = self.get_repo(repo_id)
 
         notice.repo_url = reverse("view_common_lib_dir", args=[repo_id, ''])
-        notice.notice_from = escape(email2nickname(d['share_from']))
+        notice.notice_from = escape(self.profiles.nickname(d['share_from']))
         notice.repo_name = repo.name
         notice.avatar_src = self.get_avatar_src(d['share_from'])
 
@@ -95,12 +118,12 @@ class Command(BaseCommand):
         d = json.loads(notice.detail)
 
         repo_id = d['repo_id']
-        repo = seafile_api.get_repo(repo_id)
+        repo = self.get_repo(repo_id)
         group_id = d['group_id']
-        group = ccnet_api.get_group(group_id)
+        group = self.get_group(group_id)
 
         notice.repo_url = reverse("view_common_lib_dir", args=[repo_id, ''])
-        notice.notice_from = escape(email2nickname(d['share_from']))
+        notice.notice_from = escape(self.profiles.nickname(d['share_from']))
         notice.repo_name = repo.name
         notice.avatar_src = self.get_avatar_src(d['share_from'])
         notice.group_url = reverse("group_info", args=[group.id])
@@ -132,12 +155,12 @@ class Command(BaseCommand):
         group_id = d['group_id']
         join_request_msg = d['join_request_msg']
 
-        group = ccnet_api.get_group(group_id)
+        group = self.get_group(group_id)
 
         notice.grpjoin_user_profile_url = reverse('user_profile',
                                                   args=[username])
         notice.grpjoin_group_url = reverse('group_members', args=[group_id])
-        notice.notice_from = escape(email2nickname(username))
+        notice.notice_from = escape(self.profiles.nickname(username))
         notice.grpjoin_group_name = group.group_name
         notice.grpjoin_request_msg = join_request_msg
         notice.avatar_src = self.get_avatar_src(username)
@@ -148,9 +171,9 @@ class Command(BaseCommand):
         group_staff = d['group_staff']
         group_id = d['group_id']
 
-        group = ccnet_api.get_group(group_id)
+        group = self.get_group(group_id)
 
-        notice.notice_from = escape(email2nickname(group_staff))
+        notice.notice_from = escape(self.profiles.nickname(group_staff))
         notice.avatar_src = self.get_avatar_src(group_staff)
         notice.group_staff_profile_url = reverse('user_profile',
                                                   args=[group_staff])
@@ -169,8 +192,108 @@ class Command(BaseCommand):
         notice.author = author
         return notice
 
-    def get_user_language(self, username):
-        return Profile.objects.get_user_language(username)
+    def get_user_languages(self, usernames):
+        """Return a dict of user to language code, in as few queries as
+        possible.
+        """
+        languages = {}
+        usernames = list(usernames)
+        chunk_size = ProfileResolver.QUERY_CHUNK_SIZE
+        for i in range(0, len(usernames), chunk_size):
+            profiles = Profile.objects.filter(
+                user__in=usernames[i:i + chunk_size]).values_list(
+                    'user', 'lang_code')
+            for user, lang_code in profiles:
+                if lang_code is not None:
+                    languages[user] = lang_code
+
+        return dict([(u, languages.get(u, settings.LANGUAGE_CODE))
+                     for u in usernames])
+
+    def is_valid_notice(self, notice, d):
+        """Return ``False`` if repo or group of the notice is deleted, or
+        ``None`` if it can not be checked.
+        """
+        repo_id = d.get('repo_id', None)
+        group_id = d.get('group_id', None)
+        try:
+            if repo_id and not self.get_repo(repo_id):
+                return False
+
+            if group_id and not self.get_group(group_id):
+                return False
+        except Exception as e:
+            logger.error(e)
+            return None
+
+        return True
+
+    def format_notice(self, notice):
+        if notice.is_group_msg():
+            notice = self.format_group_message(notice)
+
+        elif notice.is_repo_share_msg():
+            notice = self.format_repo_share_msg(notice)
+
+        elif notice.is_repo_share_to_group_msg():
+            notice = self.format_repo_share_to_group_msg(notice)
+
+        elif notice.is_file_uploaded_msg():
+            notice = self.format_file_uploaded_msg(notice)
+
+        elif notice.is_group_join_request():
+            notice = self.format_group_join_request(notice)
+
+        elif notice.is_add_user_to_group():
+            notice = self.format_add_user_to_group(notice)
+
+        elif notice.is_file_comment_msg():
+            notice = self.format_file_comment_msg(notice)
+
+        return notice
+
+    def send_emails(self, messages):
+        """Send emails, each worker sends its share over one connection.
+        """
+        workers = min(self.workers, len(messages))
+        if workers <= 1:
+            self.send_emails_with_connection(messages)
+            return
+
+        threads = []
+        for i in range(workers):
+            t = threading.Thread(target=self.send_emails_with_connection,
+                                 args=(messages[i::workers], ))
+            t.start()
+            threads.append(t)
+
+        for t in threads:
+            t.join()
+
+    def send_emails_with_connection(self, messages):
+        connection = get_connection()
+        for msg in messages:
+            to_user = msg.to[0]
+            try:
+                # connection is opened by the first message and reused
+                connection.send_messages([msg])
+
+                logger.info('Successfully sent email to %s' % to_user)
+                self.stdout.write('[%s] Successfully sent email to %s' % (str(datetime.datetime.now()), to_user))
+            except Exception as e:
+                logger.error('Failed to send email to %s, error detail: %s' % (to_user, e))
+                self.stderr.write('[%s] Failed to send email to %s, error detail: %s' % (str(datetime.datetime.now()), to_user, e))
+
+                # reconnect for next message
+                try:
+                    connection.close()
+                except Exception:
+                    pass
+
+        try:
+            connection.close()
+        except Exception as e:
+            logger.error(e)
 
     def do_action(self):
         now = datetime.datetime.now()
@@ -193,91 +316,67 @@ class Command(BaseCommand):
             logger.debug('Create new last check time: %s' % now)
             CommandsLastCheck(command_type=self.label, last_check=now).save()
 
-        email_ctx = {}
+        self.repos = {}
+        self.groups = {}
+        self.avatar_srcs = {}
+        self.profiles = ProfileResolver()
+
+        # bucket notices by user in one pass, repos and groups are looked up
+        # once per id
+        user_notices = OrderedDict()
+        deleted_notice_ids = []
+        users = set()
         for notice in unseen_notices:
-            if notice.to_user in email_ctx:
-                email_ctx[notice.to_user] += 1
-            else:
-                email_ctx[notice.to_user] = 1
+            logger.info('Processing unseen notice: [%s]' % (notice))
+
+            d = json.loads(notice.detail)
+            valid = self.is_valid_notice(notice, d)
+            if valid is None:
+                continue
+            if not valid:
+                deleted_notice_ids.append(notice.id)
+                continue
+
+            user_notices.setdefault(notice.to_user, []).append(notice)
+            users.add(notice.to_user)
+            for key in ('msg_from', 'share_from', 'username', 'group_staff'):
+                if d.get(key):
+                    users.add(d[key])
+
+        chunk_size = ProfileResolver.QUERY_CHUNK_SIZE
+        for i in range(0, len(deleted_notice_ids), chunk_size):
+            UserNotification.objects.filter(
+                id__in=deleted_notice_ids[i:i + chunk_size]).delete()
 
-        for to_user, count in email_ctx.items():
-            # save current language
-            cur_language = translation.get_language()
+        self.profiles.prefetch(users)
+        languages = self.get_user_languages(user_notices.keys())
 
+        # save current language
+        cur_language = translation.get_language()
+
+        messages = []
+        for to_user, notices in user_notices.iteritems():
             # get and active user language
-            user_language = self.get_user_language(to_user)
+            user_language = languages[to_user]
             translation.activate(user_language)
             logger.debug('Set language code to %s for user: %s' % (user_language, to_user))
             self.stdout.write('[%s] Set language code to %s' % (
                 str(datetime.datetime.now()), user_language))
 
-            notices = []
-            for notice in unseen_notices:
-                logger.info('Processing unseen notice: [%s]' % (notice))
-
-                d = json.loads(notice.detail)
-
-                repo_id = d.get('repo_id', None)
-                group_id = d.get('group_id', None)
-                try:
-                    if repo_id and not seafile_api.get_repo(repo_id):
-                        notice.delete()
-                        continue
-
-                    if group_id and not ccnet_api.get_group(group_id):
-                        notice.delete()
-                        continue
-                except Exception as e:
-                    logger.error(e)
-                    continue
-
-                if notice.to_user != to_user:
-                    continue
-
-                elif notice.is_group_msg():
-                    notice = self.format_group_message(notice)
+            notices = [self.format_notice(n) for n in notices]
 
-                elif notice.is_repo_share_msg():
-                    notice = self.format_repo_share_msg(notice)
-
-                elif notice.is_repo_share_to_group_msg():
-                    notice = self.format_repo_share_to_group_msg(notice)
-
-                elif notice.is_file_uploaded_msg():
-                    notice = self.format_file_uploaded_msg(notice)
-
-                elif notice.is_group_join_request():
-                    notice = self.format_group_join_request(notice)
-
-                elif notice.is_add_user_to_group():
-                    notice = self.format_add_user_to_group(notice)
-
-                elif notice.is_file_comment_msg():
-                    notice = self.format_file_comment_msg(notice)
-
-                notices.append(notice)
-
-            if not notices:
-                continue
-
-            contact_email = Profile.objects.get_contact_email_by_user(to_user)
-            to_user = contact_email  # use contact email if any
+            to_user = self.profiles.contact_email(to_user)  # use contact email if any
             c = {
                 'to_user': to_user,
-                'notice_count': count,
+                'notice_count': len(notices),
                 'notices': notices,
                 }
 
-            try:
-                send_html_email(_('New notice on %s') % settings.SITE_NAME,
-                                'notifications/notice_email.html', c,
-                                None, [to_user])
+            messages.append(gen_html_email(
+                _('New notice on %s') % settings.SITE_NAME,
+                'notifications/notice_email.html', c, None, [to_user]))
 
-                logger.info('Successfully sent email to %s' % to_user)
-                self.stdout.write('[%s] Successfully sent email to %s' % (str(datetime.datetime.now()), to_user))
-            except Exception as e:
-                logger.error('Failed to send email to %s, error detail: %s' % (to_user, e))
-                self.stderr.write('[%s] Failed to send email to %s, error detail: %s' % (str(datetime.datetime.now()), to_user, e))
+        # restore current language
+        translation.activate(cur_language)
 
-            # restore current language
-            translation.activate(cur_language)
+        self.send_emails(messages)
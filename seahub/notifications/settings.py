@@ -1,4 +1,5 @@
 # Copyright (c) 2012-2016 Seafile Ltd.
 from django.conf import settings
 
-NOTIFICATION_CACHE_TIMEOUT = getattr(settings, 'NOTIFICATION_CACHE_TIMEOUT', 0)
+# Primary notification is cached again whenever it is changed.
+NOTIFICATION_CACHE_TIMEOUT = getattr(settings, 'NOTIFICATION_CACHE_TIMEOUT', 24 * 60 * 60)
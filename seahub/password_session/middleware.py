@@ -1,9 +1,11 @@
 # Copyright (c) 2012-2016 Seafile Ltd.
 from django.contrib.auth import logout
 
+from seahub.base.middleware import instrument_middleware
 from .handlers import get_password_hash, PASSWORD_HASH_KEY
 
 
+@instrument_middleware
 class CheckPasswordHash(object):
     """Logout user if value of hash key in session is not equal to current password hash"""
     def process_view(self, request, *args, **kwargs):
@@ -20,3 +20,131 @@ def refresh_cache(username):
     
     contact_key = normalize_cache_key(username, CONTACT_CACHE_PREFIX)
     cache.set(contact_key, contactemail, CONTACT_CACHE_TIMEOUT)
+
+class ProfileResolver(object):
+    """
+    Resolve nicknames, contact emails and login ids of many users at once.
+
+    Lookups go through the nickname/contact email cache with one
+    ``get_many``, profiles of the missed users are fetched with a single
+    query, and the results are written back with ``set_many``. Login ids
+    are not cached, they are read from the same query when asked for.
+    """
+    # Keep ``user__in`` below the SQLite host parameter limit.
+    QUERY_CHUNK_SIZE = 500
+
+    def __init__(self):
+        self._nicknames = {}
+        self._contact_emails = {}
+        self._login_ids = {}
+
+    def _get_profiles(self, emails):
+        profiles = {}
+        emails = list(emails)
+        for i in range(0, len(emails), self.QUERY_CHUNK_SIZE):
+            chunk = emails[i:i + self.QUERY_CHUNK_SIZE]
+            for p in Profile.objects.filter(user__in=chunk):
+                profiles[p.user] = p
+        return profiles
+
+    def prefetch(self, emails, login_ids=False):
+        emails = set([e for e in emails if e])
+        if login_ids:
+            login_id_misses = set([e for e in emails if e not in self._login_ids])
+        else:
+            login_id_misses = set()
+        emails = [e for e in emails if e not in self._nicknames]
+        if not emails and not login_id_misses:
+            return
+
+        nickname_keys = dict([(normalize_cache_key(e, NICKNAME_CACHE_PREFIX), e)
+                              for e in emails])
+        contact_keys = dict([(normalize_cache_key(e, CONTACT_CACHE_PREFIX), e)
+                             for e in emails])
+        if emails:
+            cached = cache.get_many(nickname_keys.keys() + contact_keys.keys())
+        else:
+            cached = {}
+
+        nicknames, contact_emails, misses = {}, {}, set()
+        for key, email in nickname_keys.iteritems():
+            nickname = cached.get(key)
+            if nickname and nickname.strip():
+                nicknames[email] = nickname.strip()
+            else:
+                misses.add(email)
+
+        for key, email in contact_keys.iteritems():
+            contact_email = cached.get(key)
+            if contact_email and contact_email.strip():
+                contact_emails[email] = contact_email
+            else:
+                misses.add(email)
+
+        if misses or login_id_misses:
+            profiles = self._get_profiles(misses | login_id_misses)
+
+            new_nicknames, new_contact_emails = {}, {}
+            for email in misses:
+                p = profiles.get(email)
+                if email not in nicknames:
+                    if p is not None and p.nickname and p.nickname.strip():
+                        nickname = p.nickname.strip()
+                    else:
+                        nickname = email.split('@')[0]
+                    nicknames[email] = nickname
+                    key = normalize_cache_key(email, NICKNAME_CACHE_PREFIX)
+                    new_nicknames[key] = nickname
+
+                if email not in contact_emails:
+                    if p is not None and p.contact_email:
+                        contact_email = p.contact_email
+                    else:
+                        contact_email = email
+                    contact_emails[email] = contact_email
+                    key = normalize_cache_key(email, CONTACT_CACHE_PREFIX)
+                    new_contact_emails[key] = contact_email
+
+            for email in login_id_misses:
+                p = profiles.get(email)
+                self._login_ids[email] = p.login_id if p and p.login_id else ''
+
+            if new_nicknames:
+                cache.set_many(new_nicknames, NICKNAME_CACHE_TIMEOUT)
+            if new_contact_emails:
+                cache.set_many(new_contact_emails, CONTACT_CACHE_TIMEOUT)
+
+        self._nicknames.update(nicknames)
+        self._contact_emails.update(contact_emails)
+
+    def nickname(self, email):
+        if not email:
+            return ''
+        if email not in self._nicknames:
+            self.prefetch([email])
+        return self._nicknames[email]
+
+    def contact_email(self, email):
+        if not email:
+            return ''
+        if email not in self._contact_emails:
+            self.prefetch([email])
+        return self._contact_emails[email]
+
+    def login_id(self, email):
+        if not email:
+            return ''
+        if email not in self._login_ids:
+            self.prefetch([email], login_ids=True)
+        return self._login_ids[email]
+
+def get_profile_resolver(request):
+    """
+    Return the profile resolver bound to ``request``, so that users
+    resolved once are not looked up again in the same request.
+    """
+    resolver = getattr(request, '_profile_resolver', None)
+    if resolver is None:
+        resolver = ProfileResolver()
+        request._profile_resolver = resolver
+    return resolver
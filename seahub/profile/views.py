@@ -23,6 +23,7 @@ from seahub.base.templatetags.seahub_tags import email2nickname
 from seahub.contacts.models import Contact
 from seahub.options.models import UserOptions, CryptoOptionNotSetError
 from seahub.utils import is_ldap_user
+from seahub.utils.org_cache import invalidate_user_org
 from seahub.utils.two_factor_auth import has_two_factor_auth
 from seahub.views import get_owned_repo_list
 
@@ -183,6 +184,7 @@ def delete_user_account(request):
     if is_org_context(request):
         org_id = request.user.org.org_id
         seaserv.ccnet_threaded_rpc.remove_org_user(org_id, username)
+        invalidate_user_org(username)
 
     return HttpResponseRedirect(settings.LOGIN_URL)
 
@@ -113,6 +113,8 @@ MIDDLEWARE_CLASSES = (
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'seahub.base.middleware.MiddlewareTimingMiddleware',
+    'seahub.base.middleware.RPCCacheMiddleware',
     'seahub.auth.middleware.AuthenticationMiddleware',
     'seahub.base.middleware.BaseMiddleware',
     'seahub.base.middleware.InfobarMiddleware',
@@ -230,8 +232,13 @@ INSTALLED_APPS = (
 
 # Enabled or disable constance(web settings).
 ENABLE_SETTINGS_VIA_WEB = True
-CONSTANCE_BACKEND = 'constance.backends.database.DatabaseBackend'
+# Web settings are read from an in-process snapshot, which is reloaded when
+# any setting is saved, see seahub/base/config_backend.py.
+CONSTANCE_BACKEND = 'seahub.base.config_backend.SnapshotDatabaseBackend'
 CONSTANCE_DATABASE_CACHE_BACKEND = 'default'
+# Max seconds before a setting saved in one process is seen by others, plus
+# LOCAL_TIMEOUT of the default cache below if it is not 0.
+CONSTANCE_SNAPSHOT_CHECK_INTERVAL = 1
 
 AUTHENTICATION_BACKENDS = (
     'seahub.base.accounts.AuthBackend',
@@ -363,12 +370,18 @@ if 'win32' in sys.platform:
         CACHE_DIR = os.path.join(CCNET_CONF_PATH, '..')
         install_topdir = os.path.join(CCNET_CONF_PATH, '..')
 
+# Values are kept in a SQLite file shared by processes on this node, see
+# seahub/base/cache.py. The in-process tier is off (LOCAL_TIMEOUT 0), since
+# locks, one-time codes and version keys must be seen by all processes at
+# once. Use memcached instead when running seahub on more than one node.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
-        'LOCATION': os.path.join(CACHE_DIR, 'seahub_cache'),
+        'BACKEND': 'seahub.base.cache.TwoTierCache',
+        'LOCATION': os.path.join(CACHE_DIR, 'seahub_cache.db'),
         'OPTIONS': {
-            'MAX_ENTRIES': 1000000
+            'MAX_ENTRIES': 1000000,
+            'LOCAL_MAX_SIZE': 16 * 1024 * 1024,
+            'LOCAL_TIMEOUT': 0,
         }
     }
 }
@@ -384,6 +397,11 @@ REST_FRAMEWORK = {
     'UNICODE_JSON': False,
 }
 REST_FRAMEWORK_THROTTING_WHITELIST = []
+# Throttle backend of each scope, e.g. {'user': 'counter'}. 'history' (the
+# default) keeps timestamps of all requests in the period, 'counter' keeps
+# two counters updated by atomic incr, which needs a cache backend shared by
+# all workers and nodes, such as memcached.
+REST_FRAMEWORK_THROTTLE_BACKENDS = {}
 
 # file and path
 MAX_UPLOAD_FILE_NAME_LEN    = 255
@@ -532,10 +550,27 @@ THUMBNAIL_DEFAULT_SIZE = 48
 THUMBNAIL_SIZE_FOR_GRID = 192
 THUMBNAIL_SIZE_FOR_ORIGINAL = 1024
 
+# thumbnails of these sizes are created together from one decoded image
+THUMBNAIL_SIZES = (THUMBNAIL_DEFAULT_SIZE, 96, THUMBNAIL_SIZE_FOR_GRID,
+                   THUMBNAIL_SIZE_FOR_ORIGINAL)
+
 # size(MB) limit for generate thumbnail
 THUMBNAIL_IMAGE_SIZE_LIMIT = 20
 THUMBNAIL_IMAGE_ORIGINAL_SIZE_LIMIT = 256
 
+# number of processes generating image thumbnails in each seahub process,
+# 0 to generate them in request. Worker processes are forked when a seahub
+# process starts, see seahub/wsgi.py.
+THUMBNAIL_WORKERS = 2
+# max number of image thumbnails queued or being generated by workers
+THUMBNAIL_MAX_PENDING_TASKS = 64
+# seconds to wait for a thumbnail generated by workers before telling client
+# to retry later, keep it short so that requests are not blocked
+THUMBNAIL_WAIT_TIMEOUT = 0.2
+
+# total size(MB) of thumbnails kept by `evict_thumbnail` command, 0 for no limit
+THUMBNAIL_MAX_TOTAL_SIZE = 0
+
 # video thumbnails
 ENABLE_VIDEO_THUMBNAIL = False
 THUMBNAIL_VIDEO_FRAME_TIME = 5  # use the frame at 5 second as thumbnail
@@ -553,6 +588,24 @@ ENABLE_GLOBAL_ADDRESSBOOK = True
 #####################
 ENABLE_FOLDER_PERM = False
 
+#####################
+# Directory Listing #
+#####################
+# Limits for listing sub folders recursively via api. The listing is marked
+# as truncated once either limit is reached.
+RECURSIVE_DIR_LIST_MAX_ENTRIES = 50000
+RECURSIVE_DIR_LIST_MAX_DEPTH = 64
+# Number of threads listing folders in parallel. The threads are shared by
+# all requests of a seahub process, so this bounds the process, not each
+# request.
+RECURSIVE_DIR_LIST_WORKERS = 4
+# Number of threads resolving group libraries in parallel, shared by all
+# requests of a seahub process.
+GROUP_REPOS_LIST_WORKERS = 4
+# Max number of users whose space usage is fetched in parallel in system
+# admin user lists
+USER_QUOTA_USAGE_WORKERS = 4
+
 ####################
 # Guest Invite     #
 ####################
@@ -564,6 +617,19 @@ INVITATION_ACCEPTER_BLACKLIST = []
 #####################
 ENABLE_SUDO_MODE = True
 
+################
+# Admin Export #
+################
+# Directory holding reports exported in background by system admins.
+if os.path.exists(SEAHUB_DATA_ROOT):
+    ADMIN_EXPORT_ROOT = os.path.join(SEAHUB_DATA_ROOT, 'export')
+else:
+    ADMIN_EXPORT_ROOT = os.path.join(PROJECT_ROOT, 'seahub/export')
+# Max number of reports exported at the same time in each seahub process
+ADMIN_EXPORT_WORKERS = 2
+# Seconds an exported report is kept for download
+ADMIN_EXPORT_TTL = 60 * 60
+
 #################
 # Email sending #
 #################
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import uuid
+import seahub.base.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FileTag',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('username', seahub.base.fields.LowerCaseCharField(max_length=255)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='FileUUIDMap',
+            fields=[
+                ('uuid', models.UUIDField(default=uuid.uuid4, serialize=False, primary_key=True)),
+                ('repo_id', models.CharField(max_length=36)),
+                ('parent_path', models.TextField()),
+                ('filename', models.CharField(max_length=1024)),
+                ('is_dir', models.BooleanField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Tags',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('name', models.CharField(unique=True, max_length=1024)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='filetag',
+            name='tag',
+            field=models.ForeignKey(to='tags.Tags'),
+        ),
+        migrations.AddField(
+            model_name='filetag',
+            name='uuid',
+            field=models.ForeignKey(to='tags.FileUUIDMap'),
+        ),
+    ]
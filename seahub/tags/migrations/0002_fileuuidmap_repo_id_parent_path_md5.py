@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tags', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fileuuidmap',
+            name='repo_id_parent_path_md5',
+            field=models.CharField(default='', max_length=100, db_index=True),
+            preserve_default=False,
+        ),
+        migrations.AlterField(
+            model_name='fileuuidmap',
+            name='repo_id',
+            field=models.CharField(max_length=36, db_index=True),
+        ),
+    ]
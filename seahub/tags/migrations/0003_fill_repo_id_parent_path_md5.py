@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import hashlib
+
+from django.db import migrations
+
+
+def normalize_path(path):
+    return path.rstrip('/') if path != '/' else '/'
+
+def fill_repo_id_parent_path_md5(apps, schema_editor):
+    FileUUIDMap = apps.get_model('tags', 'FileUUIDMap')
+
+    # one update per parent dir instead of one per item
+    parents = FileUUIDMap.objects.values_list('repo_id', 'parent_path').distinct()
+    for repo_id, parent_path in parents.iterator():
+        new_parent_path = normalize_path(parent_path)
+        md5 = hashlib.md5((repo_id + new_parent_path).encode('utf-8')).hexdigest()
+        FileUUIDMap.objects.filter(
+            repo_id=repo_id, parent_path=parent_path).update(
+                parent_path=new_parent_path, repo_id_parent_path_md5=md5)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tags', '0002_fileuuidmap_repo_id_parent_path_md5'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_repo_id_parent_path_md5,
+                             migrations.RunPython.noop),
+    ]
@@ -1,8 +1,9 @@
 # Copyright (c) 2012-2016 Seafile Ltd.
 # -*- coding: utf-8 -*-
 import uuid
+import hashlib
 
-from django.db import models
+from django.db import models, transaction
 
 from seahub.base.fields import LowerCaseCharField
 
@@ -42,14 +43,64 @@ class FileUUIDMapManager(models.Manager):
             return:
                 return uuid if it's exist,otherwise return None
         """
+        md5 = self.model.md5_repo_id_parent_path(repo_id, parent_path)
         try:
             uuid = super(FileUUIDMapManager, self).get(
-                    repo_id=repo_id, parent_path=parent_path,
+                    repo_id_parent_path_md5=md5,
                     filename=filename, is_dir=is_dir)
             return uuid
         except self.model.DoesNotExist:
             return None
 
+    def move_fileuuidmaps_in_dir(self, src_repo_id, src_path, dst_repo_id,
+                                 dst_path):
+        """ update mappings of all items under a moved or renamed dir
+            args:
+            - `src_repo_id`:
+            - `src_path`: path of the dir before move
+            - `dst_repo_id`:
+            - `dst_path`: path of the dir after move
+            return:
+                number of updated mappings
+
+            Items are updated with one query per sub dir, since hash of the
+            new parent path can not be computed in sql.
+        """
+        src_path = self.model.normalize_path(src_path)
+        dst_path = self.model.normalize_path(dst_path)
+        if src_repo_id == dst_repo_id and src_path == dst_path:
+            return 0
+
+        prefix = src_path.rstrip('/') + '/'
+        items = super(FileUUIDMapManager, self).filter(
+            repo_id=src_repo_id).filter(
+                models.Q(parent_path=src_path) |
+                models.Q(parent_path__startswith=prefix)).values_list(
+                    'uuid', 'parent_path')
+
+        uuids_by_parent = {}
+        for item_uuid, parent_path in items:
+            # startswith is case insensitive in some databases
+            if parent_path != src_path and not parent_path.startswith(prefix):
+                continue
+            uuids_by_parent.setdefault(parent_path, []).append(item_uuid)
+
+        count = 0
+        with transaction.atomic():
+            for parent_path, uuids in uuids_by_parent.items():
+                new_parent_path = self.model.normalize_path(
+                    dst_path + parent_path[len(src_path):])
+                md5 = self.model.md5_repo_id_parent_path(dst_repo_id,
+                                                         new_parent_path)
+                # keep `uuid__in` below the SQLite host parameter limit
+                for i in range(0, len(uuids), 500):
+                    count += super(FileUUIDMapManager, self).filter(
+                        uuid__in=uuids[i:i + 500]).update(
+                            repo_id=dst_repo_id,
+                            parent_path=new_parent_path,
+                            repo_id_parent_path_md5=md5)
+        return count
+
 class TagsManager(models.Manager):
     def get_or_create_tag(self, tagname):
         try:
@@ -107,11 +158,23 @@ class FileTagManager(models.Manager):
             return list of filetag
         """
         return super(FileTagManager, self).filter(
-                uuid__repo_id=repo_id,
-                uuid__parent_path=parent_path,
+                uuid__repo_id_parent_path_md5=FileUUIDMap.md5_repo_id_parent_path(
+                    repo_id, parent_path),
                 uuid__filename=filename, uuid__is_dir=is_dir
         )
 
+    def get_file_tags_by_parent_path(self, repo_id, parent_path):
+        """ get filetags of all dirents in a dir
+            args:
+            - `repo_id`:
+            - `parent_path`:
+            return list of filetag, with uuid and tag loaded
+        """
+        return super(FileTagManager, self).filter(
+                uuid__repo_id_parent_path_md5=FileUUIDMap.md5_repo_id_parent_path(
+                    repo_id, parent_path)
+        ).select_related('uuid', 'tag')
+
     def delete_file_tag_by_path(self, repo_id, parent_path, filename, is_dir, tagname):
         """ delete one specific filetag
             args:
@@ -122,8 +185,8 @@ class FileTagManager(models.Manager):
         """
         try:
             filetag = super(FileTagManager, self).get(
-                    uuid__repo_id=repo_id,
-                    uuid__parent_path=parent_path,
+                    uuid__repo_id_parent_path_md5=FileUUIDMap.md5_repo_id_parent_path(
+                        repo_id, parent_path),
                     uuid__filename=filename,
                     uuid__is_dir=is_dir,
                     tag__name=tagname
@@ -144,8 +207,8 @@ class FileTagManager(models.Manager):
                 always return True
         """
         filetags = super(FileTagManager, self).filter(
-                uuid__repo_id=repo_id,
-                uuid__parent_path=parent_path,
+                uuid__repo_id_parent_path_md5=FileUUIDMap.md5_repo_id_parent_path(
+                    repo_id, parent_path),
                 uuid__filename=filename,
                 uuid__is_dir=is_dir
         ).delete()
@@ -153,13 +216,31 @@ class FileTagManager(models.Manager):
 ########## Model
 class FileUUIDMap(models.Model):
     uuid = models.UUIDField(primary_key=True, default=uuid.uuid4)
-    repo_id = models.CharField(max_length=36)
+    repo_id = models.CharField(max_length=36, db_index=True)
+    repo_id_parent_path_md5 = models.CharField(max_length=100, db_index=True)
     parent_path = models.TextField()
     filename = models.CharField(max_length=1024)
     is_dir = models.BooleanField()
 
     objects = FileUUIDMapManager()
 
+    @classmethod
+    def md5_repo_id_parent_path(cls, repo_id, parent_path):
+        parent_path = cls.normalize_path(parent_path)
+        return hashlib.md5((repo_id + parent_path).encode('utf-8')).hexdigest()
+
+    @classmethod
+    def normalize_path(self, path):
+        return path.rstrip('/') if path != '/' else '/'
+
+    def save(self, *args, **kwargs):
+        self.parent_path = self.normalize_path(self.parent_path)
+        # repo id or parent path may be changed
+        self.repo_id_parent_path_md5 = self.md5_repo_id_parent_path(
+            self.repo_id, self.parent_path)
+
+        super(FileUUIDMap, self).save(*args, **kwargs)
+
 class Tags(models.Model):
     name = models.CharField(max_length=1024, unique=True)
 
@@ -177,6 +258,7 @@ class FileTag(models.Model):
 
 ########## handle signals
 import  logging
+import posixpath
 
 from django.dispatch import receiver
 from seahub.signals import rename_dirent_successful
@@ -195,7 +277,12 @@ def update_fileuuidmap(sender, **kwargs):
     src_fileuuidmap = FileUUIDMap.objects.get_fileuuidmap_by_path(src_repo_id,src_parent_dir, src_filename, is_dir)
     if src_fileuuidmap:
         src_fileuuidmap.repo_id = dst_repo_id
-        src_fileuuidmap.parent_dir = dst_parent_dir
+        src_fileuuidmap.parent_path = dst_parent_dir
         src_fileuuidmap.filename = dst_filename
         src_fileuuidmap.is_dir = is_dir
         src_fileuuidmap.save()
+
+    if is_dir:
+        FileUUIDMap.objects.move_fileuuidmaps_in_dir(
+            src_repo_id, posixpath.join(src_parent_dir, src_filename),
+            dst_repo_id, posixpath.join(dst_parent_dir, dst_filename))
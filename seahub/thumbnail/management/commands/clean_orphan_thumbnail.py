@@ -0,0 +1,88 @@
+# Copyright (c) 2012-2016 Seafile Ltd.
+# encoding: utf-8
+import os
+
+from django.core.management.base import BaseCommand
+from seaserv import seafile_api
+
+from seahub.settings import THUMBNAIL_ROOT
+from seahub.thumbnail.utils import THUMBNAIL_REFS_DIR, get_thumbnail_file
+
+# file which records the next shard to check
+STATE_FILE = '.clean_orphan_thumbnail'
+
+class Command(BaseCommand):
+    help = "Remove thumbnails whose file is not referred by any existing " \
+           "library. Only part of thumbnails are checked in each run, " \
+           "following runs continue from where last one stopped."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--shards', type=int, default=16,
+                            help='number of shards(of 256) to check in this run')
+
+    def repo_exists(self, repo_id):
+        if repo_id not in self.repos:
+            self.repos[repo_id] = seafile_api.get_repo(repo_id) is not None
+        return self.repos[repo_id]
+
+    def read_state(self, state_file):
+        try:
+            with open(state_file) as f:
+                return int(f.read().strip()) % 256
+        except (IOError, ValueError):
+            return 0
+
+    def write_state(self, state_file, shard):
+        with open(state_file, 'w') as f:
+            f.write(str(shard % 256))
+
+    def clean_shard(self, shard_dir):
+        """Return number of files whose thumbnails are removed.
+        """
+        count = 0
+        for sub in os.listdir(shard_dir):
+            sub_dir = os.path.join(shard_dir, sub)
+            for file_id in os.listdir(sub_dir):
+                # ref files of a file are named by ids of repos using it
+                ref_dir = os.path.join(sub_dir, file_id)
+                for repo_id in os.listdir(ref_dir):
+                    if not self.repo_exists(repo_id):
+                        os.unlink(os.path.join(ref_dir, repo_id))
+
+                # Remove ref dir before thumbnails, it fails if a ref is
+                # added meanwhile, then thumbnails are still in use.
+                try:
+                    os.rmdir(ref_dir)
+                except OSError:
+                    continue
+
+                for size in self.sizes:
+                    try:
+                        os.unlink(get_thumbnail_file(file_id, size))
+                    except OSError:
+                        pass
+                count += 1
+
+        return count
+
+    def handle(self, *args, **options):
+        refs_root = os.path.join(THUMBNAIL_ROOT, THUMBNAIL_REFS_DIR)
+        if not os.path.isdir(refs_root):
+            self.stdout.write('No thumbnail to clean')
+            return
+
+        self.repos = {}
+        self.sizes = [x for x in os.listdir(THUMBNAIL_ROOT) if x.isdigit()]
+
+        state_file = os.path.join(refs_root, STATE_FILE)
+        start = self.read_state(state_file)
+        shards = min(max(options['shards'], 1), 256)
+
+        count = 0
+        for i in range(start, start + shards):
+            shard_dir = os.path.join(refs_root, '%02x' % (i % 256))
+            if os.path.isdir(shard_dir):
+                count += self.clean_shard(shard_dir)
+
+        self.write_state(state_file, start + shards)
+        self.stdout.write('Successfully clean thumbnails of %d files' % count)
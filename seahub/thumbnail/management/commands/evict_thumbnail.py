@@ -0,0 +1,69 @@
+# Copyright (c) 2012-2016 Seafile Ltd.
+# encoding: utf-8
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from seahub.settings import THUMBNAIL_ROOT, THUMBNAIL_MAX_TOTAL_SIZE
+
+class Command(BaseCommand):
+    help = "Remove least recently used thumbnails until their total size " \
+           "is under the limit"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-size', type=int,
+                            default=THUMBNAIL_MAX_TOTAL_SIZE,
+                            help='total size(MB) of thumbnails to keep')
+
+    def get_thumbnails(self):
+        """Return a list of (atime, size, path) of all thumbnail files.
+        """
+        thumbnails = []
+        for size in os.listdir(THUMBNAIL_ROOT):
+            size_dir = os.path.join(THUMBNAIL_ROOT, size)
+            if not size.isdigit() or not os.path.isdir(size_dir):
+                continue
+
+            for root, dirs, files in os.walk(size_dir):
+                for name in files:
+                    # a thumbnail being written
+                    if name.startswith('tmp'):
+                        continue
+
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    thumbnails.append((stat.st_atime, stat.st_size, path))
+
+        return thumbnails
+
+    def handle(self, *args, **options):
+        max_size = options['max_size']
+        if max_size <= 0:
+            raise CommandError('Thumbnail size limit is not set, '
+                               'use --max-size or THUMBNAIL_MAX_TOTAL_SIZE')
+
+        if not os.path.isdir(THUMBNAIL_ROOT):
+            self.stdout.write('No thumbnail to evict')
+            return
+
+        thumbnails = self.get_thumbnails()
+        total_size = sum(t[1] for t in thumbnails)
+        max_size = max_size * 1024 * 1024
+
+        count = 0
+        thumbnails.sort()
+        for atime, size, path in thumbnails:
+            if total_size <= max_size:
+                break
+
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            total_size -= size
+            count += 1
+
+        self.stdout.write('Successfully evict %d thumbnails' % count)
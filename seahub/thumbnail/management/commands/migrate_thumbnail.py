@@ -0,0 +1,37 @@
+# Copyright (c) 2012-2016 Seafile Ltd.
+# encoding: utf-8
+import os
+
+from django.core.management.base import BaseCommand
+
+from seahub.settings import THUMBNAIL_ROOT
+from seahub.thumbnail.utils import get_thumbnail_file
+
+class Command(BaseCommand):
+    help = "Move thumbnails stored as <size>/<file_id> to sharded dirs"
+
+    def handle(self, *args, **options):
+        if not os.path.isdir(THUMBNAIL_ROOT):
+            self.stdout.write('No thumbnail to migrate')
+            return
+
+        count = 0
+        for size in os.listdir(THUMBNAIL_ROOT):
+            size_dir = os.path.join(THUMBNAIL_ROOT, size)
+            if not size.isdigit() or not os.path.isdir(size_dir):
+                continue
+
+            for name in os.listdir(size_dir):
+                old_file = os.path.join(size_dir, name)
+                # sharded dirs are named by 2 chars, skip them
+                if not os.path.isfile(old_file):
+                    continue
+
+                new_file = get_thumbnail_file(name, size)
+                new_dir = os.path.dirname(new_file)
+                if not os.path.exists(new_dir):
+                    os.makedirs(new_dir)
+                os.rename(old_file, new_file)
+                count += 1
+
+        self.stdout.write('Successfully migrate %d thumbnails' % count)
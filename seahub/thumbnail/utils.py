@@ -1,11 +1,13 @@
 # Copyright (c) 2012-2016 Seafile Ltd.
 import os
+import time
 import posixpath
 import timeit
 import tempfile
+import threading
+import multiprocessing
 import urllib2
 import logging
-from StringIO import StringIO
 
 from PIL import Image
 from seaserv import get_file_id_by_path, get_repo, get_file_size, \
@@ -15,7 +17,8 @@ from seahub.utils import gen_inner_file_get_url, get_file_type_and_ext
 from seahub.utils.file_types import VIDEO
 from seahub.settings import THUMBNAIL_IMAGE_SIZE_LIMIT, \
     THUMBNAIL_EXTENSION, THUMBNAIL_ROOT, THUMBNAIL_IMAGE_ORIGINAL_SIZE_LIMIT,\
-    ENABLE_VIDEO_THUMBNAIL, THUMBNAIL_VIDEO_FRAME_TIME
+    ENABLE_VIDEO_THUMBNAIL, THUMBNAIL_VIDEO_FRAME_TIME, THUMBNAIL_WORKERS, \
+    THUMBNAIL_MAX_PENDING_TASKS, THUMBNAIL_WAIT_TIMEOUT, THUMBNAIL_SIZES
 
 # Get an instance of a logger
 logger = logging.getLogger(__name__)
@@ -29,6 +32,132 @@ if ENABLE_VIDEO_THUMBNAIL:
 else:
     logger.debug('Video thumbnail is disabled.')
 
+IMAGE_FETCH_CHUNK_SIZE = 64 * 1024
+# give up parsing image header early if it is not found in this many bytes
+IMAGE_HEADER_MAX_SIZE = 1024 * 1024
+
+# repos referring a thumbnail are recorded under this dir of THUMBNAIL_ROOT
+THUMBNAIL_REFS_DIR = 'refs'
+# access time of a thumbnail is updated at most once in this many seconds
+THUMBNAIL_ATIME_RESOLUTION = 60 * 60
+
+class ThumbnailWorkerPool(object):
+    """Generate thumbnails in a pool of worker processes.
+
+    Worker processes are forked by ``start()``, which must be called when a
+    seahub process starts, before any thread is running, see seahub/wsgi.py.
+    They are never forked from a request.
+
+    Requests for a thumbnail which is already being generated share the
+    same task, and no new task is accepted once ``max_pending`` tasks are
+    queued or running.
+    """
+    def __init__(self, processes, max_pending):
+        self.processes = processes
+        self.max_pending = max_pending
+        self._pool = None
+        self._pid = None
+        self._tasks = {}
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Fork the worker processes, if not yet forked by this process.
+        """
+        if self.processes <= 0:
+            return
+
+        with self._lock:
+            if not self.is_running():
+                self._pool = multiprocessing.Pool(self.processes)
+                self._pid = os.getpid()
+                self._tasks = {}
+
+    def is_running(self):
+        # a pool forked by the parent can not be used in a forked child
+        return self._pool is not None and self._pid == os.getpid()
+
+    def get_task(self, key):
+        """Return the pending task for ``key``, or ``None``.
+        """
+        with self._lock:
+            task = self._tasks.get(key)
+            if task is not None and task.ready():
+                del self._tasks[key]
+                return None
+            return task
+
+    def submit(self, key, func, *args):
+        """Run ``func(*args)`` in the pool, return an ``AsyncResult``, or
+        ``None`` if the pool is busy.
+        """
+        with self._lock:
+            if not self.is_running():
+                raise RuntimeError('Thumbnail workers are not started.')
+
+            task = self._tasks.get(key)
+            if task is not None and not task.ready():
+                return task
+
+            for k in [k for k, t in self._tasks.items() if t.ready()]:
+                del self._tasks[k]
+            if len(self._tasks) >= self.max_pending:
+                return None
+
+            task = self._pool.apply_async(func, args)
+            self._tasks[key] = task
+            return task
+
+thumbnail_pool = ThumbnailWorkerPool(THUMBNAIL_WORKERS,
+                                     THUMBNAIL_MAX_PENDING_TASKS)
+
+def _shard_path(file_id):
+    return os.path.join(file_id[:2], file_id[2:4], file_id)
+
+def get_thumbnail_file(file_id, size):
+    """Thumbnails are stored as `<size>/<id[:2]>/<id[2:4]>/<file_id>`, so
+    that no dir holds too many files.
+    """
+    return os.path.join(THUMBNAIL_ROOT, str(size), _shard_path(file_id))
+
+def get_thumbnail_ref_dir(file_id):
+    return os.path.join(THUMBNAIL_ROOT, THUMBNAIL_REFS_DIR,
+                        _shard_path(file_id))
+
+def add_thumbnail_ref(file_id, repo_id):
+    """Record that thumbnails of `file_id` are used by `repo_id`, so that
+    they can be cleaned when no repo refers them any more.
+    """
+    ref_file = os.path.join(get_thumbnail_ref_dir(file_id), repo_id)
+    if os.path.exists(ref_file):
+        return
+
+    try:
+        _makedirs(os.path.dirname(ref_file))
+        open(ref_file, 'a').close()
+    except (IOError, OSError) as e:
+        logger.error(e)
+
+def touch_thumbnail(thumbnail_file):
+    """Record access to a thumbnail in its atime, which is used by
+    `evict_thumbnail` command. mtime is kept for `Last-Modified`.
+    """
+    try:
+        stat = os.stat(thumbnail_file)
+        now = time.time()
+        if now - stat.st_atime > THUMBNAIL_ATIME_RESOLUTION:
+            os.utime(thumbnail_file, (now, stat.st_mtime))
+    except OSError as e:
+        logger.warning(e)
+
+def _makedirs(path):
+    if not os.path.exists(path):
+        try:
+            os.makedirs(path)
+        except OSError:
+            # created by another worker
+            if not os.path.isdir(path):
+                raise
+
 def get_thumbnail_src(repo_id, size, path):
     return posixpath.join("thumbnail", repo_id, str(size), path.lstrip('/'))
 
@@ -80,6 +209,11 @@ def generate_thumbnail(request, repo_id, size, path):
     1. if repo exist: should exist;
     2. if repo is encrypted: not encrypted;
     3. if ENABLE_THUMBNAIL: enabled;
+
+    if thumbnail workers are running, image thumbnails are generated in
+    worker processes, return (False, 202) if workers are busy or thumbnail
+    is not ready in ``THUMBNAIL_WAIT_TIMEOUT`` seconds, client should retry
+    later.
     """
 
     try:
@@ -88,16 +222,13 @@ def generate_thumbnail(request, repo_id, size, path):
         logger.error(e)
         return (False, 400)
 
-    thumbnail_dir = os.path.join(THUMBNAIL_ROOT, str(size))
-    if not os.path.exists(thumbnail_dir):
-        os.makedirs(thumbnail_dir)
-
     file_id = get_file_id_by_path(repo_id, path)
     if not file_id:
         return (False, 400)
 
-    thumbnail_file = os.path.join(thumbnail_dir, file_id)
+    thumbnail_file = get_thumbnail_file(file_id, size)
     if os.path.exists(thumbnail_file):
+        add_thumbnail_ref(file_id, repo_id)
         return (True, 200)
 
     repo = get_repo(repo_id)
@@ -107,8 +238,11 @@ def generate_thumbnail(request, repo_id, size, path):
     if filetype == VIDEO:
         # video thumbnails
         if ENABLE_VIDEO_THUMBNAIL:
-            return create_video_thumbnails(repo, file_id, path, size,
-                                           thumbnail_file, file_size)
+            ret = create_video_thumbnails(repo, file_id, path, size,
+                                          file_size)
+            if ret[0]:
+                add_thumbnail_ref(file_id, repo_id)
+            return ret
         else:
             return (False, 400)
 
@@ -116,22 +250,122 @@ def generate_thumbnail(request, repo_id, size, path):
     if file_size > THUMBNAIL_IMAGE_SIZE_LIMIT * 1024**2:
         return (False, 403)
 
+    # create thumbnails of all common sizes at once, since the image has to
+    # be downloaded and decoded anyway
+    sizes = set(THUMBNAIL_SIZES)
+    sizes.add(size)
+    sizes = [s for s in sizes
+             if not os.path.exists(get_thumbnail_file(file_id, s))]
+
+    if not thumbnail_pool.is_running():
+        # workers are turned off, or not started in this process
+        inner_path = _get_inner_path(repo_id, file_id, path)
+        if not inner_path:
+            return (False, 500)
+        ret = create_image_thumbnails(inner_path, file_id, sizes)
+        if ret[0]:
+            add_thumbnail_ref(file_id, repo_id)
+        return ret
+
+    key = file_id if size in THUMBNAIL_SIZES else (file_id, size)
+    task = thumbnail_pool.get_task(key)
+    if task is None:
+        inner_path = _get_inner_path(repo_id, file_id, path)
+        if not inner_path:
+            return (False, 500)
+
+        task = thumbnail_pool.submit(key, create_image_thumbnails,
+                                     inner_path, file_id, sizes)
+        if task is None:
+            # too many thumbnails are being generated
+            return (False, 202)
+
+    task.wait(THUMBNAIL_WAIT_TIMEOUT)
+    if not task.ready():
+        return (False, 202)
+
+    try:
+        ret = task.get()
+    except Exception as e:
+        logger.error(e)
+        return (False, 500)
+
+    if ret[0]:
+        add_thumbnail_ref(file_id, repo_id)
+    return ret
+
+def _get_inner_path(repo_id, file_id, path):
     token = seafile_api.get_fileserver_access_token(repo_id,
             file_id, 'view', '', use_onetime=True)
 
     if not token:
-        return (False, 500)
+        return None
 
-    inner_path = gen_inner_file_get_url(token, os.path.basename(path))
+    return gen_inner_file_get_url(token, os.path.basename(path))
+
+def create_image_thumbnails(inner_path, file_id, sizes):
+    """Download an image from fileserver and create its thumbnails of
+    ``sizes``.
+
+    Run in a worker process, so it must not touch the RPC clients.
+    """
     try:
-        image_file = urllib2.urlopen(inner_path)
-        f = StringIO(image_file.read())
-        return _create_thumbnail_common(f, thumbnail_file, size)
+        f = _fetch_image(inner_path)
+        if f is None:
+            return (False, 403)
+
+        try:
+            return _create_thumbnail_common(f, file_id, sizes)
+        finally:
+            f.close()
     except Exception as e:
         logger.error(e)
         return (False, 500)
 
-def create_video_thumbnails(repo, file_id, path, size, thumbnail_file, file_size):
+def _fetch_image(inner_path):
+    """Download an image to a temp file chunk by chunk.
+
+    Image header is parsed while downloading, return ``None`` as soon as
+    the image is known to be too large.
+    """
+    image_file = urllib2.urlopen(inner_path)
+    f = tempfile.TemporaryFile()
+    try:
+        size_checked = False
+        fetched = 0
+        while True:
+            chunk = image_file.read(IMAGE_FETCH_CHUNK_SIZE)
+            if not chunk:
+                break
+            f.write(chunk)
+            fetched += len(chunk)
+
+            if size_checked:
+                continue
+
+            # Image.open() only reads the header, pixels are not decoded.
+            f.seek(0)
+            try:
+                width, height = Image.open(f).size
+            except Exception:
+                # header is not complete yet
+                size_checked = fetched >= IMAGE_HEADER_MAX_SIZE
+            else:
+                if _is_too_large(width, height):
+                    f.close()
+                    return None
+                size_checked = True
+            f.seek(0, os.SEEK_END)
+    except Exception:
+        f.close()
+        raise
+    finally:
+        image_file.close()
+
+    f.seek(0)
+    return f
+
+def create_video_thumbnails(repo, file_id, path, size, file_size):
 
     t1 = timeit.default_timer()
     token = seafile_api.get_fileserver_access_token(repo.id,
@@ -149,7 +383,7 @@ def create_video_thumbnails(repo, file_id, path, size, thumbnail_file, file_size
     logger.debug('Create thumbnail of [%s](size: %s) takes: %s' % (path, file_size, (t2 - t1)))
 
     try:
-        ret = _create_thumbnail_common(tmp_path, thumbnail_file, size)
+        ret = _create_thumbnail_common(tmp_path, file_id, [size])
         os.unlink(tmp_path)
         return ret
     except Exception as e:
@@ -157,25 +391,55 @@ def create_video_thumbnails(repo, file_id, path, size, thumbnail_file, file_size
         os.unlink(tmp_path)
         return (False, 500)
 
-def _create_thumbnail_common(fp, thumbnail_file, size):
-    """Common logic for creating image thumbnail.
+def _is_too_large(width, height):
+    # check image memory cost size limit
+    # use RGBA as default mode(4x8-bit pixels, true colour with transparency mask)
+    # every pixel will cost 4 byte in RGBA mode
+    image_memory_cost = width * height * 4 / 1024 / 1024
+    return image_memory_cost > THUMBNAIL_IMAGE_ORIGINAL_SIZE_LIMIT
 
-    `fp` can be a filename (string) or a file object.
+def _create_thumbnail_common(fp, file_id, sizes):
+    """Common logic for creating image thumbnails.
+
+    `fp` can be a filename (string) or a file object. The image is decoded
+    once, thumbnails are scaled down from the largest size to the smallest.
     """
     image = Image.open(fp)
 
-    # check image memory cost size limit
-    # use RGBA as default mode(4x8-bit pixels, true colour with transparency mask)
-    # every pixel will cost 4 byte in RGBA mode
     width, height = image.size
-    image_memory_cost = width * height * 4 / 1024 / 1024
-    if image_memory_cost > THUMBNAIL_IMAGE_ORIGINAL_SIZE_LIMIT:
+    if _is_too_large(width, height):
         return (False, 403)
 
+    sizes = sorted(sizes, reverse=True)
+    if not sizes:
+        return (True, 200)
+
+    # let JPEG decoder scale down the image, it is still no smaller than
+    # the largest thumbnail
+    image.draft(image.mode, (sizes[0], sizes[0]))
+
     if image.mode not in ["1", "L", "P", "RGB", "RGBA"]:
         image = image.convert("RGB")
 
     image = get_rotated_image(image)
-    image.thumbnail((size, size), Image.ANTIALIAS)
-    image.save(thumbnail_file, THUMBNAIL_EXTENSION)
+    for size in sizes:
+        image.thumbnail((size, size), Image.ANTIALIAS)
+        _save_thumbnail(image, get_thumbnail_file(file_id, size))
+
     return (True, 200)
+
+def _save_thumbnail(image, thumbnail_file):
+    """Save to a temp file first, so a thumbnail being written is never
+    served to others.
+    """
+    thumbnail_dir = os.path.dirname(thumbnail_file)
+    _makedirs(thumbnail_dir)
+
+    fd, tmp_file = tempfile.mkstemp(dir=thumbnail_dir)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            image.save(f, THUMBNAIL_EXTENSION)
+        os.rename(tmp_file, thumbnail_file)
+    except Exception:
+        os.unlink(tmp_file)
+        raise
@@ -17,9 +17,10 @@ from seaserv import get_repo, get_file_id_by_path
 from seahub.auth.decorators import login_required_ajax, login_required
 from seahub.views import check_folder_permission
 from seahub.settings import THUMBNAIL_DEFAULT_SIZE, THUMBNAIL_EXTENSION, \
-    THUMBNAIL_ROOT, ENABLE_THUMBNAIL
+    ENABLE_THUMBNAIL
 from seahub.thumbnail.utils import generate_thumbnail, \
-    get_thumbnail_src, get_share_link_thumbnail_src
+    get_thumbnail_src, get_share_link_thumbnail_src, get_thumbnail_file, \
+    touch_thumbnail
 from seahub.share.models import FileShare, check_share_link_common
 
 # Get an instance of a logger
@@ -59,6 +60,10 @@ def thumbnail_create(request, repo_id):
         src = get_thumbnail_src(repo_id, size, path)
         result['encoded_thumbnail_src'] = urlquote(src)
         return HttpResponse(json.dumps(result), content_type=content_type)
+    elif status_code == 202:
+        err_msg = _('Thumbnail is being generated, please try again later.')
+        return HttpResponse(json.dumps({'err_msg': err_msg}),
+                status=status_code, content_type=content_type)
     else:
         err_msg = _('Failed to create thumbnail.')
         return HttpResponse(json.dumps({'err_msg': err_msg}),
@@ -68,7 +73,7 @@ def latest_entry(request, repo_id, size, path):
     obj_id = get_file_id_by_path(repo_id, path)
     if obj_id:
         try:
-            thumbnail_file = os.path.join(THUMBNAIL_ROOT, str(size), obj_id)
+            thumbnail_file = get_thumbnail_file(obj_id, size)
             last_modified_time = os.path.getmtime(thumbnail_file)
             # convert float to datatime obj
             return datetime.datetime.fromtimestamp(last_modified_time)
@@ -106,8 +111,10 @@ def thumbnail_get(request, repo_id, size, path):
         return HttpResponse()
 
     success = True
-    thumbnail_file = os.path.join(THUMBNAIL_ROOT, str(size), obj_id)
-    if not os.path.exists(thumbnail_file):
+    thumbnail_file = get_thumbnail_file(obj_id, size)
+    if os.path.exists(thumbnail_file):
+        touch_thumbnail(thumbnail_file)
+    else:
         success, status_code = generate_thumbnail(request, repo_id, size, path)
 
     if success:
@@ -179,6 +186,10 @@ def share_link_thumbnail_create(request, token):
         src = get_share_link_thumbnail_src(token, size, req_path)
         result['encoded_thumbnail_src'] = urlquote(src)
         return HttpResponse(json.dumps(result), content_type=content_type)
+    elif status_code == 202:
+        err_msg = _('Thumbnail is being generated, please try again later.')
+        return HttpResponse(json.dumps({'err_msg': err_msg}),
+                status=status_code, content_type=content_type)
     else:
         err_msg = _('Failed to create thumbnail.')
         return HttpResponse(json.dumps({'err_msg': err_msg}),
@@ -199,7 +210,7 @@ def share_link_latest_entry(request, token, size, path):
     obj_id = get_file_id_by_path(repo_id, image_path)
     if obj_id:
         try:
-            thumbnail_file = os.path.join(THUMBNAIL_ROOT, str(size), obj_id)
+            thumbnail_file = get_thumbnail_file(obj_id, size)
             last_modified_time = os.path.getmtime(thumbnail_file)
             # convert float to datatime obj
             return datetime.datetime.fromtimestamp(last_modified_time)
@@ -248,8 +259,10 @@ def share_link_thumbnail_get(request, token, size, path):
         return HttpResponse()
 
     success = True
-    thumbnail_file = os.path.join(THUMBNAIL_ROOT, str(size), obj_id)
-    if not os.path.exists(thumbnail_file):
+    thumbnail_file = get_thumbnail_file(obj_id, size)
+    if os.path.exists(thumbnail_file):
+        touch_thumbnail(thumbnail_file)
+    else:
         success, status_code = generate_thumbnail(request, repo_id, size, image_path)
 
     if success:
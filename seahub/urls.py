@@ -78,6 +78,8 @@ from seahub.api2.endpoints.admin.logs import AdminLogs
 from seahub.api2.endpoints.admin.org_users import AdminOrgUsers, AdminOrgUser
 from seahub.api2.endpoints.admin.logo import AdminLogo
 from seahub.api2.endpoints.admin.favicon import AdminFavicon
+from seahub.api2.endpoints.admin.export_task import AdminExportTask, \
+    AdminQueryExportProgress, AdminExportTaskDownload
 
 # Uncomment the next two lines to enable the admin:
 #from django.contrib import admin
@@ -315,6 +317,11 @@ urlpatterns = patterns(
     url(r'^api/v2.1/admin/logo/$', AdminLogo.as_view(), name='api-v2.1-admin-logo'),
     url(r'^api/v2.1/admin/favicon/$', AdminFavicon.as_view(), name='api-v2.1-admin-favicon'),
 
+    ## admin::export
+    url(r'^api/v2.1/admin/export-task/$', AdminExportTask.as_view(), name='api-v2.1-admin-export-task'),
+    url(r'^api/v2.1/admin/query-export-progress/$', AdminQueryExportProgress.as_view(), name='api-v2.1-admin-query-export-progress'),
+    url(r'^api/v2.1/admin/export-task/download/$', AdminExportTaskDownload.as_view(), name='api-v2.1-admin-export-task-download'),
+
     (r'^avatar/', include('seahub.avatar.urls')),
     (r'^notification/', include('seahub.notifications.urls')),
     (r'^contacts/', include('seahub.contacts.urls')),
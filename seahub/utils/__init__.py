@@ -772,9 +772,9 @@ def get_site_scheme_and_netloc():
     parse_result = urlparse(get_service_url())
     return "%s://%s" % (parse_result.scheme, parse_result.netloc)
 
-def send_html_email(subject, con_template, con_context, from_email, to_email,
-                    reply_to=None):
-    """Send HTML email
+def gen_html_email(subject, con_template, con_context, from_email, to_email,
+                   reply_to=None):
+    """Return an HTML email message, which is sent by ``msg.send()``.
     """
     base_context = {
         'url_base': get_site_scheme_and_netloc(),
@@ -793,7 +793,14 @@ def send_html_email(subject, con_template, con_context, from_email, to_email,
     msg = EmailMessage(subject, t.render(Context(con_context)), from_email,
                        to_email, headers=headers)
     msg.content_subtype = "html"
-    msg.send()
+    return msg
+
+def send_html_email(subject, con_template, con_context, from_email, to_email,
+                    reply_to=None):
+    """Send HTML email
+    """
+    gen_html_email(subject, con_template, con_context, from_email, to_email,
+                   reply_to=reply_to).send()
 
 def gen_dir_share_link(token):
     """Generate directory share link.
@@ -0,0 +1,150 @@
+# Copyright (c) 2012-2016 Seafile Ltd.
+"""
+Cache of directory listings.
+
+A dir object is content addressed, so dirents listed by the same
+``dir_id`` never change, except for the permission of the user listing
+them and the file lock fields in pro edition. Listings are cached in
+process, keyed by repo id, dir id, the permission class of the user and a
+per repo lock version which is bumped when a file is locked or unlocked in
+web. Locks taken by clients or WOPI, and locks expiring, do not bump it, so
+listings with lock fields are only kept ``DIR_LIST_LOCK_CACHE_TIMEOUT``
+seconds.
+
+Listings are not cached when folder permission is enabled, since the
+permission of a dirent then depends on its path, and changes without a new
+dir id.
+"""
+import json
+import time
+import threading
+from collections import namedtuple, OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+
+from seahub.utils import normalize_cache_key
+
+# Total size(bytes) of cached listings in one process, 0 to disable cache.
+DIR_LIST_CACHE_MAX_SIZE = getattr(settings, 'DIR_LIST_CACHE_MAX_SIZE',
+                                  32 * 1024 * 1024)
+DIR_LIST_CACHE_TIMEOUT = getattr(settings, 'DIR_LIST_CACHE_TIMEOUT', 10 * 60)
+# Seconds a listing with file lock fields (pro edition) is cached.
+DIR_LIST_LOCK_CACHE_TIMEOUT = getattr(settings, 'DIR_LIST_LOCK_CACHE_TIMEOUT', 3)
+
+LOCK_VERSION_CACHE_PREFIX = 'DIR_LIST_LOCK_VERSION_'
+LOCK_VERSION_CACHE_TIMEOUT = 30 * 24 * 60 * 60
+
+CachedDirent = namedtuple('CachedDirent', [
+    'mode', 'obj_name', 'obj_id', 'mtime', 'permission', 'modifier', 'size',
+    'is_locked', 'lock_owner', 'lock_time'])
+
+class LRUCache(object):
+    """Thread safe LRU cache of strings, bounded by their total length.
+    """
+    def __init__(self, max_size, timeout):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.size = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.pop(key, None)
+            if item is None:
+                return None
+
+            value, expire_at = item
+            if expire_at < time.time():
+                self.size -= len(value)
+                return None
+
+            self._data[key] = item
+            return value
+
+    def set(self, key, value, timeout=None):
+        """Cache ``value`` for ``timeout`` seconds, or the default timeout of
+        the cache if not given.
+        """
+        if len(value) > self.max_size:
+            return
+
+        if timeout is None:
+            timeout = self.timeout
+
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.size -= len(old[0])
+
+            while self._data and self.size + len(value) > self.max_size:
+                _, (evicted, _) = self._data.popitem(last=False)
+                self.size -= len(evicted)
+                self.evictions += 1
+
+            self._data[key] = (value, time.time() + timeout)
+            self.size += len(value)
+
+    def delete(self, key):
+        with self._lock:
+            item = self._data.pop(key, None)
+            if item is not None:
+                self.size -= len(item[0])
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.size = 0
+
+_dir_list_cache = LRUCache(DIR_LIST_CACHE_MAX_SIZE, DIR_LIST_CACHE_TIMEOUT)
+
+def _lock_version_key(repo_id):
+    return normalize_cache_key(repo_id, LOCK_VERSION_CACHE_PREFIX)
+
+def get_lock_version(repo_id):
+    return cache.get(_lock_version_key(repo_id), 0)
+
+def bump_lock_version(repo_id):
+    """Invalidate cached listings of a repo after a file in it is locked or
+    unlocked.
+    """
+    key = _lock_version_key(repo_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, LOCK_VERSION_CACHE_TIMEOUT)
+
+def _make_key(repo_id, dir_id, perm_class, lock_version):
+    return '%s_%s_%s_%s' % (repo_id, dir_id, perm_class, lock_version)
+
+def get_cached_dirents(repo_id, dir_id, perm_class, lock_version=0):
+    """Return a list of ``CachedDirent``, or ``None`` if not cached.
+    """
+    if DIR_LIST_CACHE_MAX_SIZE <= 0:
+        return None
+
+    value = _dir_list_cache.get(_make_key(repo_id, dir_id, perm_class,
+                                          lock_version))
+    if value is None:
+        return None
+
+    return [CachedDirent(*x) for x in json.loads(value)]
+
+def set_cached_dirents(repo_id, dir_id, perm_class, dirents, lock_version=0,
+                       with_locks=False):
+    """Cache a listing, ``with_locks`` tells whether lock fields of
+    ``dirents`` are used.
+    """
+    if DIR_LIST_CACHE_MAX_SIZE <= 0:
+        return
+
+    value = json.dumps([
+        (d.mode, d.obj_name, d.obj_id, d.mtime, d.permission,
+         getattr(d, 'modifier', None), getattr(d, 'size', 0),
+         getattr(d, 'is_locked', False), getattr(d, 'lock_owner', None),
+         getattr(d, 'lock_time', 0)) for d in dirents])
+    timeout = DIR_LIST_LOCK_CACHE_TIMEOUT if with_locks else None
+    _dir_list_cache.set(_make_key(repo_id, dir_id, perm_class, lock_version),
+                        value, timeout)
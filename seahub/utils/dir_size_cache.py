@@ -0,0 +1,101 @@
+# Copyright (c) 2012-2016 Seafile Ltd.
+"""
+Cache of directory sizes.
+
+A dir object is content addressed, so the size of a dir never changes for
+the same ``(store_id, dir_id)``. Sizes are computed by seaf-server only once,
+then kept in a bounded in-process LRU, backed by django cache, which is
+shared by processes and survives restarts with the default SQLite based
+backend.
+"""
+import stat
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from seaserv import seafile_api
+
+from seahub.utils import normalize_cache_key, EMPTY_SHA1
+
+# Max number of sizes kept in one process, 0 to disable the in-process cache.
+DIR_SIZE_CACHE_MAX_ENTRIES = getattr(settings, 'DIR_SIZE_CACHE_MAX_ENTRIES',
+                                     10000)
+# Seconds a size is kept in django cache, 0 to disable it.
+DIR_SIZE_CACHE_TIMEOUT = getattr(settings, 'DIR_SIZE_CACHE_TIMEOUT',
+                                 7 * 24 * 60 * 60)
+
+DIR_SIZE_CACHE_PREFIX = 'DIR_SIZE_'
+
+_sizes = OrderedDict()
+_sizes_lock = threading.Lock()
+
+def _get_local(key):
+    with _sizes_lock:
+        size = _sizes.pop(key, None)
+        if size is not None:
+            _sizes[key] = size
+        return size
+
+def _set_local(key, size):
+    if DIR_SIZE_CACHE_MAX_ENTRIES <= 0:
+        return
+
+    with _sizes_lock:
+        _sizes.pop(key, None)
+        while len(_sizes) >= DIR_SIZE_CACHE_MAX_ENTRIES:
+            _sizes.popitem(last=False)
+        _sizes[key] = size
+
+def get_dir_size(store_id, version, dir_id):
+    """Return total size of files in dir ``dir_id`` and its sub dirs.
+    """
+    if dir_id == EMPTY_SHA1:
+        return 0
+
+    key = normalize_cache_key('%s_%s' % (store_id, dir_id),
+                              DIR_SIZE_CACHE_PREFIX)
+    size = _get_local(key)
+    if size is not None:
+        return size
+
+    if DIR_SIZE_CACHE_TIMEOUT > 0:
+        size = cache.get(key)
+
+    if size is None:
+        size = seafile_api.get_dir_size(store_id, version, dir_id)
+        if DIR_SIZE_CACHE_TIMEOUT > 0:
+            cache.set(key, size, DIR_SIZE_CACHE_TIMEOUT)
+
+    _set_local(key, size)
+    return size
+
+def get_dirents_size(repo, parent_dir, dirent_names):
+    """Return total size of dirents named ``dirent_names`` in
+    ``parent_dir``, nonexistent ones are skipped.
+
+    The parent dir is listed once to get sizes of files and ids of sub dirs,
+    instead of looking up each dirent by path.
+    """
+    dir_id = seafile_api.get_dir_id_by_path(repo.id, parent_dir)
+    if not dir_id:
+        return 0
+
+    dirents = dict([(d.obj_name, d) for d in
+                    seafile_api.list_dir_by_dir_id(repo.id, dir_id) or []])
+    total_size = 0
+    for name in set(dirent_names):
+        dirent = dirents.get(name)
+        if dirent is None:
+            continue
+
+        if stat.S_ISDIR(dirent.mode):
+            total_size += get_dir_size(repo.store_id, repo.version,
+                                       dirent.obj_id)
+        elif repo.version == 0:
+            total_size += seafile_api.get_file_size(repo.store_id,
+                                                    repo.version, dirent.obj_id)
+        else:
+            total_size += dirent.size
+
+    return total_size
@@ -0,0 +1,147 @@
+# Copyright (c) 2012-2016 Seafile Ltd.
+"""
+Reports exported by system admins in background.
+
+A task runs on a local thread pool and writes the report to a file under
+``ADMIN_EXPORT_ROOT``. Its progress is recorded in django cache, so clients
+can poll it and download the file once the task is done. Task records and
+files are removed ``ADMIN_EXPORT_TTL`` seconds after their last update.
+"""
+import os
+import time
+import uuid
+import logging
+import threading
+from multiprocessing.pool import ThreadPool
+
+from django.core.cache import cache
+from django.db import connection
+from django.utils import translation
+
+from seahub.settings import ADMIN_EXPORT_ROOT, ADMIN_EXPORT_WORKERS, \
+    ADMIN_EXPORT_TTL
+from seahub.utils import normalize_cache_key
+from seahub.utils.ms_excel import write_xls, stream_csv
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = ('xlsx', 'csv')
+EXPORT_TASK_CACHE_PREFIX = 'ADMIN_EXPORT_TASK_'
+# Number of rows exported between two progress updates.
+PROGRESS_UPDATE_INTERVAL = 100
+
+_export_pool = None
+_export_pool_lock = threading.Lock()
+
+def _get_export_pool():
+    # Create the pool lazily, so that it is not shared by forked workers.
+    global _export_pool
+    with _export_pool_lock:
+        if _export_pool is None:
+            _export_pool = ThreadPool(ADMIN_EXPORT_WORKERS)
+    return _export_pool
+
+def _task_key(task_id):
+    return normalize_cache_key(task_id, EXPORT_TASK_CACHE_PREFIX)
+
+def _update_task(task_id, task, **kwargs):
+    task.update(kwargs)
+    cache.set(_task_key(task_id), task, ADMIN_EXPORT_TTL)
+
+def get_export_task(task_id):
+    """Return a dict with ``username``, ``name``, ``format``, ``status``
+    ('pending', 'running', 'done' or 'failed'), ``done`` and ``total`` of a
+    task, or ``None`` if it does not exist or has expired.
+    """
+    return cache.get(_task_key(task_id))
+
+def get_export_file(task_id, task):
+    return os.path.join(ADMIN_EXPORT_ROOT, '%s.%s' % (task_id, task['format']))
+
+def clean_expired_export_files():
+    """Remove exported files not updated in ``ADMIN_EXPORT_TTL`` seconds.
+    """
+    if not os.path.isdir(ADMIN_EXPORT_ROOT):
+        return
+
+    expire_before = time.time() - ADMIN_EXPORT_TTL
+    for name in os.listdir(ADMIN_EXPORT_ROOT):
+        path = os.path.join(ADMIN_EXPORT_ROOT, name)
+        try:
+            if os.path.getmtime(path) < expire_before:
+                os.remove(path)
+        except OSError as e:
+            logger.warning(e)
+
+def start_export_task(username, name, exporter, file_format='xlsx'):
+    """Export a report in background, and return the task id.
+
+    ``exporter`` is called in a worker thread, and returns a
+    ``(head, total, rows)`` tuple, where ``rows`` is an iterable of
+    ``total`` rows.
+    """
+    clean_expired_export_files()
+
+    task_id = uuid.uuid4().hex
+    task = {
+        'username': username,
+        'name': name,
+        'format': file_format,
+        'language': translation.get_language(),
+        'status': 'pending',
+        'done': 0,
+        'total': 0,
+    }
+    _update_task(task_id, task)
+    _get_export_pool().apply_async(_run_export_task,
+                                   (task_id, task, exporter))
+    return task_id
+
+def _track_progress(task_id, task, rows):
+    done = 0
+    for row in rows:
+        yield row
+        done += 1
+        if done % PROGRESS_UPDATE_INTERVAL == 0:
+            _update_task(task_id, task, done=done)
+    task['done'] = done
+
+def _run_export_task(task_id, task, exporter):
+    path = get_export_file(task_id, task)
+    tmp_path = path + '.tmp'
+    translation.activate(task['language'])
+    try:
+        if not os.path.isdir(ADMIN_EXPORT_ROOT):
+            try:
+                os.makedirs(ADMIN_EXPORT_ROOT)
+            except OSError:
+                # created by another worker
+                pass
+
+        head, total, rows = exporter()
+        _update_task(task_id, task, status='running', total=total)
+        rows = _track_progress(task_id, task, rows)
+
+        if task['format'] == 'csv':
+            with open(tmp_path, 'wb') as f:
+                for chunk in stream_csv(head, rows):
+                    f.write(chunk)
+        else:
+            wb = write_xls(task['name'], head, rows)
+            if not wb:
+                raise ValueError('Failed to create excel workbook.')
+            wb.save(tmp_path)
+
+        os.rename(tmp_path, path)
+    except Exception:
+        logger.exception('Failed to export %s.' % task['name'])
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        _update_task(task_id, task, status='failed')
+        return
+    finally:
+        translation.deactivate()
+        # worker threads open their own database connection
+        connection.close()
+
+    _update_task(task_id, task, status='done')
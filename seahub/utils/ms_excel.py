@@ -1,34 +1,87 @@
 # Copyright (c) 2012-2016 Seafile Ltd.
+import codecs
+import csv
 import logging
+import tempfile
+from wsgiref.util import FileWrapper
+
 import openpyxl
+from django.http import StreamingHttpResponse
 
 logger = logging.getLogger(__name__)
 
+# Number of csv rows sent in one chunk.
+CSV_STREAM_CHUNK_SIZE = 100
+
 def write_xls(sheet_name, head, data_list):
     """write listed data into excel
+
+    ``data_list`` can be any iterable of rows, e.g. a generator. Rows are
+    written to a write-only worksheet, which keeps them in a temp file
+    instead of memory.
     """
 
     try:
-        wb = openpyxl.Workbook()
-        ws = wb.get_active_sheet()
+        wb = openpyxl.Workbook(write_only=True)
+        ws = wb.create_sheet(title=sheet_name)
     except Exception as e:
         logger.error(e)
         return None
 
-    ws.title = sheet_name
-
-    row_num = 0
-
     # write table head
-    for col_num in xrange(len(head)):
-        c = ws.cell(row = row_num + 1, column = col_num + 1)
-        c.value = head[col_num]
+    ws.append(head)
 
     # write table data
     for row in data_list:
-        row_num += 1
-        for col_num in xrange(len(row)):
-            c = ws.cell(row = row_num + 1, column = col_num + 1)
-            c.value = row[col_num]
+        ws.append(row)
 
     return wb
+
+def xls_response(wb, filename):
+    """Save workbook to a temp file, and send it in chunks.
+    """
+    f = tempfile.TemporaryFile()
+    wb.save(f)
+    size = f.tell()
+    f.seek(0)
+
+    response = StreamingHttpResponse(FileWrapper(f),
+                                     content_type='application/ms-excel')
+    response['Content-Length'] = size
+    response['Content-Disposition'] = 'attachment; filename=%s' % filename
+    return response
+
+class _Echo(object):
+    """File-like object returning what is written, used to get lines from
+    csv writer.
+    """
+    def write(self, value):
+        return value
+
+def _encode_row(row):
+    return [x.encode('utf-8') if isinstance(x, unicode) else x for x in row]
+
+def stream_csv(head, data_list, chunk_size=CSV_STREAM_CHUNK_SIZE):
+    """Serialize head and rows in ``data_list`` to csv lines, yielding
+    ``chunk_size`` lines at a time.
+    """
+    writer = csv.writer(_Echo())
+
+    # let excel know the file is utf-8 encoded
+    buf = [codecs.BOM_UTF8, writer.writerow(_encode_row(head))]
+    for row in data_list:
+        buf.append(writer.writerow(_encode_row(row)))
+        if len(buf) >= chunk_size:
+            yield ''.join(buf)
+            buf = []
+
+    if buf:
+        yield ''.join(buf)
+
+def csv_response(head, data_list, filename):
+    """Send rows as csv while they are being generated.
+    """
+    response = StreamingHttpResponse(stream_csv(head, data_list),
+                                     content_type='text/csv')
+    response['Content-Disposition'] = 'attachment; filename=%s' % filename
+    return response
@@ -0,0 +1,72 @@
+# Copyright (c) 2012-2016 Seafile Ltd.
+"""
+Cache of the organization of users, in multi-tenancy mode.
+
+The organization of a user is kept in process for ``ORG_CACHE_TIMEOUT``
+seconds. Each entry records the version of the user's membership, which is
+stored in django cache and bumped by ``invalidate_user_org`` when the user
+is added to or removed from an organization, so every process drops the
+entry on its next lookup.
+"""
+import time
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+
+from seahub.api2.token_cache import invalidate_user_tokens
+from seahub.utils import normalize_cache_key
+from seahub.utils.rpc import request_ccnet_api
+
+# Seconds organization of a user is kept in process, 0 to disable the cache.
+ORG_CACHE_TIMEOUT = getattr(settings, 'ORG_CACHE_TIMEOUT', 60)
+ORG_CACHE_MAX_ENTRIES = getattr(settings, 'ORG_CACHE_MAX_ENTRIES', 10000)
+
+ORG_VERSION_CACHE_PREFIX = 'USER_ORG_VERSION_'
+VERSION_CACHE_TIMEOUT = 30 * 24 * 60 * 60
+
+_orgs = OrderedDict()
+_orgs_lock = threading.Lock()
+
+def _version_key(username):
+    return normalize_cache_key(username, ORG_VERSION_CACHE_PREFIX)
+
+def get_user_org(username):
+    """Return organization of a user, or ``None``.
+
+    Organizations are shared by requests, callers should not modify them.
+    """
+    if ORG_CACHE_TIMEOUT <= 0:
+        orgs = request_ccnet_api.get_orgs_by_user(username)
+        return orgs[0] if orgs else None
+
+    version = cache.get(_version_key(username), 0)
+    with _orgs_lock:
+        entry = _orgs.get(username)
+    if entry is not None:
+        org, entry_version, expire_at = entry
+        if entry_version == version and expire_at > time.time():
+            return org
+
+    orgs = request_ccnet_api.get_orgs_by_user(username)
+    org = orgs[0] if orgs else None
+
+    with _orgs_lock:
+        _orgs.pop(username, None)
+        while len(_orgs) >= ORG_CACHE_MAX_ENTRIES:
+            _orgs.popitem(last=False)
+        _orgs[username] = (org, version, time.time() + ORG_CACHE_TIMEOUT)
+    return org
+
+def invalidate_user_org(username):
+    """Drop cached organization of a user in all processes, to be called
+    after the user is added to or removed from an organization.
+    """
+    key = _version_key(username)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, VERSION_CACHE_TIMEOUT)
+    # users resolved from api tokens carry their organization too
+    invalidate_user_tokens(username)
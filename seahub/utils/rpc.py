@@ -4,24 +4,27 @@ Proxy RPC calls to seafile_api, silence RPC errors, emulating Ruby's
 "method_missing".
 """
 
+from collections import Counter
 from functools import partial
 import logging
+import threading
 
-from seaserv import seafile_api
+from seaserv import seafile_api, ccnet_api
 from pysearpc import SearpcError
 
 # Get an instance of a logger
 logger = logging.getLogger(__name__)
 
 class RPCProxy(object):
-    def __init__(self, mute=False):
+    def __init__(self, mute=False, api=seafile_api):
         self.mute = mute
+        self.api = api
 
     def __getattr__(self, name):
         return partial(self.method_missing, name)
 
     def method_missing(self, name, *args, **kwargs):
-        real_func = getattr(seafile_api, name)
+        real_func = getattr(self.api, name)
         if self.mute:
             try:
                 return real_func(*args, **kwargs)
@@ -33,3 +36,91 @@ class RPCProxy(object):
 
 
 mute_seafile_api = RPCProxy(mute=True)
+
+# RPCs named with these prefixes only read data
+READ_ONLY_PREFIXES = ('get_', 'check_', 'is_', 'list_', 'count_')
+# read-like RPCs which have side effects or return a different value each time
+NOT_MEMOIZED = frozenset([
+    'get_fileserver_access_token',
+    'get_httpserver_access_token',
+])
+
+class MemoizedRPCProxy(RPCProxy):
+    """Return results of read only RPCs called with same arguments from
+    memory. Any other RPC clears the memoized results.
+
+    Results are shared by callers, they should not be modified.
+    """
+    def __init__(self, mute=False, api=seafile_api):
+        super(MemoizedRPCProxy, self).__init__(mute, api)
+        self.results = {}
+        self.hits = Counter()
+        self.misses = Counter()
+
+    def is_read_only(self, name):
+        return name.startswith(READ_ONLY_PREFIXES) and \
+            name not in NOT_MEMOIZED
+
+    def method_missing(self, name, *args, **kwargs):
+        if not self.is_read_only(name):
+            self.results.clear()
+            return super(MemoizedRPCProxy, self).method_missing(
+                name, *args, **kwargs)
+
+        key = (name, args, tuple(sorted(kwargs.items())))
+        try:
+            if key in self.results:
+                self.hits[name] += 1
+                return self.results[key]
+        except TypeError:
+            # unhashable arguments
+            return super(MemoizedRPCProxy, self).method_missing(
+                name, *args, **kwargs)
+
+        self.misses[name] += 1
+        ret = super(MemoizedRPCProxy, self).method_missing(
+            name, *args, **kwargs)
+        self.results[key] = ret
+        return ret
+
+    def get_stats(self):
+        """Return a dict of RPC name to ``(hits, misses)``.
+        """
+        return dict([(name, (self.hits[name], self.misses[name]))
+                     for name in set(self.hits) | set(self.misses)])
+
+
+_request_local = threading.local()
+
+class RequestRPCProxy(object):
+    """Call RPCs through the memoizing proxy of current request, set by
+    ``begin_request_rpc_cache``, or call them directly outside a request.
+    """
+    def __init__(self, api_name, api):
+        self.api_name = api_name
+        self.api = api
+
+    def __getattr__(self, name):
+        proxies = getattr(_request_local, 'proxies', None)
+        if proxies is None:
+            return getattr(self.api, name)
+        return getattr(proxies[self.api_name], name)
+
+request_seafile_api = RequestRPCProxy('seafile_api', seafile_api)
+request_ccnet_api = RequestRPCProxy('ccnet_api', ccnet_api)
+
+def begin_request_rpc_cache():
+    _request_local.proxies = {
+        'seafile_api': MemoizedRPCProxy(api=seafile_api),
+        'ccnet_api': MemoizedRPCProxy(api=ccnet_api),
+    }
+
+def end_request_rpc_cache():
+    """Stop memoizing RPCs, return a dict of api name to its RPC stats.
+    """
+    proxies = getattr(_request_local, 'proxies', None)
+    _request_local.proxies = None
+    if proxies is None:
+        return {}
+
+    return dict([(name, proxy.get_stats()) for name, proxy in proxies.items()])
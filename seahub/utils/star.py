@@ -63,3 +63,12 @@ def get_dir_starred_files(email, repo_id, parent_dir, org_id=-1):
                                          org_id=org_id)
     return [ f.path for f in starred_files ]
 
+def get_starred_paths(email, repo_id, paths, chunk_size=500):
+    """Return the set of ``paths`` starred by ``email`` in a repo.
+    """
+    starred = set()
+    for i in range(0, len(paths), chunk_size):
+        starred.update(UserStarredFiles.objects.filter(
+            email=email, repo_id=repo_id,
+            path__in=paths[i:i + chunk_size]).values_list('path', flat=True))
+    return starred
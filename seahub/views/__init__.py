@@ -45,7 +45,9 @@ from seahub.utils import render_permission_error, render_error, \
     is_pro_version, FILE_AUDIT_ENABLED, is_valid_dirent_name, \
     is_org_repo_creation_allowed, is_windows_operating_system
 from seahub.utils.star import get_dir_starred_files
+from seahub.utils.dir_size_cache import get_dir_size
 from seahub.utils.timeutils import utc_to_local
+from seahub.utils.rpc import request_seafile_api
 from seahub.views.modules import MOD_PERSONAL_WIKI, enable_mod_for_user, \
     disable_mod_for_user
 import seahub.settings as settings
@@ -99,7 +101,8 @@ def check_folder_permission(request, repo_id, path):
     - `path`:
     """
     username = request.user.username
-    return seafile_api.check_permission_by_path(repo_id, path, username)
+    return request_seafile_api.check_permission_by_path(repo_id, path,
+                                                        username)
 
 def check_file_lock(repo_id, file_path, username):
     """ check if file is locked to current user
@@ -975,8 +978,7 @@ def repo_download_dir(request, repo_id):
         dir_id = seafile_api.get_dir_id_by_commit_and_path(repo.id,
             repo.head_cmmt_id, path)
         try:
-            total_size = seafile_api.get_dir_size(repo.store_id,
-                repo.version, dir_id)
+            total_size = get_dir_size(repo.store_id, repo.version, dir_id)
         except Exception, e:
             logger.error(str(e))
             return render_error(request, _(u'Internal Error'))
@@ -3,11 +3,13 @@
 import os
 import stat
 import logging
+import threading
 import json
 import posixpath
 import csv
 import chardet
 import StringIO
+from multiprocessing.pool import ThreadPool
 
 from django.core.urlresolvers import reverse
 from django.http import HttpResponse, Http404
@@ -37,16 +39,18 @@ from seahub.views import get_unencry_rw_repos_by_user, \
 from seahub.group.utils import is_group_member, is_group_admin_or_owner, \
     get_group_member_info
 import seahub.settings as settings
-from seahub.settings import ENABLE_THUMBNAIL, THUMBNAIL_ROOT, \
+from seahub.settings import ENABLE_THUMBNAIL, GROUP_REPOS_LIST_WORKERS, \
     THUMBNAIL_DEFAULT_SIZE, SHOW_TRAFFIC, MEDIA_URL
 from seahub.utils import check_filename_with_rename, EMPTY_SHA1, \
     gen_block_get_url, TRAFFIC_STATS_ENABLED, get_user_traffic_stat,\
     new_merge_with_no_conflict, get_commit_before_new_merge, \
-    get_repo_last_modify, gen_file_upload_url, is_org_context, \
+    gen_file_upload_url, is_org_context, \
     get_file_type_and_ext, is_pro_version
 from seahub.utils.star import get_dir_starred_files
+from seahub.utils.dir_size_cache import get_dirents_size
 from seahub.base.accounts import User
-from seahub.thumbnail.utils import get_thumbnail_src
+from seahub.thumbnail.utils import get_thumbnail_src, get_thumbnail_file
+from seahub.utils.rpc import request_seafile_api
 from seahub.utils.file_types import IMAGE, VIDEO
 from seahub.base.templatetags.seahub_tags import translate_seahub_time, \
     email2nickname, tsstr_sec
@@ -203,7 +207,7 @@ def list_lib_dir(request, repo_id):
     content_type = 'application/json; charset=utf-8'
     result = {}
 
-    repo = get_repo(repo_id)
+    repo = request_seafile_api.get_repo(repo_id)
     if not repo:
         err_msg = _(u'Library does not exist.')
         return HttpResponse(json.dumps({'error': err_msg}),
@@ -222,7 +226,7 @@ def list_lib_dir(request, repo_id):
                             status=403, content_type=content_type)
 
     if repo.encrypted \
-            and not seafile_api.is_password_set(repo.id, username):
+            and not request_seafile_api.is_password_set(repo.id, username):
         err_msg = _(u'Library is encrypted.')
         return HttpResponse(json.dumps({'error': err_msg, 'lib_need_decrypt': True}),
                             status=403, content_type=content_type)
@@ -237,7 +241,7 @@ def list_lib_dir(request, repo_id):
     file_list = []
 
     try:
-        dir_id = seafile_api.get_dir_id_by_path(repo.id, path)
+        dir_id = request_seafile_api.get_dir_id_by_path(repo.id, path)
     except SearpcError as e:
         logger.error(e)
         err_msg = 'Internal Server Error'
@@ -275,9 +279,9 @@ def list_lib_dir(request, repo_id):
             file_list.append(dirent)
 
     if is_org_context(request):
-        repo_owner = seafile_api.get_org_repo_owner(repo.id)
+        repo_owner = request_seafile_api.get_org_repo_owner(repo.id)
     else:
-        repo_owner = seafile_api.get_repo_owner(repo.id)
+        repo_owner = request_seafile_api.get_repo_owner(repo.id)
 
     result["is_repo_owner"] = False
     result["has_been_shared_out"] = False
@@ -347,7 +351,7 @@ def list_lib_dir(request, repo_id):
             f_['is_video'] = True
         if file_type == IMAGE or file_type == VIDEO:
             if not repo.encrypted and ENABLE_THUMBNAIL and \
-                os.path.exists(os.path.join(THUMBNAIL_ROOT, str(size), f.obj_id)):
+                os.path.exists(get_thumbnail_file(f.obj_id, size)):
                 file_path = posixpath.join(path, f.obj_name)
                 src = get_thumbnail_src(repo_id, size, file_path)
                 f_['encoded_thumbnail_src'] = urlquote(src)
@@ -585,19 +589,9 @@ def dirents_copy_move_common():
             # operation, 1), if move file, check parent dir perm, 2), if move
             # folder, check that folder perm.
 
-            file_obj_size = 0
-            for obj_name in obj_file_names:
-                full_obj_path = posixpath.join(parent_dir, obj_name)
-                file_obj_id = seafile_api.get_file_id_by_path(repo_id, full_obj_path)
-                file_obj_size += seafile_api.get_file_size(
-                        repo.store_id, repo.version, file_obj_id)
-
-            dir_obj_size = 0
-            for obj_name in obj_dir_names:
-                full_obj_path = posixpath.join(parent_dir, obj_name)
-                dir_obj_id = seafile_api.get_dir_id_by_path(repo_id, full_obj_path)
-                dir_obj_size += seafile_api.get_dir_size(
-                        repo.store_id, repo.version, dir_obj_id)
+            # list parent dir once to get sizes of all selected dirents
+            obj_size = get_dirents_size(repo, parent_dir,
+                                        obj_file_names + obj_dir_names)
 
             # check quota
             src_repo_owner = seafile_api.get_repo_owner(repo_id)
@@ -606,13 +600,13 @@ def dirents_copy_move_common():
                 # always check quota when copy file
                 if view_method.__name__ == 'cp_dirents':
                     out_of_quota = seafile_api.check_quota(
-                            dst_repo_id, delta=file_obj_size + dir_obj_size)
+                            dst_repo_id, delta=obj_size)
                 else:
                     # when move file
                     if src_repo_owner != dst_repo_owner:
                         # only check quota when src_repo_owner != dst_repo_owner
                         out_of_quota = seafile_api.check_quota(
-                                dst_repo_id, delta=file_obj_size + dir_obj_size)
+                                dst_repo_id, delta=obj_size)
                     else:
                         # not check quota when src and dst repo are both mine
                         out_of_quota = False
@@ -986,51 +980,74 @@ def get_groups_by_user(request):
     else:
         return seaserv.get_personal_groups_by_user(username)
 
+_group_repos_pool = None
+_group_repos_pool_lock = threading.Lock()
+
+def _get_group_repos_pool():
+    # Create the pool lazily, so that it is not shared by forked workers.
+    global _group_repos_pool
+    with _group_repos_pool_lock:
+        if _group_repos_pool is None:
+            _group_repos_pool = ThreadPool(GROUP_REPOS_LIST_WORKERS)
+    return _group_repos_pool
+
+class _GroupRepo(object):
+    """A repo shared to ``group``, other attributes are read from the repo,
+    which may be shared to other groups too.
+    """
+    def __init__(self, repo, group):
+        self._repo = repo
+        self.group = group
+
+    def __getattr__(self, name):
+        return getattr(self._repo, name)
+
 def get_group_repos(request, groups):
     """Get repos shared to groups.
+
+    Repo ids and owners are listed with one call per group. A repo shared
+    to several groups is fetched once, repos and user permissions are
+    resolved in a thread pool.
     """
+    org_id = request.user.org.org_id if is_org_context(request) else None
+
+    shared_repos = []
+    owners = {}
+    for grp in groups:
+        if org_id:
+            repos = seafile_api.get_org_group_repos(org_id, grp.id)
+        else:
+            repos = seafile_api.get_repos_by_group(grp.id)
+
+        for r in repos:
+            shared_repos.append((grp, r.id))
+            owners[r.id] = r.user
+
+    def resolve(repo_id):
+        r = seafile_api.get_repo(repo_id)
+        if not r:
+            return None
+
+        # Convert repo properties due to the different collumns in Repo
+        # and SharedRepo
+        r.repo_id = r.id
+        r.repo_name = r.name
+        r.repo_desc = r.desc
+        r.last_modified = r.last_modify
+        r.share_type = 'group'
+        r.user = owners[repo_id]
+        r.user_perm = check_folder_permission(request, repo_id, '/')
+        return r
+
+    repo_ids = owners.keys()
+    resolved = dict(zip(repo_ids,
+                        _get_group_repos_pool().map(resolve, repo_ids)))
+
     group_repos = []
-    if is_org_context(request):
-        org_id = request.user.org.org_id
-        # For each group I joined...
-        for grp in groups:
-            # Get group repos, and for each group repos...
-            for r_id in seafile_api.get_org_group_repoids(org_id, grp.id):
-                repo_owner = seafile_api.get_org_repo_owner(r_id)
-                # Convert repo properties due to the different collumns in Repo
-                # and SharedRepo
-                r = get_repo(r_id)
-                if not r:
-                    continue
-                r.repo_id = r.id
-                r.repo_name = r.name
-                r.repo_desc = r.desc
-                r.last_modified = get_repo_last_modify(r)
-                r.share_type = 'group'
-                r.user = repo_owner
-                r.user_perm = check_folder_permission(request, r_id, '/')
-                r.group = grp
-                group_repos.append(r)
-    else:
-        # For each group I joined...
-        for grp in groups:
-            # Get group repos, and for each group repos...
-            for r_id in seafile_api.get_group_repoids(grp.id):
-                repo_owner = seafile_api.get_repo_owner(r_id)
-                # Convert repo properties due to the different collumns in Repo
-                # and SharedRepo
-                r = get_repo(r_id)
-                if not r:
-                    continue
-                r.repo_id = r.id
-                r.repo_name = r.name
-                r.repo_desc = r.desc
-                r.last_modified = get_repo_last_modify(r)
-                r.share_type = 'group'
-                r.user = repo_owner
-                r.user_perm = check_folder_permission(request, r_id, '/')
-                r.group = grp
-                group_repos.append(r)
+    for grp, r_id in shared_repos:
+        if resolved[r_id]:
+            group_repos.append(_GroupRepo(resolved[r_id], grp))
+
     return group_repos
 
 def get_file_upload_url_ul(request, token):
@@ -58,6 +58,7 @@ from seahub.utils import render_error, is_org_context, \
     generate_file_audit_event_type, FILE_AUDIT_ENABLED, gen_token, \
     get_site_scheme_and_netloc, get_conf_text_ext
 from seahub.utils.ip import get_remote_ip
+from seahub.utils.rpc import request_seafile_api
 from seahub.utils.timeutils import utc_to_local
 from seahub.utils.file_types import (IMAGE, PDF, DOCUMENT, SPREADSHEET, AUDIO,
                                      MARKDOWN, TEXT, VIDEO)
@@ -395,11 +396,11 @@ def _file_view(request, repo_id, path):
     """
     username = request.user.username
     # check arguments
-    repo = get_repo(repo_id)
+    repo = request_seafile_api.get_repo(repo_id)
     if not repo:
         raise Http404
 
-    obj_id = get_file_id_by_path(repo_id, path)
+    obj_id = request_seafile_api.get_file_id_by_path(repo_id, path)
     if not obj_id:
         return render_error(request, _(u'File does not exist'))
 
@@ -411,7 +412,8 @@ def _file_view(request, repo_id, path):
 
     # Check whether user has permission to view file and get file raw path,
     # render error page if permission deny.
-    file_perm = seafile_api.check_permission_by_path(repo_id, path, username)
+    file_perm = request_seafile_api.check_permission_by_path(repo_id, path,
+                                                             username)
     if not file_perm:
         return render_permission_error(request, _(u'Unable to view file'))
 
@@ -514,10 +516,10 @@ def _file_view(request, repo_id, path):
 
     # check if the user is the owner or not, for 'private share'
     if is_org_context(request):
-        repo_owner = seafile_api.get_org_repo_owner(repo.id)
+        repo_owner = request_seafile_api.get_org_repo_owner(repo.id)
         is_repo_owner = True if repo_owner == username else False
     else:
-        is_repo_owner = seafile_api.is_repo_owner(username, repo.id)
+        is_repo_owner = request_seafile_api.is_repo_owner(username, repo.id)
 
     img_prev = None
     img_next = None
@@ -28,10 +28,11 @@ from seahub.utils import gen_file_upload_url, gen_dir_share_link, \
     get_file_type_and_ext
 from seahub.settings import ENABLE_UPLOAD_FOLDER, \
     ENABLE_RESUMABLE_FILEUPLOAD, ENABLE_THUMBNAIL, \
-    THUMBNAIL_ROOT, THUMBNAIL_DEFAULT_SIZE, THUMBNAIL_SIZE_FOR_GRID, \
+    THUMBNAIL_DEFAULT_SIZE, THUMBNAIL_SIZE_FOR_GRID, \
     MAX_NUMBER_OF_FILES_FOR_FILEUPLOAD
 from seahub.utils.file_types import IMAGE, VIDEO
-from seahub.thumbnail.utils import get_share_link_thumbnail_src
+from seahub.thumbnail.utils import get_share_link_thumbnail_src, \
+    get_thumbnail_file
 
 # Get an instance of a logger
 logger = logging.getLogger(__name__)
@@ -239,7 +240,7 @@ def view_shared_dir(request, fileshare):
             f.is_video = True
 
         if (file_type == IMAGE or file_type == VIDEO) and ENABLE_THUMBNAIL:
-            if os.path.exists(os.path.join(THUMBNAIL_ROOT, str(thumbnail_size), f.obj_id)):
+            if os.path.exists(get_thumbnail_file(f.obj_id, thumbnail_size)):
                 req_image_path = posixpath.join(req_path, f.obj_name)
                 src = get_share_link_thumbnail_src(token, thumbnail_size, req_image_path)
                 f.encoded_thumbnail_src = urlquote(src)
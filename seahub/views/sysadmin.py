@@ -9,6 +9,8 @@ import re
 import datetime
 import csv, chardet, StringIO
 import time
+import threading
+from multiprocessing.pool import ThreadPool
 from constance import config
 
 from django.db.models import Q
@@ -47,10 +49,11 @@ from seahub.utils import IS_EMAIL_CONFIGURED, string2list, is_valid_username, \
 from seahub.utils.file_size import get_file_size_unit
 from seahub.utils.ldap import get_ldap_info
 from seahub.utils.licenseparse import parse_license, user_number_over_limit
+from seahub.utils.org_cache import invalidate_user_org
 from seahub.utils.rpc import mute_seafile_api
 from seahub.utils.sysinfo import get_platform_name
 from seahub.utils.mail import send_html_email_with_dj_template
-from seahub.utils.ms_excel import write_xls
+from seahub.utils.ms_excel import write_xls, xls_response, csv_response
 from seahub.utils.user_permissions import (get_basic_user_roles,
                                            get_user_role)
 from seahub.views import get_system_default_repo_id
@@ -65,7 +68,8 @@ from seahub.admin_log.models import USER_DELETE, USER_ADD
 import seahub.settings as settings
 from seahub.settings import INIT_PASSWD, SITE_NAME, SITE_ROOT, \
     SEND_EMAIL_ON_ADDING_SYSTEM_MEMBER, SEND_EMAIL_ON_RESETTING_USER_PASSWD, \
-    ENABLE_SYS_ADMIN_VIEW_REPO, ENABLE_GUEST_INVITATION
+    ENABLE_SYS_ADMIN_VIEW_REPO, ENABLE_GUEST_INVITATION, \
+    USER_QUOTA_USAGE_WORKERS
 try:
     from seahub.settings import ENABLE_TRIAL_ACCOUNT
 except:
@@ -134,7 +138,8 @@ def _populate_user_quota_usage(user):
     Arguments:
     - `user`:
     """
-    orgs = ccnet_api.get_orgs_by_user(user.email)
+    # users can only be in orgs in multi-tenancy mode
+    orgs = ccnet_api.get_orgs_by_user(user.email) if MULTI_TENANCY else None
     try:
         if orgs:
             user.org = orgs[0]
@@ -149,6 +154,72 @@ def _populate_user_quota_usage(user):
         user.space_usage = -1
         user.space_quota = -1
 
+# Keep ``__in`` lookups below the SQLite host parameter limit.
+USER_CHUNK_SIZE = 500
+
+def _chunks(items, size=USER_CHUNK_SIZE):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+_user_quota_pool = None
+_user_quota_pool_lock = threading.Lock()
+
+def _get_user_quota_pool():
+    # Create the pool lazily, so that it is not shared by forked workers.
+    global _user_quota_pool
+    with _user_quota_pool_lock:
+        if _user_quota_pool is None:
+            _user_quota_pool = ThreadPool(USER_QUOTA_USAGE_WORKERS)
+    return _user_quota_pool
+
+def _populate_users_info(users):
+    """Populate contact email and name to users, with one query for every
+    ``USER_CHUNK_SIZE`` users.
+    """
+    profiles = {}
+    for emails in _chunks([x.email for x in users]):
+        for p in Profile.objects.filter(user__in=emails):
+            profiles[p.user] = p
+
+    for user in users:
+        user_profile = profiles.get(user.email)
+        if user_profile:
+            user.contact_email = user_profile.contact_email
+            user.name = user_profile.nickname
+        else:
+            user.contact_email = ''
+            user.name = ''
+
+def _populate_users_quota_usage(users):
+    """Populate space/share quota to users, several users in parallel.
+    """
+    if users:
+        _get_user_quota_pool().map(_populate_user_quota_usage, users)
+
+def _populate_users_last_login(users):
+    """Populate last login time to users, with one query for every
+    ``USER_CHUNK_SIZE`` users.
+    """
+    last_logins = {}
+    for emails in _chunks([x.email for x in users]):
+        for e in UserLastLogin.objects.filter(username__in=emails):
+            last_logins[e.username] = e.last_login
+
+    for user in users:
+        user.last_login = last_logins.get(user.email)
+
+def _populate_users_trial_info(users):
+    """Populate trial account info to users.
+    """
+    trial_infos = {}
+    if ENABLE_TRIAL_ACCOUNT:
+        for emails in _chunks([x.email for x in users]):
+            for e in TrialAccount.objects.filter(user_or_org__in=emails):
+                trial_infos[e.user_or_org] = {'expire_date': e.expire_date}
+
+    for user in users:
+        user.trial_info = trial_infos.get(user.email)
+
 @login_required
 @sys_staff_required
 def sys_user_admin(request):
@@ -170,14 +241,10 @@ def sys_user_admin(request):
             except User.DoesNotExist:
                 continue
 
-            _populate_user_quota_usage(u)
             users.append(u)
 
-        last_logins = UserLastLogin.objects.filter(username__in=[x.username for x in users])
-        for u in users:
-            for e in last_logins:
-                if e.username == u.username:
-                    u.last_login = e.last_login
+        _populate_users_quota_usage(users)
+        _populate_users_last_login(users)
 
         return render_to_response('sysadmin/sys_useradmin_paid.html', {
             'users': users,
@@ -200,34 +267,19 @@ def sys_user_admin(request):
         page_next = False
 
     users = users_plus_one[:per_page]
-    last_logins = UserLastLogin.objects.filter(username__in=[x.email for x in users])
-    if ENABLE_TRIAL_ACCOUNT:
-        trial_users = TrialAccount.objects.filter(user_or_org__in=[x.email for x in users])
-    else:
-        trial_users = []
+    _populate_users_info(users)
+    _populate_users_quota_usage(users)
+    _populate_users_last_login(users)
+    _populate_users_trial_info(users)
 
     for user in users:
         if user.email == request.user.email:
             user.is_self = True
 
-        populate_user_info(user)
-        _populate_user_quota_usage(user)
-
         # check user's role
         user.is_guest = True if get_user_role(user) == GUEST_USER else False
         user.is_default = True if get_user_role(user) == DEFAULT_USER else False
 
-        # populate user last login time
-        user.last_login = None
-        for last_login in last_logins:
-            if last_login.username == user.email:
-                user.last_login = last_login.last_login
-
-        user.trial_info = None
-        for trial_user in trial_users:
-            if trial_user.user_or_org == user.email:
-                user.trial_info = {'expire_date': trial_user.expire_date}
-
     platform = get_platform_name()
     server_id = get_server_id()
     pro_server = 1 if is_pro_version() else 0
@@ -253,22 +305,61 @@ def sys_user_admin(request):
             'extra_user_roles': extra_user_roles,
         }, context_instance=RequestContext(request))
 
-@login_required
-@sys_staff_required
-def sys_useradmin_export_excel(request):
-    """ Export all users from database to excel
+def _user_to_excel_row(user, is_pro, MB):
+    """Convert a user to a row of the exported users excel.
     """
-    next = request.META.get('HTTP_REFERER', None)
-    if not next:
-        next = SITE_ROOT
+    if user.space_usage > 0:
+        try:
+            space_usage_MB = round(float(user.space_usage) / MB, 2)
+        except Exception as e:
+            logger.error(e)
+            space_usage_MB = '--'
+    else:
+        space_usage_MB = ''
 
-    try:
-        users = ccnet_api.get_emailusers('DB', -1, -1) + \
-                ccnet_api.get_emailusers('LDAPImport', -1, -1)
-    except Exception as e:
-        logger.error(e)
-        messages.error(request, _(u'Failed to export Excel'))
-        return HttpResponseRedirect(next)
+    if user.space_quota > 0:
+        try:
+            space_quota_MB = round(float(user.space_quota) / MB, 2)
+        except Exception as e:
+            logger.error(e)
+            space_quota_MB = '--'
+    else:
+        space_quota_MB = ''
+
+    if user.is_active:
+        status = _('Active')
+    else:
+        status = _('Inactive')
+
+    create_at = tsstr_sec(user.ctime) if user.ctime else ''
+    last_login = user.last_login.strftime("%Y-%m-%d %H:%M:%S") if \
+        user.last_login else ''
+
+    is_admin = _('Yes') if user.is_staff else ''
+    ldap_import = _('Yes') if user.source == 'LDAPImport' else ''
+
+    if is_pro:
+        if user.role == GUEST_USER:
+            role = _('Guest')
+        else:
+            role = _('Default')
+
+        row = [user.email, user.name, user.contact_email, status, role,
+                space_usage_MB, space_quota_MB, create_at,
+                last_login, is_admin, ldap_import]
+    else:
+        row = [user.email, user.name, user.contact_email, status,
+                space_usage_MB, space_quota_MB, create_at,
+                last_login, is_admin, ldap_import]
+
+    return row
+
+def get_users_export():
+    """Return a ``(head, total, rows)`` tuple of all users from database and
+    ldap imported, rows are generated chunk by chunk.
+    """
+    users = ccnet_api.get_emailusers('DB', -1, -1) + \
+            ccnet_api.get_emailusers('LDAPImport', -1, -1)
 
     if is_pro_version():
         is_pro = True
@@ -284,79 +375,45 @@ def sys_useradmin_export_excel(request):
                 _("Space Usage") + "(MB)", _("Space Quota") + "(MB)",
                 _("Create At"), _("Last Login"), _("Admin"), _("LDAP(imported)"),]
 
-    data_list = []
-
-    last_logins = UserLastLogin.objects.filter(username__in=[x.email for x in users])
-    for user in users:
-
-        # populate name and contact email
-        populate_user_info(user)
-
-        # populate space usage and quota
-        MB = get_file_size_unit('MB')
-
-        _populate_user_quota_usage(user)
-        if user.space_usage > 0:
-            try:
-                space_usage_MB = round(float(user.space_usage) / MB, 2)
-            except Exception as e:
-                logger.error(e)
-                space_usage_MB = '--'
-        else:
-            space_usage_MB = ''
+    MB = get_file_size_unit('MB')
+    def gen_rows():
+        for chunk in _chunks(users):
+            # populate name, contact email, space usage, quota and last
+            # login time of a chunk of users at once
+            _populate_users_info(chunk)
+            _populate_users_quota_usage(chunk)
+            _populate_users_last_login(chunk)
+            for user in chunk:
+                yield _user_to_excel_row(user, is_pro, MB)
 
-        if user.space_quota > 0:
-            try:
-                space_quota_MB = round(float(user.space_quota) / MB, 2)
-            except Exception as e:
-                logger.error(e)
-                space_quota_MB = '--'
-        else:
-            space_quota_MB = ''
-
-        # populate user last login time
-        user.last_login = None
-        for last_login in last_logins:
-            if last_login.username == user.email:
-                user.last_login = last_login.last_login
-
-        if user.is_active:
-            status = _('Active')
-        else:
-            status = _('Inactive')
+    return head, len(users), gen_rows()
 
-        create_at = tsstr_sec(user.ctime) if user.ctime else ''
-        last_login = user.last_login.strftime("%Y-%m-%d %H:%M:%S") if \
-            user.last_login else ''
-
-        is_admin = _('Yes') if user.is_staff else ''
-        ldap_import = _('Yes') if user.source == 'LDAPImport' else ''
-
-        if is_pro:
-            if user.role == GUEST_USER:
-                role = _('Guest')
-            else:
-                role = _('Default')
+@login_required
+@sys_staff_required
+def sys_useradmin_export_excel(request):
+    """ Export all users from database to excel, or to csv if
+    `format=csv` is given.
+    """
+    next = request.META.get('HTTP_REFERER', None)
+    if not next:
+        next = SITE_ROOT
 
-            row = [user.email, user.name, user.contact_email, status, role,
-                    space_usage_MB, space_quota_MB, create_at,
-                    last_login, is_admin, ldap_import]
-        else:
-            row = [user.email, user.name, user.contact_email, status,
-                    space_usage_MB, space_quota_MB, create_at,
-                    last_login, is_admin, ldap_import]
+    try:
+        head, _total, rows = get_users_export()
+    except Exception as e:
+        logger.error(e)
+        messages.error(request, _(u'Failed to export Excel'))
+        return HttpResponseRedirect(next)
 
-        data_list.append(row)
+    if request.GET.get('format', '') == 'csv':
+        return csv_response(head, rows, 'users.csv')
 
-    wb = write_xls('users', head, data_list)
+    wb = write_xls('users', head, rows)
     if not wb:
         messages.error(request, _(u'Failed to export Excel'))
         return HttpResponseRedirect(next)
 
-    response = HttpResponse(content_type='application/ms-excel')
-    response['Content-Disposition'] = 'attachment; filename=users.xlsx'
-    wb.save(response)
-    return response
+    return xls_response(wb, 'users.xlsx')
 
 @login_required
 @sys_staff_required
@@ -379,20 +436,13 @@ def sys_user_admin_ldap_imported(request):
         page_next = False
 
     users = users_plus_one[:per_page]
-    last_logins = UserLastLogin.objects.filter(username__in=[x.email for x in users])
+    _populate_users_info(users)
+    _populate_users_quota_usage(users)
+    _populate_users_last_login(users)
     for user in users:
         if user.email == request.user.email:
             user.is_self = True
 
-        populate_user_info(user)
-        _populate_user_quota_usage(user)
-
-        # populate user last login time
-        user.last_login = None
-        for last_login in last_logins:
-            if last_login.username == user.email:
-                user.last_login = last_login.last_login
-
     return render_to_response(
         'sysadmin/sys_user_admin_ldap_imported.html', {
             'users': users,
@@ -425,19 +475,12 @@ def sys_user_admin_ldap(request):
         page_next = False
 
     users = users_plus_one[:per_page]
-    last_logins = UserLastLogin.objects.filter(username__in=[x.email for x in users])
+    _populate_users_quota_usage(users)
+    _populate_users_last_login(users)
     for user in users:
         if user.email == request.user.email:
             user.is_self = True
 
-        _populate_user_quota_usage(user)
-
-        # populate user last login time
-        user.last_login = None
-        for last_login in last_logins:
-            if last_login.username == user.email:
-                user.last_login = last_login.last_login
-
     return render_to_response(
         'sysadmin/sys_useradmin_ldap.html', {
             'users': users,
@@ -467,14 +510,13 @@ def sys_user_admin_admins(request):
         else:
             not_admin_users.append(user)
 
-    last_logins = UserLastLogin.objects.filter(username__in=[x.email for x in admin_users])
+    _populate_users_quota_usage(admin_users)
+    _populate_users_last_login(admin_users)
 
     for user in admin_users:
         if user.email == request.user.email:
             user.is_self = True
 
-        _populate_user_quota_usage(user)
-
         # check db user's role
         if user.source == "DB":
             if user.role == GUEST_USER:
@@ -482,12 +524,6 @@ def sys_user_admin_admins(request):
             else:
                 user.is_guest = False
 
-        # populate user last login time
-        user.last_login = None
-        for last_login in last_logins:
-            if last_login.username == user.email:
-                user.last_login = last_login.last_login
-
     return render_to_response(
         'sysadmin/sys_useradmin_admins.html', {
             'users': admin_users,
@@ -1014,6 +1050,7 @@ def user_add(request):
         if request.user.org:
             org_id = request.user.org.org_id
             ccnet_threaded_rpc.add_org_user(org_id, email, 0)
+            invalidate_user_org(email)
             if IS_EMAIL_CONFIGURED:
                 try:
                     send_user_add_mail(request, email, password)
@@ -1043,38 +1080,44 @@ def user_add(request):
     else:
         return HttpResponse(json.dumps({'error': str(form.errors.values()[0])}), status=400, content_type=content_type)
 
+def get_groups_export():
+    """Return a ``(head, total, rows)`` tuple of all groups.
+    """
+    groups = ccnet_threaded_rpc.get_all_groups(-1, -1)
+
+    head = [_("Name"), _("Creator"), _("Create At")]
+    def gen_rows():
+        for grp in groups:
+            create_at = tsstr_sec(grp.timestamp) if grp.timestamp else ''
+            yield [grp.group_name, grp.creator_name, create_at]
+
+    return head, len(groups), gen_rows()
+
 @login_required
 @sys_staff_required
 def sys_group_admin_export_excel(request):
-    """ Export all groups to excel
+    """ Export all groups to excel, or to csv if `format=csv` is given.
     """
     next = request.META.get('HTTP_REFERER', None)
     if not next:
         next = SITE_ROOT
 
     try:
-        groups = ccnet_threaded_rpc.get_all_groups(-1, -1)
+        head, _total, rows = get_groups_export()
     except Exception as e:
         logger.error(e)
         messages.error(request, _(u'Failed to export Excel'))
         return HttpResponseRedirect(next)
 
-    head = [_("Name"), _("Creator"), _("Create At")]
-    data_list = []
-    for grp in groups:
-        create_at = tsstr_sec(grp.timestamp) if grp.timestamp else ''
-        row = [grp.group_name, grp.creator_name, create_at]
-        data_list.append(row)
+    if request.GET.get('format', '') == 'csv':
+        return csv_response(head, rows, 'groups.csv')
 
-    wb = write_xls('groups', head, data_list)
+    wb = write_xls('groups', head, rows)
     if not wb:
         messages.error(request, _(u'Failed to export Excel'))
         return HttpResponseRedirect(next)
 
-    response = HttpResponse(content_type='application/ms-excel')
-    response['Content-Disposition'] = 'attachment; filename=groups.xlsx'
-    wb.save(response)
-    return response
+    return xls_response(wb, 'groups.xlsx')
 
 @login_required
 @sys_staff_required
@@ -1229,6 +1272,7 @@ def sys_org_remove(request, org_id):
     users = ccnet_threaded_rpc.get_org_emailusers(org.url_prefix, -1, -1)
     for u in users:
         ccnet_threaded_rpc.remove_org_user(org_id, u.email)
+        invalidate_user_org(u.email)
 
     groups = ccnet_threaded_rpc.get_org_groups(org.org_id, -1, -1)
     for g in groups:
@@ -1305,7 +1349,7 @@ def sys_org_info_user(request, org_id):
 
     org_basic_info = sys_get_org_base_info(org_id)
     users = org_basic_info["users"]
-    last_logins = UserLastLogin.objects.filter(username__in=[x.email for x in users])
+    _populate_users_last_login(users)
     for user in users:
         if user.email == request.user.email:
             user.is_self = True
@@ -1317,12 +1361,6 @@ def sys_org_info_user(request, org_id):
             user.self_usage = -1
             user.quota = -1
 
-        # populate user last login time
-        user.last_login = None
-        for last_login in last_logins:
-            if last_login.username == user.email:
-                user.last_login = last_login.last_login
-
     return render_to_response('sysadmin/sys_org_info_user.html',
            org_basic_info, context_instance=RequestContext(request))
 
@@ -1465,58 +1503,36 @@ def user_search(request):
     """
     email = request.GET.get('email', '')
 
-    user_emails = []
-    # search user from ccnet db
-    users_from_ccnet = ccnet_api.search_emailusers('DB', email, -1, -1)
-    for user in users_from_ccnet:
-        user_emails.append(user.email)
-
-    # search user from ccnet ldap
-    users_from_ldap = ccnet_api.search_emailusers('LDAP', email, -1, -1)
-    for user in users_from_ldap:
-        user_emails.append(user.email)
+    # search user from ccnet db and ccnet ldap, users found there are used
+    # as is, so only the ones matched by profile need to be looked up
+    found_users = {}
+    for source in ('DB', 'LDAP'):
+        for user in ccnet_api.search_emailusers(source, email, -1, -1):
+            found_users.setdefault(user.email, user)
 
     # search user from profile
     users_from_profile = Profile.objects.filter((Q(nickname__icontains=email)) |
-            Q(contact_email__icontains=email))
-    for user in users_from_profile:
-        user_emails.append(user.user)
+            Q(contact_email__icontains=email)).values_list('user', flat=True)
 
-    # remove duplicate emails
-    user_emails = {}.fromkeys(user_emails).keys()
+    users = found_users.values()
+    for user_email in set(users_from_profile):
+        if user_email in found_users:
+            continue
 
-    users = []
-    for user_email in user_emails:
         try:
-            user_obj = User.objects.get(email=user_email)
+            users.append(User.objects.get(email=user_email))
         except User.DoesNotExist:
             continue
 
-        users.append(user_obj)
-
-    last_logins = UserLastLogin.objects.filter(username__in=[x.email for x in users])
-    if ENABLE_TRIAL_ACCOUNT:
-        trial_users = TrialAccount.objects.filter(user_or_org__in=[x.email for x in users])
-    else:
-        trial_users = []
+    _populate_users_info(users)
+    _populate_users_quota_usage(users)
+    _populate_users_last_login(users)
+    _populate_users_trial_info(users)
 
     for user in users:
-        populate_user_info(user)
-        _populate_user_quota_usage(user)
-
         # check user's role
         user.is_guest = True if get_user_role(user) == GUEST_USER else False
         user.is_default = True if get_user_role(user) == DEFAULT_USER else False
-        # populate user last login time
-        user.last_login = None
-        for last_login in last_logins:
-            if last_login.username == user.email:
-                user.last_login = last_login.last_login
-
-        user.trial_info = None
-        for trial_user in trial_users:
-            if trial_user.user_or_org == user.email:
-                user.trial_info = {'expire_date': trial_user.expire_date}
 
     extra_user_roles = [x for x in get_available_roles()
                         if x not in get_basic_user_roles()]
@@ -2111,21 +2127,14 @@ def sys_inst_info_user(request, inst_id):
         page_next = False
     users = [User.objects.get(x) for x in usernames[:per_page]]
 
-    last_logins = UserLastLogin.objects.filter(username__in=[x.email for x in users])
+    _populate_users_quota_usage(users)
+    _populate_users_last_login(users)
     for u in users:
-        _populate_user_quota_usage(u)
-
         if u.username in inst_admins:
             u.inst_admin = True
         else:
             u.inst_admin = False
 
-        # populate user last login time
-        u.last_login = None
-        for last_login in last_logins:
-            if last_login.username == u.email:
-                u.last_login = last_login.last_login
-
     users_count = Profile.objects.filter(institution=inst.name).count()
     space_quota = InstitutionQuota.objects.get_or_none(institution=inst)
     space_usage = get_institution_space_usage(inst)
@@ -2162,21 +2171,14 @@ def sys_inst_search_user(request, inst_id):
     users = [User.objects.get(x) for x in usernames]
 
     inst_admins = [x.user for x in InstitutionAdmin.objects.filter(institution=inst)]
-    last_logins = UserLastLogin.objects.filter(username__in=[x for x in users])
+    _populate_users_quota_usage(users)
+    _populate_users_last_login(users)
     for u in users:
-        _populate_user_quota_usage(u)
-
         if u.username in inst_admins:
             u.inst_admin = True
         else:
             u.inst_admin = False
 
-        # populate user last login time
-        u.last_login = None
-        for last_login in last_logins:
-            if last_login.username == u.email:
-                u.last_login = last_login.last_login
-
     users_count = Profile.objects.filter(institution=inst.name).count()
 
     return render_to_response('sysadmin/sys_inst_search_user.html', {
@@ -2199,15 +2201,8 @@ def sys_inst_info_admins(request, inst_id):
     inst_admins = [x.user for x in InstitutionAdmin.objects.filter(institution=inst)]
     admins = [User.objects.get(x) for x in inst_admins]
 
-    last_logins = UserLastLogin.objects.filter(username__in=[x.email for x in admins])
-    for u in admins:
-        _populate_user_quota_usage(u)
-
-        # populate user last login time
-        u.last_login = None
-        for last_login in last_logins:
-            if last_login.username == u.email:
-                u.last_login = last_login.last_login
+    _populate_users_quota_usage(admins)
+    _populate_users_last_login(admins)
 
     users_count = Profile.objects.filter(institution=inst.name).count()
 
@@ -24,6 +24,13 @@ os.environ.setdefault("DJANGO_SETTINGS_MODULE", "seahub.settings")
 from django.core.wsgi import get_wsgi_application
 application = get_wsgi_application()
 
+# Fork thumbnail workers now, before any thread is started. If the app is
+# loaded before web workers are forked (e.g. gunicorn ``preload_app``), also
+# call ``thumbnail_pool.start()`` in the ``post_fork`` hook. Workers without
+# a pool generate thumbnails in requests.
+from seahub.thumbnail.utils import thumbnail_pool
+thumbnail_pool.start()
+
 # Apply WSGI middleware here.
 # from helloworld.wsgi import HelloWorldApplication
 # application = HelloWorldApplication(application)
@@ -362,9 +362,11 @@ define([
                 if (this.view_mode == 'grid') {
                     thumbnail_size = app.pageOptions.thumbnail_size_for_grid;
                 }
-                var get_thumbnail = function(i) {
+                var get_thumbnail = function(i, retries) {
                     var cur_item = items[i];
                     var cur_item_path = Common.pathJoin([cur_path, cur_item.get('obj_name')]);
+                    var retry = false;
+                    retries = retries || 0;
                     $.ajax({
                         url: Common.getUrl({name: 'thumbnail_create', repo_id: repo_id}),
                         data: {
@@ -373,16 +375,30 @@ define([
                         },
                         cache: false,
                         dataType: 'json',
-                        success: function(data) {
+                        success: function(data, textStatus, xhr) {
+                            if (xhr.status == 202) {
+                                // thumbnail is being generated, ask again later
+                                retry = retries < Common.THUMBNAIL_MAX_RETRIES;
+                                return;
+                            }
                             cur_item.set({
                                 'encoded_thumbnail_src': data.encoded_thumbnail_src
                             });
                         },
                         complete: function() {
                             // cur path may be changed. e.g., the user enter another directory
-                            if (i < items_length - 1 &&
-                                _this.dir.repo_id == repo_id &&
-                                _this.dir.path == cur_path) {
+                            if (_this.dir.repo_id != repo_id ||
+                                _this.dir.path != cur_path) {
+                                return;
+                            }
+                            if (retry) {
+                                setTimeout(function() {
+                                    if (_this.dir.repo_id == repo_id &&
+                                        _this.dir.path == cur_path) {
+                                        get_thumbnail(i, retries + 1);
+                                    }
+                                }, Common.getThumbnailRetryDelay(retries));
+                            } else if (i < items_length - 1) {
                                 get_thumbnail(++i);
                             }
                         }
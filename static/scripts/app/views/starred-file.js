@@ -58,8 +58,10 @@ define([
             var items_len = items.length;
             var thumbnail_size = app.pageOptions.thumbnail_default_size;
 
-            var get_thumbnail = function(i) {
+            var get_thumbnail = function(i, retries) {
                 var cur_item = items[i];
+                var retry = false;
+                retries = retries || 0;
                 $.ajax({
                     url: Common.getUrl({
                         name: 'thumbnail_create',
@@ -71,13 +73,22 @@ define([
                     },
                     cache: false,
                     dataType: 'json',
-                    success: function(data) {
+                    success: function(data, textStatus, xhr) {
+                        if (xhr.status == 202) {
+                            // thumbnail is being generated, ask again later
+                            retry = retries < Common.THUMBNAIL_MAX_RETRIES;
+                            return;
+                        }
                         cur_item.set({
                             'encoded_thumbnail_src': data.encoded_thumbnail_src
                         });
                     },
                     complete: function() {
-                        if (i < items_len - 1) {
+                        if (retry) {
+                            setTimeout(function() {
+                                get_thumbnail(i, retries + 1);
+                            }, Common.getThumbnailRetryDelay(retries));
+                        } else if (i < items_len - 1) {
                             get_thumbnail(++i);
                         }
                     }
@@ -71,6 +71,13 @@ define([
         SUCCESS_TIMEOUT: 3000,   // 3 secs for success msg
         ERROR_TIMEOUT: 3000,     // 3 secs for error msg
 
+        // times to ask again for a thumbnail which is being generated
+        THUMBNAIL_MAX_RETRIES: 5,
+
+        getThumbnailRetryDelay: function(retries) {
+            return 500 * Math.pow(2, retries); // 0.5s, 1s, 2s, ...
+        },
+
         strChineseFirstPY: PinyinByUnicode.strChineseFirstPY,
 
         getUrl: function(options) {
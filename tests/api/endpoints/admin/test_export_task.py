@@ -0,0 +1,59 @@
+import json
+import time
+
+from django.core.urlresolvers import reverse
+
+from seahub.test_utils import BaseTestCase
+
+class AdminExportTaskTest(BaseTestCase):
+
+    def setUp(self):
+        self.url = reverse('api-v2.1-admin-export-task')
+        self.progress_url = reverse('api-v2.1-admin-query-export-progress')
+        self.download_url = reverse('api-v2.1-admin-export-task-download')
+
+    def wait_for_task(self, task_id):
+        for i in range(50):
+            resp = self.client.get(self.progress_url + '?task_id=' + task_id)
+            self.assertEqual(200, resp.status_code)
+            json_resp = json.loads(resp.content)
+            if json_resp['status'] in ('done', 'failed'):
+                return json_resp
+            time.sleep(0.1)
+
+        assert False, 'export task is not finished'
+
+    def test_can_export_groups(self):
+        self.login_as(self.admin)
+        assert self.group
+
+        resp = self.client.post(self.url, {'type': 'groups', 'format': 'csv'})
+        self.assertEqual(200, resp.status_code)
+        task_id = json.loads(resp.content)['task_id']
+
+        json_resp = self.wait_for_task(task_id)
+        assert json_resp['status'] == 'done'
+        assert json_resp['done'] == json_resp['total']
+
+        resp = self.client.get(self.download_url + '?task_id=' + task_id)
+        self.assertEqual(200, resp.status_code)
+        assert 'text/csv' in resp._headers['content-type']
+        assert self.group.group_name in ''.join(resp.streaming_content)
+
+    def test_export_with_invalid_args(self):
+        self.login_as(self.admin)
+
+        resp = self.client.post(self.url, {'type': 'invalid'})
+        self.assertEqual(400, resp.status_code)
+
+        resp = self.client.post(self.url, {'type': 'users', 'format': 'pdf'})
+        self.assertEqual(400, resp.status_code)
+
+        resp = self.client.get(self.progress_url + '?task_id=invalid')
+        self.assertEqual(404, resp.status_code)
+
+    def test_export_with_invalid_user_permission(self):
+        self.login_as(self.user)
+
+        resp = self.client.post(self.url, {'type': 'users'})
+        self.assertEqual(403, resp.status_code)
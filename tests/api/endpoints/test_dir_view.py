@@ -7,6 +7,7 @@ from seaserv import seafile_api
 
 from django.core.urlresolvers import reverse
 
+from seahub.api2.views import get_dir_recursively
 from seahub.test_utils import BaseTestCase
 from seahub.utils import check_filename_with_rename
 
@@ -63,6 +64,142 @@ class DirViewTest(BaseTestCase):
         assert json_resp[0]['type'] == 'dir'
         assert json_resp[0]['name'] == self.folder_name
 
+    def test_can_stream_dir(self):
+        self.login_as(self.user)
+        resp = self.client.get(self.url + '?stream=true')
+        self.assertEqual(200, resp.status_code)
+        assert resp.streaming
+        assert resp['oid']
+
+        json_resp = json.loads(''.join(resp.streaming_content))
+        assert json_resp[0]['type'] == 'dir'
+        assert json_resp[0]['name'] == self.folder_name
+
+    def test_can_get_dir_by_page(self):
+        self.login_as(self.user)
+        assert self.file
+
+        resp = self.client.get(self.url + '?limit=1')
+        self.assertEqual(200, resp.status_code)
+        json_resp = json.loads(resp.content)
+        assert len(json_resp) == 1
+        assert json_resp[0]['type'] == 'dir'
+        assert resp['dir_changed'] == 'false'
+        next_cursor = resp['next_cursor']
+        assert next_cursor
+
+        resp = self.client.get(self.url + '?limit=1&cursor=' + next_cursor)
+        self.assertEqual(200, resp.status_code)
+        json_resp = json.loads(resp.content)
+        assert len(json_resp) == 1
+        assert json_resp[0]['type'] == 'file'
+
+        resp = self.client.get(self.url + '?offset=1&limit=1')
+        json_resp = json.loads(resp.content)
+        assert json_resp[0]['type'] == 'file'
+
+    def test_get_dir_by_page_after_change(self):
+        self.login_as(self.user)
+        assert self.file
+
+        resp = self.client.get(self.url + '?limit=1')
+        next_cursor = resp['next_cursor']
+
+        self.create_folder(repo_id=self.repo.id, parent_dir='/',
+                           dirname='zzz-new-folder', username=self.user.username)
+
+        resp = self.client.get(self.url + '?limit=1&cursor=' + next_cursor)
+        self.assertEqual(200, resp.status_code)
+        assert resp['dir_changed'] == 'true'
+        json_resp = json.loads(resp.content)
+        assert json_resp[0]['name'] == 'zzz-new-folder'
+
+    def test_get_dir_with_invalid_page_args(self):
+        self.login_as(self.user)
+
+        resp = self.client.get(self.url + '?limit=0')
+        self.assertEqual(400, resp.status_code)
+
+        resp = self.client.get(self.url + '?offset=-1')
+        self.assertEqual(400, resp.status_code)
+
+        resp = self.client.get(self.url + '?cursor=invalid')
+        self.assertEqual(400, resp.status_code)
+
+    def test_can_get_dir_with_includes(self):
+        from seahub.base.models import FileComment
+        from seahub.tags.models import FileTag
+        from seahub.utils.star import star_file
+
+        self.login_as(self.user)
+        file_name = os.path.basename(self.file)
+        FileComment.objects.add_by_file_path(repo_id=self.repo_id,
+                file_path=self.file, author=self.user_name, comment='test')
+        star_file(self.user_name, self.repo_id, self.file, False)
+        FileTag.objects.get_or_create_file_tag(self.repo_id, '/',
+                self.folder_name, True, 'test-tag', self.user_name)
+
+        resp = self.client.get(self.url + '?include=comments,stars,tags')
+        self.assertEqual(200, resp.status_code)
+        json_resp = json.loads(resp.content)
+
+        dirent = [x for x in json_resp if x['name'] == self.folder_name][0]
+        assert dirent['tags'][0]['name'] == 'test-tag'
+        assert 'comment_count' not in dirent
+
+        dirent = [x for x in json_resp if x['name'] == file_name][0]
+        assert dirent['comment_count'] == 1
+        assert dirent['starred'] is True
+        assert dirent['tags'] == []
+
+        resp = self.client.get(self.url)
+        json_resp = json.loads(resp.content)
+        assert 'starred' not in json_resp[0]
+
+    def test_get_dir_with_invalid_includes(self):
+        self.login_as(self.user)
+
+        resp = self.client.get(self.url + '?include=comments,invalid')
+        self.assertEqual(400, resp.status_code)
+
+    def test_can_get_dir_recursively(self):
+        self.login_as(self.user)
+        self.create_folder(repo_id=self.repo.id, parent_dir=self.folder_path,
+                           dirname='sub', username=self.user.username)
+
+        resp = self.client.get(self.url + '?t=d&recursive=1')
+        self.assertEqual(200, resp.status_code)
+        assert resp['truncated'] == 'false'
+        json_resp = json.loads(resp.content)
+        assert len(json_resp) == 2
+        assert json_resp[1]['name'] == 'sub'
+        assert json_resp[1]['parent_dir'] == self.folder_path
+
+    def test_get_dir_recursively_with_limits(self):
+        self.create_folder(repo_id=self.repo.id, parent_dir=self.folder_path,
+                           dirname='sub', username=self.user.username)
+        username = self.user.username
+
+        dirs, truncated = get_dir_recursively(username, self.repo_id, '/')
+        assert len(dirs) == 2
+        assert truncated is False
+
+        dirs, truncated = get_dir_recursively(username, self.repo_id, '/',
+                                              max_depth=1)
+        assert [d['name'] for d in dirs] == [self.folder_name]
+        assert truncated is True
+
+        # no dir is left out when the last level has no sub dirs
+        dirs, truncated = get_dir_recursively(username, self.repo_id, '/',
+                                              max_depth=2)
+        assert len(dirs) == 2
+        assert truncated is False
+
+        dirs, truncated = get_dir_recursively(username, self.repo_id, '/',
+                                              max_entries=1)
+        assert len(dirs) == 1
+        assert truncated is True
+
     def test_get_dir_with_invalid_perm(self):
         # login as admin, then get dir info in user's repo
         self.login_as(self.admin)
@@ -93,3 +93,38 @@ class StarredFileTest(BaseTestCase, Fixtures):
                                   urllib2.quote(self.unicode_file.encode('utf-8')))
         self.assertEqual(200, resp.status_code)
         self.assertEqual(1, len(UserStarredFiles.objects.all()))
+
+    def test_can_list_by_page(self):
+        self.login_as(self.user)
+        UserStarredFiles(email=self.user.username, org_id=-1,
+                         repo_id=self.repo.id, path=self.unicode_file,
+                         is_dir=False).save()
+
+        resp = self.client.get(reverse('starredfiles') + '?page=1&per_page=1')
+        self.assertEqual(200, resp.status_code)
+        json_resp = json.loads(resp.content)
+        self.assertEqual(1, len(json_resp))
+        assert json_resp[0]['oid']
+        assert resp['page_next'] == 'true'
+
+        resp = self.client.get(reverse('starredfiles') + '?page=2&per_page=1')
+        json_resp = json.loads(resp.content)
+        self.assertEqual(1, len(json_resp))
+        assert resp['page_next'] == 'false'
+
+        resp = self.client.get(reverse('starredfiles') + '?page=0')
+        self.assertEqual(400, resp.status_code)
+
+    def test_list_removes_stale_stars(self):
+        self.login_as(self.user)
+        UserStarredFiles(email=self.user.username, org_id=-1,
+                         repo_id=self.repo.id, path='/not-exist.txt',
+                         is_dir=False).save()
+        UserStarredFiles(email=self.user.username, org_id=-1,
+                         repo_id=self.repo.id, path='/not-exist/a.txt',
+                         is_dir=False).save()
+
+        resp = self.client.get(reverse('starredfiles'))
+        json_resp = json.loads(resp.content)
+        self.assertEqual(1, len(json_resp))
+        self.assertEqual(1, len(UserStarredFiles.objects.all()))
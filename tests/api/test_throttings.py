@@ -39,3 +39,15 @@ class ThrottingsTest(BaseTestCase):
             assert res.status_code == 200
 
             time.sleep(0.1)
+
+    @override_settings(REST_FRAMEWORK_THROTTLE_BACKENDS={'user': 'counter'})
+    @patch.object(SimpleRateThrottle, 'get_rate')
+    def test_counter_backend(self, mock_get_rate):
+        mock_get_rate.return_value = '10/minute'
+
+        for i in range(12):
+            res = self.client.get(reverse('api2-pub-repos'))
+            if i >= 10:
+                assert res.status_code == 429
+            else:
+                assert res.status_code == 200
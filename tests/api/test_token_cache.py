@@ -0,0 +1,46 @@
+from django.test import RequestFactory
+from mock import patch
+
+from seahub.api2.authentication import TokenAuthentication, \
+    AuthenticationFailed
+from seahub.api2.models import TokenV2
+from seahub.api2.token_cache import flush_device_info
+from seahub.test_utils import BaseTestCase
+
+
+class TokenCacheTest(BaseTestCase):
+    def setUp(self):
+        self.token = TokenV2(user=self.user.username, platform='linux',
+                             device_id='701143c1238e6736b61c20e73de82fc95989c413',
+                             device_name='test')
+        self.token.save()
+        self.auth = TokenAuthentication()
+
+    def _request(self):
+        return RequestFactory().get(
+            '/api2/auth/ping/',
+            HTTP_AUTHORIZATION='Token ' + self.token.key,
+            HTTP_X_SEAFILE_CLIENT_VERSION='6.0.0')
+
+    def test_cached_token(self):
+        user, token = self.auth.authenticate(self._request())
+        assert user.username == self.user.username
+
+        with patch('seahub.api2.authentication.TokenV2.objects.get') as get:
+            user, token = self.auth.authenticate(self._request())
+            assert get.call_count == 0
+        assert token.key == self.token.key
+
+    def test_deleted_token(self):
+        self.auth.authenticate(self._request())
+        self.token.delete()
+
+        self.assertRaises(AuthenticationFailed, self.auth.authenticate,
+                          self._request())
+
+    def test_device_info_is_written_in_batch(self):
+        self.auth.authenticate(self._request())
+        flush_device_info()
+
+        assert TokenV2.objects.get(key=self.token.key).client_version == \
+            '6.0.0'
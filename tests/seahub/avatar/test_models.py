@@ -0,0 +1,53 @@
+import os
+
+from django.core.files import File
+from mock import patch
+
+from seahub.avatar.models import Avatar
+from seahub.avatar.settings import AUTO_GENERATE_AVATAR_SIZES
+from seahub.avatar.util import get_primary_avatar
+from seahub.test_utils import BaseTestCase
+
+TEST_PNG = os.path.join(os.path.dirname(__file__), '..', '..', '..',
+                        'seahub', 'avatar', 'testdata', 'test.png')
+
+
+class AvatarTest(BaseTestCase):
+    def setUp(self):
+        self.avatar = Avatar(emailuser=self.user.username, primary=True)
+        with open(TEST_PNG, 'rb') as f:
+            self.avatar.avatar.save('test.png', File(f))
+
+    def tearDown(self):
+        self.avatar.delete()
+
+    def test_create_default_thumbnails(self):
+        for size in AUTO_GENERATE_AVATAR_SIZES:
+            assert self.avatar.thumbnail_exists(size)
+
+    def test_create_thumbnails_reads_original_once(self):
+        storage = self.avatar.avatar.storage
+        with patch.object(storage, 'open', wraps=storage.open) as mock_open:
+            self.avatar.create_thumbnails([200, 100, 50])
+
+        assert mock_open.call_count == 1
+        for size in (200, 100, 50):
+            assert self.avatar.thumbnail_exists(size)
+
+    @patch('seahub.avatar.thumbnail_queue.queue_thumbnail')
+    def test_missing_thumbnail_is_queued(self, mock_queue_thumbnail):
+        avatar = get_primary_avatar(self.user, size=300)
+
+        assert mock_queue_thumbnail.call_count == 1
+        assert not avatar.thumbnail_exists(300)
+        assert avatar.avatar_url(300) == avatar.avatar.url
+
+    @patch('seahub.avatar.thumbnail_queue.queue_thumbnail')
+    def test_url_of_pending_thumbnail_not_cached(self, mock_queue_thumbnail):
+        from seahub.avatar.templatetags.avatar_tags import avatar_url
+        self.clear_cache()
+
+        avatar_url(self.user, 300)
+        avatar_url(self.user, 300)
+
+        assert mock_queue_thumbnail.call_count == 2
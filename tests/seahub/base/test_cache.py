@@ -0,0 +1,89 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+
+from mock import patch
+
+from seahub.base.cache import TwoTierCache
+from seahub.test_utils import BaseTestCase
+
+
+class TwoTierCacheTest(BaseTestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.location = os.path.join(self.tmp_dir, 'cache.db')
+        self.cache = self.new_cache()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def new_cache(self, **options):
+        return TwoTierCache(self.location, {'OPTIONS': options})
+
+    def test_get_and_set(self):
+        cache = self.new_cache(LOCAL_TIMEOUT=5)
+        cache.set('a', {'x': 1})
+        assert cache.get('a') == {'x': 1}
+        assert cache.get('b', 'default') == 'default'
+
+        # value is shared by another process through the SQLite file
+        assert self.new_cache().get('a') == {'x': 1}
+
+        stats = cache.get_stats()
+        assert stats['local_hits'] == 1
+        assert stats['misses'] == 1
+
+    def test_get_many_and_set_many(self):
+        self.cache.set_many({'a': 1, 'b': 2})
+        other = self.new_cache()
+        assert other.get_many(['a', 'b', 'c']) == {'a': 1, 'b': 2}
+
+        other.delete_many(['a'])
+        assert other.get_many(['a', 'b']) == {'b': 2}
+
+    def test_expire(self):
+        self.cache.set('a', 1, 0)
+        assert self.cache.get('a') is None
+        assert self.cache.add('a', 2) is True
+        assert self.cache.add('a', 3) is False
+        assert self.cache.get('a') == 2
+
+    def test_incr(self):
+        self.assertRaises(ValueError, self.cache.incr, 'a')
+        self.cache.set('a', 1)
+        assert self.cache.incr('a') == 2
+        assert self.new_cache().incr('a', 3) == 5
+
+    def test_delete_seen_by_other_process(self):
+        self.cache.set('a', 1)
+        other = self.new_cache()
+        assert other.get('a') == 1
+        self.cache.delete('a')
+        assert other.get('a') is None
+
+    def test_cull(self):
+        cache = self.new_cache(MAX_ENTRIES=10)
+        # culled once more than CULL_INTERVAL entries are set
+        cache.set_many(dict([('key-%d' % i, i) for i in range(200)]))
+        cache._cull()
+
+        values = self.new_cache().get_many(['key-%d' % i for i in range(200)])
+        assert len(values) == 10
+        assert cache.get_stats()['evictions'] == 190
+
+    @patch('seahub.base.cache.SQLITE_TIMEOUT', 0)
+    def test_database_locked(self):
+        self.cache.set('a', 1)
+
+        conn = sqlite3.connect(self.location, isolation_level=None)
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            # reads still work, writes raise errors
+            assert self.cache.get('a') == 1
+            self.assertRaises(sqlite3.OperationalError, self.cache.set, 'a', 2)
+            self.assertRaises(sqlite3.OperationalError, self.cache.incr, 'a')
+            self.assertRaises(sqlite3.OperationalError, self.cache.add, 'b', 1)
+        finally:
+            conn.execute('ROLLBACK')
+            conn.close()
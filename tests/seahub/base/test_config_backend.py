@@ -0,0 +1,31 @@
+from seahub.base.config_backend import SnapshotDatabaseBackend
+from seahub.test_utils import BaseTestCase
+
+
+class SnapshotDatabaseBackendTest(BaseTestCase):
+    def setUp(self):
+        self.clear_cache()
+        self.backend = SnapshotDatabaseBackend()
+
+    def update_in_db(self, key, value):
+        # update without bumping the version, like an old process would do
+        obj = self.backend._model._default_manager.get(
+            key=self.backend.add_prefix(key))
+        obj.value = value
+        obj.save()
+
+    def test_read_from_snapshot_until_version_bumped(self):
+        self.backend.set('ENABLE_SIGNUP', True)
+        assert self.backend.get('ENABLE_SIGNUP') is True
+
+        self.update_in_db('ENABLE_SIGNUP', False)
+        self.backend._checked_at = 0
+        assert self.backend.get('ENABLE_SIGNUP') is True
+
+        SnapshotDatabaseBackend().set('ENABLE_SIGNUP', False)
+        self.backend._checked_at = 0
+        assert self.backend.get('ENABLE_SIGNUP') is False
+
+    def test_get_unsaved_setting(self):
+        assert self.backend.get('not-exist') is None
+        assert dict(self.backend.mget(['not-exist'])) == {}
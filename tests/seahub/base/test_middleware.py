@@ -0,0 +1,67 @@
+from django.http import HttpResponse
+from django.test import RequestFactory
+
+from seahub.base import middleware
+from seahub.base.middleware import get_request_type, get_middleware_stats, \
+    instrument_middleware, MiddlewareTimingMiddleware, \
+    ForcePasswdChangeMiddleware, RPCCacheMiddleware
+from seahub.utils import rpc
+from seahub.utils.rpc import begin_request_rpc_cache
+from seahub.test_utils import BaseTestCase
+
+
+@instrument_middleware
+class DummyMiddleware(object):
+    def process_request(self, request):
+        return None
+
+
+class GetRequestTypeTest(BaseTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def test_request_type(self):
+        assert get_request_type(self.factory.get('/api2/repos/')) == 'api'
+        assert get_request_type(self.factory.get('/api/v2.1/repos/')) == 'api'
+        assert get_request_type(self.factory.get(
+            '/ajax/', HTTP_X_REQUESTED_WITH='XMLHttpRequest')) == 'ajax'
+        assert get_request_type(self.factory.get('/home/my/')) == 'page'
+
+
+class MiddlewareTimingMiddlewareTest(BaseTestCase):
+    def test_timings(self):
+        request = RequestFactory().get('/')
+        timing_middleware = MiddlewareTimingMiddleware()
+        timing_middleware.process_request(request)
+        calls = get_middleware_stats().get('DummyMiddleware', (0, 0))[0]
+
+        DummyMiddleware().process_request(request)
+
+        assert 'DummyMiddleware' in request.middleware_timings
+        assert get_middleware_stats()['DummyMiddleware'][0] == calls + 1
+
+        middleware.MIDDLEWARE_TIMING_HEADER = True
+        try:
+            resp = timing_middleware.process_response(request, HttpResponse())
+        finally:
+            middleware.MIDDLEWARE_TIMING_HEADER = False
+        assert resp['Server-Timing'].startswith('DummyMiddleware;dur=')
+
+
+class ForcePasswdChangeMiddlewareTest(BaseTestCase):
+    def test_black_list(self):
+        m = ForcePasswdChangeMiddleware()
+        factory = RequestFactory()
+        assert m._request_in_black_list(factory.get('/'))
+        assert m._request_in_black_list(factory.get('/repo/history/'))
+        assert m._request_in_black_list(factory.get('/group/1/'))
+        assert not m._request_in_black_list(factory.get('/accounts/logout/'))
+
+
+class RPCCacheMiddlewareTest(BaseTestCase):
+    def test_drop_cache_left_by_previous_request(self):
+        # process_response of previous request was skipped
+        begin_request_rpc_cache()
+
+        RPCCacheMiddleware().process_request(RequestFactory().post('/'))
+        assert rpc._request_local.proxies is None
@@ -43,3 +43,26 @@ class CommandTest(BaseTestCase):
         assert mail.outbox[0].to[0] == 'a@a.com'
         assert 'new comment from user %s' % self.user.username in mail.outbox[0].body
         assert '/foo' in mail.outbox[0].body
+
+    def test_send_to_each_user_once(self):
+        for to_user in ('a@a.com', 'b@b.com'):
+            for path in ('/foo', '/bar'):
+                detail = file_comment_msg_to_json(self.repo.id, path,
+                                                  self.user.username, 'test')
+                UserNotification.objects.add_file_comment_msg(to_user, detail)
+
+        call_command('send_notices', workers=2)
+        self.assertEqual(len(mail.outbox), 2)
+        assert sorted([m.to[0] for m in mail.outbox]) == ['a@a.com', 'b@b.com']
+        for m in mail.outbox:
+            assert '/foo' in m.body and '/bar' in m.body
+
+    def test_delete_notice_of_deleted_repo(self):
+        UserNotification.objects.add_repo_share_msg(
+            self.user.username,
+            repo_share_msg_to_json('bar@bar.com', 'fake-repo-id'))
+
+        call_command('send_notices')
+        self.assertEqual(len(mail.outbox), 0)
+        assert UserNotification.objects.filter(
+            to_user=self.user.username).count() == 0
@@ -0,0 +1,73 @@
+from django.core.cache import cache
+
+from seahub.profile.models import Profile
+from seahub.profile.settings import NICKNAME_CACHE_PREFIX, CONTACT_CACHE_PREFIX
+from seahub.profile.utils import ProfileResolver, get_profile_resolver
+from seahub.test_utils import BaseTestCase
+from seahub.utils import normalize_cache_key
+
+
+class ProfileResolverTest(BaseTestCase):
+    def setUp(self):
+        self.clear_cache()
+
+    def test_resolve_without_profile(self):
+        username = self.user.username
+        resolver = ProfileResolver()
+        resolver.prefetch([username])
+
+        assert resolver.nickname(username) == username.split('@')[0]
+        assert resolver.contact_email(username) == username
+
+    def test_resolve_with_profile(self):
+        username = self.user.username
+        p = Profile.objects.add_or_update(username, ' nick ')
+        p.contact_email = 'contact@foo.com'
+        p.save()
+        self.clear_cache()
+
+        resolver = ProfileResolver()
+        resolver.prefetch([username, self.admin.username])
+
+        assert resolver.nickname(username) == 'nick'
+        assert resolver.contact_email(username) == 'contact@foo.com'
+        assert resolver.nickname(self.admin.username) == \
+            self.admin.username.split('@')[0]
+
+    def test_backfill_cache(self):
+        username = self.user.username
+        Profile.objects.add_or_update(username, 'nick')
+        self.clear_cache()
+
+        ProfileResolver().prefetch([username])
+
+        assert cache.get(normalize_cache_key(
+            username, NICKNAME_CACHE_PREFIX)) == 'nick'
+        assert cache.get(normalize_cache_key(
+            username, CONTACT_CACHE_PREFIX)) == username
+
+    def test_empty_email(self):
+        resolver = ProfileResolver()
+        assert resolver.nickname('') == ''
+        assert resolver.contact_email(None) == ''
+
+    def test_resolver_is_bound_to_request(self):
+        request = self.fake_request
+        assert get_profile_resolver(request) is get_profile_resolver(request)
+
+    def test_resolve_login_ids(self):
+        username = self.user.username
+        p = Profile.objects.add_or_update(username, 'nick')
+        p.login_id = 'login-id'
+        p.save()
+
+        resolver = ProfileResolver()
+        # nicknames are cached, login ids still need one query
+        resolver.prefetch([username, self.admin.username])
+        with self.assertNumQueries(1):
+            resolver.prefetch([username, self.admin.username], login_ids=True)
+
+        with self.assertNumQueries(0):
+            assert resolver.login_id(username) == 'login-id'
+            assert resolver.login_id(self.admin.username) == ''
+            assert resolver.nickname(username) == 'nick'
@@ -0,0 +1,37 @@
+from seahub.signals import rename_dirent_successful
+from seahub.tags.models import FileUUIDMap
+from seahub.test_utils import BaseTestCase
+
+
+class FileUUIDMapTest(BaseTestCase):
+    def test_get_by_path(self):
+        m = FileUUIDMap.objects.get_or_create_fileuuidmap(
+            self.repo.id, '/folder/', 'a.md', False)
+
+        assert m.parent_path == '/folder'
+        assert FileUUIDMap.objects.get_fileuuidmap_by_path(
+            self.repo.id, '/folder', 'a.md', False).uuid == m.uuid
+        assert FileUUIDMap.objects.get_fileuuidmap_by_path(
+            self.repo.id, '/', 'a.md', False) is None
+
+    def test_rename_dir_updates_sub_items(self):
+        d = FileUUIDMap.objects.get_or_create_fileuuidmap(
+            self.repo.id, '/', 'folder', True)
+        f1 = FileUUIDMap.objects.get_or_create_fileuuidmap(
+            self.repo.id, '/folder', 'a.md', False)
+        f2 = FileUUIDMap.objects.get_or_create_fileuuidmap(
+            self.repo.id, '/folder/sub', 'b.md', False)
+        other = FileUUIDMap.objects.get_or_create_fileuuidmap(
+            self.repo.id, '/folder2', 'c.md', False)
+
+        rename_dirent_successful.send(
+            sender=None, src_repo_id=self.repo.id, src_parent_dir='/',
+            src_filename='folder', dst_repo_id=self.repo.id,
+            dst_parent_dir='/', dst_filename='new', is_dir=True)
+
+        get = FileUUIDMap.objects.get_fileuuidmap_by_path
+        assert get(self.repo.id, '/', 'new', True).uuid == d.uuid
+        assert get(self.repo.id, '/new', 'a.md', False).uuid == f1.uuid
+        assert get(self.repo.id, '/new/sub', 'b.md', False).uuid == f2.uuid
+        assert get(self.repo.id, '/folder2', 'c.md', False).uuid == other.uuid
+        assert get(self.repo.id, '/folder', 'a.md', False) is None
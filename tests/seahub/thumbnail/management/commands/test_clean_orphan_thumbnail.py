@@ -0,0 +1,74 @@
+import os
+import shutil
+import tempfile
+from StringIO import StringIO
+
+from django.core.management import call_command
+from mock import patch
+
+from seahub.test_utils import BaseTestCase
+from seahub.thumbnail.utils import THUMBNAIL_REFS_DIR, get_thumbnail_file, \
+    get_thumbnail_ref_dir, add_thumbnail_ref
+from seahub.thumbnail.management.commands.clean_orphan_thumbnail import \
+    STATE_FILE
+
+DELETED_REPO_ID = '00000000-0000-0000-0000-000000000000'
+
+
+class CommandTest(BaseTestCase):
+    def setUp(self):
+        self.tmp_root = tempfile.mkdtemp()
+        self.patchers = [
+            patch('seahub.thumbnail.utils.THUMBNAIL_ROOT', self.tmp_root),
+            patch('seahub.thumbnail.management.commands.clean_orphan_thumbnail.THUMBNAIL_ROOT',
+                  self.tmp_root),
+        ]
+        for p in self.patchers:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patchers:
+            p.stop()
+        shutil.rmtree(self.tmp_root, ignore_errors=True)
+
+    def _create_thumbnail(self, file_id, repo_id):
+        path = get_thumbnail_file(file_id, 48)
+        os.makedirs(os.path.dirname(path))
+        open(path, 'w').close()
+        add_thumbnail_ref(file_id, repo_id)
+        return path
+
+    def test_remove_only_orphan_thumbnails(self):
+        orphan = self._create_thumbnail('01' + '0' * 38, DELETED_REPO_ID)
+        used = self._create_thumbnail('02' + '0' * 38, self.repo.id)
+        # also referred by a deleted library
+        add_thumbnail_ref('02' + '0' * 38, DELETED_REPO_ID)
+        # out of shards checked in this run
+        unchecked = self._create_thumbnail('ff' + '0' * 38, DELETED_REPO_ID)
+
+        call_command('clean_orphan_thumbnail', shards=16, stdout=StringIO())
+
+        assert not os.path.exists(orphan)
+        assert not os.path.exists(get_thumbnail_ref_dir('01' + '0' * 38))
+
+        assert os.path.exists(used)
+        assert os.listdir(get_thumbnail_ref_dir('02' + '0' * 38)) == \
+            [self.repo.id]
+
+        assert os.path.exists(unchecked)
+
+        state_file = os.path.join(self.tmp_root, THUMBNAIL_REFS_DIR, STATE_FILE)
+        with open(state_file) as f:
+            assert f.read() == '16'
+
+    def test_continue_from_saved_shard(self):
+        orphan = self._create_thumbnail('ff' + '0' * 38, DELETED_REPO_ID)
+        state_file = os.path.join(self.tmp_root, THUMBNAIL_REFS_DIR, STATE_FILE)
+        with open(state_file, 'w') as f:
+            f.write('250')
+
+        call_command('clean_orphan_thumbnail', shards=16, stdout=StringIO())
+
+        assert not os.path.exists(orphan)
+        with open(state_file) as f:
+            assert f.read() == '10'
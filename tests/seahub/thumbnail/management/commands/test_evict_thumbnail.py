@@ -0,0 +1,46 @@
+import os
+import shutil
+import tempfile
+from StringIO import StringIO
+
+from django.core.management import call_command
+from mock import patch
+
+from seahub.test_utils import BaseTestCase
+from seahub.thumbnail.utils import get_thumbnail_file
+
+
+class CommandTest(BaseTestCase):
+    def setUp(self):
+        self.tmp_root = tempfile.mkdtemp()
+        self.patchers = [
+            patch('seahub.thumbnail.utils.THUMBNAIL_ROOT', self.tmp_root),
+            patch('seahub.thumbnail.management.commands.evict_thumbnail.THUMBNAIL_ROOT',
+                  self.tmp_root),
+        ]
+        for p in self.patchers:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patchers:
+            p.stop()
+        shutil.rmtree(self.tmp_root, ignore_errors=True)
+
+    def _create_thumbnail(self, file_id, atime):
+        path = get_thumbnail_file(file_id, 48)
+        os.makedirs(os.path.dirname(path))
+        with open(path, 'w') as f:
+            f.write('0' * 1024 * 1024)
+        os.utime(path, (atime, atime))
+        return path
+
+    def test_evict_least_recently_used(self):
+        oldest = self._create_thumbnail('0a' + '0' * 38, 1000)
+        newer = self._create_thumbnail('0b' + '0' * 38, 2000)
+        newest = self._create_thumbnail('0c' + '0' * 38, 3000)
+
+        call_command('evict_thumbnail', max_size=2, stdout=StringIO())
+
+        assert not os.path.exists(oldest)
+        assert os.path.exists(newer)
+        assert os.path.exists(newest)
@@ -0,0 +1,45 @@
+import os
+import shutil
+import tempfile
+from StringIO import StringIO
+
+from django.core.management import call_command
+from mock import patch
+
+from seahub.test_utils import BaseTestCase
+from seahub.thumbnail.utils import get_thumbnail_file
+
+FILE_ID = '0a' + '0' * 38
+
+
+class CommandTest(BaseTestCase):
+    def setUp(self):
+        self.tmp_root = tempfile.mkdtemp()
+        self.patchers = [
+            patch('seahub.thumbnail.utils.THUMBNAIL_ROOT', self.tmp_root),
+            patch('seahub.thumbnail.management.commands.migrate_thumbnail.THUMBNAIL_ROOT',
+                  self.tmp_root),
+        ]
+        for p in self.patchers:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patchers:
+            p.stop()
+        shutil.rmtree(self.tmp_root, ignore_errors=True)
+
+    def test_move_flat_files_to_shards(self):
+        size_dir = os.path.join(self.tmp_root, '48')
+        os.makedirs(size_dir)
+        with open(os.path.join(size_dir, FILE_ID), 'w') as f:
+            f.write('thumbnail')
+
+        call_command('migrate_thumbnail', stdout=StringIO())
+
+        assert not os.path.exists(os.path.join(size_dir, FILE_ID))
+        with open(get_thumbnail_file(FILE_ID, 48)) as f:
+            assert f.read() == 'thumbnail'
+
+        # already migrated files are left as they are
+        call_command('migrate_thumbnail', stdout=StringIO())
+        assert os.path.isfile(get_thumbnail_file(FILE_ID, 48))
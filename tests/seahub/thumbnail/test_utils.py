@@ -0,0 +1,111 @@
+import os
+import time
+import shutil
+import tempfile
+from StringIO import StringIO
+
+from mock import patch
+from PIL import Image
+
+from seahub.test_utils import BaseTestCase
+from seahub.thumbnail.utils import ThumbnailWorkerPool, \
+    _create_thumbnail_common, _fetch_image, get_thumbnail_file, \
+    add_thumbnail_ref, get_thumbnail_ref_dir
+
+
+class ThumbnailWorkerPoolTest(BaseTestCase):
+    def test_coalesce_same_task(self):
+        pool = ThumbnailWorkerPool(processes=1, max_pending=2)
+        pool.start()
+        task = pool.submit('a', time.sleep, 0.5)
+        assert pool.submit('a', time.sleep, 0.5) is task
+        assert pool.get_task('a') is task
+
+        task.wait()
+        assert pool.get_task('a') is None
+
+    def test_reject_when_busy(self):
+        pool = ThumbnailWorkerPool(processes=1, max_pending=1)
+        pool.start()
+        task = pool.submit('a', time.sleep, 0.5)
+        assert pool.submit('b', time.sleep, 0) is None
+
+        task.wait()
+        assert pool.submit('b', time.sleep, 0) is not None
+
+    def test_not_started(self):
+        pool = ThumbnailWorkerPool(processes=1, max_pending=1)
+        assert not pool.is_running()
+        self.assertRaises(RuntimeError, pool.submit, 'a', time.sleep, 0)
+
+        # workers are turned off
+        pool = ThumbnailWorkerPool(processes=0, max_pending=1)
+        pool.start()
+        assert not pool.is_running()
+
+
+class CreateThumbnailCommonTest(BaseTestCase):
+    def setUp(self):
+        self.tmp_root = tempfile.mkdtemp()
+        self.patcher = patch('seahub.thumbnail.utils.THUMBNAIL_ROOT',
+                             self.tmp_root)
+        self.patcher.start()
+
+    def tearDown(self):
+        self.patcher.stop()
+        shutil.rmtree(self.tmp_root, ignore_errors=True)
+
+    def test_create_all_sizes_from_one_image(self):
+        f = StringIO()
+        Image.new('RGB', (2000, 1000)).save(f, 'JPEG')
+        f.seek(0)
+
+        assert _create_thumbnail_common(f, 'fake-file-id', [48, 192]) == \
+            (True, 200)
+
+        for size in (48, 192):
+            thumbnail_file = get_thumbnail_file('fake-file-id', size)
+            assert os.path.exists(thumbnail_file)
+            assert Image.open(thumbnail_file).size == (size, size / 2)
+
+
+class FetchImageTest(BaseTestCase):
+    def setUp(self):
+        fd, self.image_path = tempfile.mkstemp(suffix='.png')
+        os.close(fd)
+        Image.new('RGB', (100, 100)).save(self.image_path, 'PNG')
+        self.url = 'file://' + self.image_path
+
+    def tearDown(self):
+        os.unlink(self.image_path)
+
+    def test_fetch_to_temp_file(self):
+        f = _fetch_image(self.url)
+        assert f.read() == open(self.image_path, 'rb').read()
+        f.close()
+
+    @patch('seahub.thumbnail.utils.THUMBNAIL_IMAGE_ORIGINAL_SIZE_LIMIT', -1)
+    def test_reject_too_large_image(self):
+        assert _fetch_image(self.url) is None
+
+
+class ThumbnailLayoutTest(BaseTestCase):
+    def setUp(self):
+        self.tmp_root = tempfile.mkdtemp()
+        self.patcher = patch('seahub.thumbnail.utils.THUMBNAIL_ROOT',
+                             self.tmp_root)
+        self.patcher.start()
+
+    def tearDown(self):
+        self.patcher.stop()
+        shutil.rmtree(self.tmp_root, ignore_errors=True)
+
+    def test_sharded_thumbnail_file(self):
+        assert get_thumbnail_file('abcdef', 48) == \
+            os.path.join(self.tmp_root, '48', 'ab', 'cd', 'abcdef')
+
+    def test_add_thumbnail_ref(self):
+        add_thumbnail_ref('abcdef', self.repo.id)
+        add_thumbnail_ref('abcdef', self.repo.id)
+
+        assert os.listdir(get_thumbnail_ref_dir('abcdef')) == [self.repo.id]
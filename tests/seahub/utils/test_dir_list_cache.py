@@ -0,0 +1,71 @@
+from mock import patch
+from seaserv import seafile_api
+
+from seahub.test_utils import BaseTestCase
+from seahub.utils.dir_list_cache import LRUCache, get_cached_dirents, \
+    set_cached_dirents, get_lock_version, bump_lock_version
+
+
+class LRUCacheTest(BaseTestCase):
+    def test_get_and_set(self):
+        c = LRUCache(max_size=10, timeout=60)
+        c.set('a', 'aaa')
+        assert c.get('a') == 'aaa'
+        assert c.get('b') is None
+
+    def test_evict_least_recently_used(self):
+        c = LRUCache(max_size=6, timeout=60)
+        c.set('a', 'aaa')
+        c.set('b', 'bbb')
+        c.get('a')
+        c.set('c', 'ccc')
+
+        assert c.get('b') is None
+        assert c.get('a') == 'aaa'
+        assert c.get('c') == 'ccc'
+        assert c.size == 6
+
+    def test_skip_too_large_value(self):
+        c = LRUCache(max_size=2, timeout=60)
+        c.set('a', 'aaa')
+        assert c.get('a') is None
+        assert c.size == 0
+
+    def test_expired(self):
+        c = LRUCache(max_size=10, timeout=-1)
+        c.set('a', 'aaa')
+        assert c.get('a') is None
+        assert c.size == 0
+
+
+class DirListCacheTest(BaseTestCase):
+    def test_cache_dirents(self):
+        assert self.folder
+        repo_id = self.repo.id
+        dir_id = seafile_api.get_dir_id_by_path(repo_id, '/')
+        dirents = seafile_api.list_dir_by_dir_id(repo_id, dir_id)
+
+        assert get_cached_dirents(repo_id, dir_id, 'rw') is None
+        set_cached_dirents(repo_id, dir_id, 'rw', dirents)
+
+        cached = get_cached_dirents(repo_id, dir_id, 'rw')
+        assert [x.obj_name for x in cached] == [x.obj_name for x in dirents]
+        assert get_cached_dirents(repo_id, dir_id, 'r') is None
+
+    @patch('seahub.utils.dir_list_cache.DIR_LIST_LOCK_CACHE_TIMEOUT', -1)
+    def test_listing_with_locks_expires_soon(self):
+        repo_id = self.repo.id
+        dir_id = seafile_api.get_dir_id_by_path(repo_id, '/')
+        dirents = seafile_api.list_dir_by_dir_id(repo_id, dir_id)
+
+        set_cached_dirents(repo_id, dir_id, 'rw', dirents, with_locks=True)
+        assert get_cached_dirents(repo_id, dir_id, 'rw') is None
+
+    def test_bump_lock_version(self):
+        self.clear_cache()
+        repo_id = self.repo.id
+        assert get_lock_version(repo_id) == 0
+        bump_lock_version(repo_id)
+        assert get_lock_version(repo_id) == 1
+        bump_lock_version(repo_id)
+        assert get_lock_version(repo_id) == 2
@@ -0,0 +1,38 @@
+from mock import patch
+from seaserv import seafile_api
+
+from seahub.test_utils import BaseTestCase
+from seahub.utils import dir_size_cache
+from seahub.utils.dir_size_cache import get_dir_size, get_dirents_size
+
+
+class DirSizeCacheTest(BaseTestCase):
+    def setUp(self):
+        self.clear_cache()
+        dir_size_cache._sizes.clear()
+        self.dir_id = seafile_api.get_dir_id_by_path(self.repo.id, '/')
+
+    def test_get_dir_size_once(self):
+        real_size = seafile_api.get_dir_size(self.repo.store_id,
+                                             self.repo.version, self.dir_id)
+        with patch('seahub.utils.dir_size_cache.seafile_api.get_dir_size') as m:
+            m.return_value = real_size
+            assert get_dir_size(self.repo.store_id, self.repo.version,
+                                self.dir_id) == real_size
+            assert get_dir_size(self.repo.store_id, self.repo.version,
+                                self.dir_id) == real_size
+            assert m.call_count == 1
+
+    def test_get_dirents_size(self):
+        file_name = self.file.lstrip('/')
+        folder_name = self.folder.lstrip('/')
+        file_size = seafile_api.get_file_size(self.repo.store_id,
+                self.repo.version,
+                seafile_api.get_file_id_by_path(self.repo.id, self.file))
+        folder_size = seafile_api.get_dir_size(self.repo.store_id,
+                self.repo.version,
+                seafile_api.get_dir_id_by_path(self.repo.id, self.folder))
+
+        assert get_dirents_size(self.repo, '/',
+                [file_name, folder_name, 'not-exist']) == \
+            file_size + folder_size
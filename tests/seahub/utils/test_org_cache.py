@@ -0,0 +1,23 @@
+from mock import patch
+
+from seahub.test_utils import BaseTestCase
+from seahub.utils import org_cache
+from seahub.utils.org_cache import get_user_org, invalidate_user_org
+
+
+class OrgCacheTest(BaseTestCase):
+    def setUp(self):
+        self.clear_cache()
+        org_cache._orgs.clear()
+
+    @patch('seahub.utils.org_cache.request_ccnet_api')
+    def test_invalidate_user_org(self, mock_ccnet_api):
+        mock_ccnet_api.get_orgs_by_user.return_value = []
+
+        assert get_user_org(self.user.username) is None
+        assert get_user_org(self.user.username) is None
+        assert mock_ccnet_api.get_orgs_by_user.call_count == 1
+
+        invalidate_user_org(self.user.username)
+        assert get_user_org(self.user.username) is None
+        assert mock_ccnet_api.get_orgs_by_user.call_count == 2
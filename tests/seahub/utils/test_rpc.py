@@ -0,0 +1,46 @@
+from mock import Mock
+
+from seahub.test_utils import BaseTestCase
+from seahub.utils.rpc import MemoizedRPCProxy, request_seafile_api, \
+    begin_request_rpc_cache, end_request_rpc_cache
+
+
+class MemoizedRPCProxyTest(BaseTestCase):
+    def setUp(self):
+        self.api = Mock()
+        self.api.get_repo.return_value = 'repo'
+        self.proxy = MemoizedRPCProxy(api=self.api)
+
+    def test_memoize_read_only_call(self):
+        assert self.proxy.get_repo('a') == 'repo'
+        assert self.proxy.get_repo('a') == 'repo'
+        assert self.proxy.get_repo('b') == 'repo'
+
+        assert self.api.get_repo.call_count == 2
+        assert self.proxy.get_stats() == {'get_repo': (1, 2)}
+
+    def test_write_call_clears_memoized_results(self):
+        self.proxy.get_repo('a')
+        self.proxy.remove_repo('a')
+        self.proxy.get_repo('a')
+
+        assert self.api.get_repo.call_count == 2
+
+    def test_not_memoize_access_token(self):
+        self.proxy.get_fileserver_access_token('a', 'b', 'view', '')
+        self.proxy.get_fileserver_access_token('a', 'b', 'view', '')
+
+        assert self.api.get_fileserver_access_token.call_count == 2
+
+
+class RequestRPCProxyTest(BaseTestCase):
+    def test_memoize_in_request(self):
+        begin_request_rpc_cache()
+        try:
+            assert request_seafile_api.get_repo(self.repo.id).id == self.repo.id
+            request_seafile_api.get_repo(self.repo.id)
+        finally:
+            stats = end_request_rpc_cache()
+
+        assert stats['seafile_api']['get_repo'] == (1, 1)
+        assert end_request_rpc_cache() == {}
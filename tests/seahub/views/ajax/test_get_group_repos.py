@@ -0,0 +1,30 @@
+from seaserv import seafile_api
+
+from seahub.test_utils import BaseTestCase
+from seahub.views.ajax import get_group_repos
+
+
+class GetGroupReposTest(BaseTestCase):
+    def setUp(self):
+        self.group2 = self.create_group(group_name='test_group2',
+                                        username=self.user.username)
+        self.share_repo_to_group_with_rw_permission()
+        seafile_api.set_group_repo(self.repo.id, self.group2.id,
+                                   self.user.username, 'rw')
+
+    def tearDown(self):
+        self.remove_group(self.group2.id)
+        super(GetGroupReposTest, self).tearDown()
+
+    def test_get_repo_shared_to_groups(self):
+        group_repos = get_group_repos(self.fake_request,
+                                      [self.group, self.group2])
+
+        assert len(group_repos) == 2
+        assert sorted([r.group.id for r in group_repos]) == \
+            sorted([self.group.id, self.group2.id])
+        for r in group_repos:
+            assert r.id == self.repo.id
+            assert r.user == self.user.username
+            assert r.user_perm == 'rw'
+            assert r.last_modified == r.last_modify
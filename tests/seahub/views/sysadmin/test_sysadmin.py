@@ -160,6 +160,31 @@ class SysUserAdminExportExcelTest(BaseTestCase):
         self.assertEqual(200, resp.status_code)
         assert 'application/ms-excel' in resp._headers['content-type']
 
+    @patch('seahub.views.sysadmin.write_xls')
+    def test_export_excel_populates_users_in_bulk(self, mock_write_xls):
+        rows = {}
+        def write_xls(sheet_name, head, data_list):
+            data_list = list(data_list)
+            rows.update([(x[0], dict(zip(head, x))) for x in data_list])
+            return real_write_xls(sheet_name, head, data_list)
+        mock_write_xls.side_effect = write_xls
+
+        resp = self.client.get(reverse('sys_useradmin_export_excel'))
+        self.assertEqual(200, resp.status_code)
+
+        # admin logged in, user did not
+        assert rows[self.admin.email]['Last Login']
+        assert rows[self.user.email]['Last Login'] == ''
+
+    def test_can_export_csv(self):
+        resp = self.client.get(reverse('sys_useradmin_export_excel') +
+                               '?format=csv')
+        self.assertEqual(200, resp.status_code)
+        assert 'text/csv' in resp._headers['content-type']
+        content = ''.join(resp.streaming_content)
+        assert self.user.email in content
+        assert self.admin.email in content
+
 class BatchAddUserTest(BaseTestCase):
     def setUp(self):
         self.clear_cache()